@@ -12,5 +12,16 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SERVER.settings')
+# hot read paths are served by the async views (settings.ASYNC_READ_VIEWS)
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from core.websocket import board_updates  # noqa: E402  (needs the apps loaded above)
+
+
+async def application(scope, receive, send):
+    # websockets carry live board updates, everything else is plain Django
+    if scope['type'] == 'websocket':
+        return await board_updates(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -1,9 +1,25 @@
+import os
 from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 BOTFATHER_HASH = "7388867617:AAFuihPbPR_i6yG0pFPxj0lsCcurE_5N90s"
+TELEGRAM_API_URL = "https://api.telegram.org"  # point at a local stub to test delivery
+
+# report generation, see core/llm.py ("fake" gives deterministic offline output)
+LLM_BACKEND = "gemini"
+LLM_MODEL = "gemini-2.0-flash-exp"
+LLM_CACHE_TIMEOUT = 24 * 60 * 60
+LLM_GENERATION_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_mime_type": "text/plain",
+}
+# required by the gemini LLM backend, never committed
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -43,10 +59,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.instrumentation.InstrumentationMiddleware',
 ]
 
+# share of requests timed for Server-Timing and /api/metrics/ (see core/instrumentation.py)
+INSTRUMENTATION_SAMPLE_RATE = 0.1
+# when set, /api/metrics/ requires "Authorization: Bearer <token>"; otherwise only staff users may read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 ROOT_URLCONF = 'SERVER.urls'
 
+# GETs of the project list/detail, milestone task and log endpoints go to the
+# async views in core/async_views.py; SERVER.asgi turns this on for the ASGI app.
+# Under WSGI (runserver) the plain APIViews avoid the async-to-sync bridge.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', '0') == '1'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -113,6 +140,40 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # serialized project trees (core/tree_cache.py); a FileBasedCache at a
+    # shared path lets every worker process use the same entries
+    'project-trees': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'project-trees',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+PROJECT_TREE_CACHE = 'project-trees'
+PROJECT_TREE_CACHE_TIMEOUT = 300
+
+# critical path schedules kept per process (core/scheduling.py), checked against the database on each read
+SCHEDULE_CACHE_SIZE = 100  # most recently read projects
+
+# ?since= delta sync of the project list (core/snapshot.py)
+SYNC_CURSOR_OVERLAP = 60  # seconds each cursor reaches back; must exceed the longest write transaction
+TOMBSTONE_RETENTION_DAYS = 30  # deletes kept for syncing clients; older cursors get 410 and refetch the snapshot
+
+# live board updates over /ws/projects/<id>/ (core/realtime.py), served by the ASGI app
+REALTIME_COALESCE_WINDOW = 0.1  # seconds of changes sent as one message
+REALTIME_QUEUE_SIZE = 100  # messages a slow client may lag behind before it is told to resync
+
+# Server-Sent Events log tail, /api/projects/<id>/logs/stream/ (core/streams.py)
+LOG_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments, also how often other processes' logs are picked up
+LOG_STREAM_RETRY = 3000  # milliseconds EventSource waits before reconnecting
+LOG_STREAM_REPLAY = 500  # most logs replayed on (re)connect; older ones are announced as an `event: gap`
+
+# /api/search/ ranks matches in task titles this many times higher than in bodies (core/search.py)
+SEARCH_TITLE_WEIGHT = 4.0
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -123,6 +184,16 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson when installed, DRF's stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -144,4 +215,5 @@ SIMPLE_JWT['ADDITIONAL_CLAIMS'] = {
     'role': lambda user: 'owner' if user.is_superuser else 'admin' if user.is_staff else 'user'
 }
 
-CORS_ALLOW_ALL_ORIGINS = True  # Only for development, configure properly for production
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True  # Only for development, configure properly for production
+CORS_EXPOSE_HEADERS = ['Link', 'Server-Timing', 'ETag']  # next page URL of the paginated log feeds, request timings, validators
\ No newline at end of file
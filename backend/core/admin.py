@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, ProjectPermission, Milestone, Task, ChecklistItem, Comment, Dependency, Tag, TaskTag, Log, GroupModel, ReportModel
+from .models import Project, ProjectPermission, Milestone, Task, ChecklistItem, Comment, Dependency, Tag, TaskTag, Log, GroupModel, ReportModel, TelegramDelivery
 
 @admin.register(GroupModel)
 class GroupAdmin(admin.ModelAdmin):
@@ -9,6 +9,11 @@ class GroupAdmin(admin.ModelAdmin):
 @admin.register(ReportModel)
 class ReportModelAdmin(admin.ModelAdmin):
     list_display = ('pk', 'created_at', 'group')
+
+@admin.register(TelegramDelivery)
+class TelegramDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'chatID', 'status', 'attempts', 'nextAttemptAt', 'sentAt')
+    list_filter = ('status',)
     
 
 class ProjectPermissionAdmin(admin.TabularInline):
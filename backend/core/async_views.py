@@ -0,0 +1,176 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .conditional import make_etag, etag_matches, aproject_state, aproject_states, alog_state
+from .models import Project, Milestone, Log
+from .pagination import akeyset_paginate, link_header
+from .permissions import aget_project_roles
+from .renderers import FastJSONRenderer
+from .serializers import TaskSerializer, LogSerializer
+from .tree_cache import project_tree_cache
+from .views import (
+    LOG_ORDERING,
+    TASK_PREFETCH,
+    all_logs_querysets,
+    ProjectAPIView,
+    ProjectDetailAPIView,
+    TaskAPIView,
+    LogAPIView,
+    MilestoneLogAPIView,
+    AllLogsAPIView,
+)
+
+
+class AsyncReadView(View):
+    """
+    Async GET of a hot read path, for the ASGI server. Every other method,
+    and anything the async code doesn't cover, is handed to ``sync_view``,
+    the APIView class of the same URL.
+
+    Authentication, permission checks, status codes, error bodies, ETags and
+    Link headers are the APIView's; the difference is that responses are
+    always JSON (no browsable API) and waiting on the database doesn't hold
+    a thread.
+    """
+
+    sync_view = None
+    renderer = FastJSONRenderer()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await self.delegate(request, *args, **kwargs)
+
+        # what DRF's Request gives the helpers shared with the sync views
+        request.query_params = request.GET
+        request.accepted_renderer = self.renderer
+        try:
+            request.user = await self.authenticate(request)
+            return await self.get(request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(exc, request, args, kwargs)
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view.as_view())(request, *args, **kwargs)
+
+    async def authenticate(self, request):
+        # JWTAuthentication + IsAuthenticated, as on the APIViews
+        authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+        if authenticated is None:
+            raise exceptions.NotAuthenticated()
+        return authenticated[0]
+
+    def handle_exception(self, exc, request, args, kwargs):
+        # DRF's configured exception handler, as in APIView.handle_exception; what it doesn't handle is raised
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = JWTAuthentication().authenticate_header(request)
+        context = {'view': self, 'args': args, 'kwargs': kwargs, 'request': request}
+        response = api_settings.EXCEPTION_HANDLER(exc, context)
+        if response is None:
+            raise exc
+        headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+        return self.respond(response.data, status=response.status_code, headers=headers)
+
+    def respond(self, data, status=status.HTTP_200_OK, headers=None):
+        return HttpResponse(self.renderer.render(data), content_type=self.renderer.media_type, status=status, headers=headers)
+
+    def not_modified(self, request, etag):
+        if etag_matches(request, etag):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return None
+
+
+class AsyncProjectView(AsyncReadView):
+    sync_view = ProjectAPIView
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.GET.get('since') is not None:
+            # delta sync isn't a hot path, the APIView answers it
+            return await self.delegate(request, *args, **kwargs)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request):
+        states = await aproject_states(await aget_project_roles(request))
+        etag = make_etag(request, sorted(states.items()))
+        response = self.not_modified(request, etag)
+        if response is not None:
+            return response
+
+        return self.respond(await project_tree_cache.aget_many(states), headers={'ETag': etag})
+
+
+class AsyncProjectDetailView(AsyncReadView):
+    sync_view = ProjectDetailAPIView
+
+    async def get(self, request, pk):
+        projects = Project.objects.filter(pk__in=await aget_project_roles(request))
+        project = await aget_object_or_404(projects, pk=pk)
+        states = await aproject_states([project.pk])
+        etag = make_etag(request, sorted(states.items()))
+        response = self.not_modified(request, etag)
+        if response is not None:
+            return response
+
+        trees = await project_tree_cache.aget_many(states)
+        return self.respond(trees[0], headers={'ETag': etag})
+
+
+class AsyncTaskView(AsyncReadView):
+    sync_view = TaskAPIView
+
+    async def get(self, request, milestone_pk):
+        roles = await aget_project_roles(request)
+        milestone = await aget_object_or_404(Milestone, pk=milestone_pk, project_id__in=roles)
+        etag = make_etag(request, await aproject_state([milestone.project_id]))
+        response = self.not_modified(request, etag)
+        if response is not None:
+            return response
+
+        tasks = [task async for task in milestone.tasks.prefetch_related(*TASK_PREFETCH)]
+        serializer = TaskSerializer(tasks, many=True)
+        return self.respond(serializer.data, headers={'ETag': etag})
+
+
+class AsyncLogView(AsyncReadView):
+    sync_view = LogAPIView
+
+    async def get(self, request, project_pk=None):
+        querysets = [Log.objects.filter(project_id=project_pk)]
+        return await self.log_page(request, querysets)
+
+    async def log_page(self, request, querysets, *state):
+        etag = make_etag(request, await alog_state(querysets), *state)
+        response = self.not_modified(request, etag)
+        if response is not None:
+            return response
+
+        logs, next_url = await akeyset_paginate(request, querysets, LOG_ORDERING)
+        serializer = LogSerializer(logs, many=True)
+        return self.respond(serializer.data, headers={'ETag': etag, **link_header(next_url)})
+
+
+class AsyncMilestoneLogView(AsyncLogView):
+    sync_view = MilestoneLogAPIView
+
+    async def get(self, request, milestone_pk):
+        roles = await aget_project_roles(request)
+        milestone = await aget_object_or_404(Milestone, pk=milestone_pk, project_id__in=roles)
+        querysets = [Log.objects.filter(project_id=milestone.project_id)]
+        return await self.log_page(request, querysets)
+
+
+class AsyncAllLogsView(AsyncLogView):
+    sync_view = AllLogsAPIView
+
+    async def get(self, request):
+        roles = await aget_project_roles(request)
+        return await self.log_page(request, all_logs_querysets(request.user, roles), sorted(roles))
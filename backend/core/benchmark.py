@@ -0,0 +1,742 @@
+import asyncio
+import io
+import itertools
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+import types
+import warnings
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .digest import DIGEST_MAX_CHARS, build_log_digest
+from .instrumentation import registry
+from .pagination import DEFAULT_PAGE_SIZE, encode_cursor
+from .renderers import FastJSONParser, FastJSONRenderer, orjson
+from .scheduling import ProjectSchedule, load_project_graph, schedule_cache
+from .search import get_search_backend, index_documents, rebuild_index
+from .serializers import ProjectSerializer
+from .tree_cache import PROJECT_TREE_PREFETCH
+from .urls import build_urlpatterns
+from .views import LOG_ORDERING
+from .models import (
+    Project, ProjectPermission, Milestone, Task, ChecklistItem, Comment, Dependency, Tag, TaskTag, Log, SearchDocument,
+    GroupModel,
+)
+
+
+# synthetic workspace sizes: per project, per milestone and per task counts
+BENCHMARK_SCALES = {
+    'small': {'projects': 2, 'milestones': 2, 'tasks': 5, 'logs': 50, 'members': 3},
+    'medium': {'projects': 5, 'milestones': 4, 'tasks': 20, 'logs': 500, 'members': 8},
+    'large': {'projects': 10, 'milestones': 8, 'tasks': 50, 'logs': 2000, 'members': 20},
+}
+
+
+def seed_workspace(scale, index=True):
+    """
+    Fill the (empty, test) database with a workspace of the given scale (a
+    BENCHMARK_SCALES name or a dict of sizes): every project has all
+    members, its tasks a checklist, a comment, a tag and a dependency on the
+    previous task of the milestone. The owner is staff, so it may read the
+    metrics. Returns the ids the benchmark routes are called with.
+    """
+    sizes = BENCHMARK_SCALES[scale] if isinstance(scale, str) else scale
+    now = timezone.now()
+
+    owner = User.objects.create_user('bench-owner', 'owner@bench.local', 'bench', is_staff=True)
+    members = [owner] + User.objects.bulk_create([
+        User(username=f'bench-member-{i}', email=f'member-{i}@bench.local') for i in range(sizes['members'] - 1)
+    ])
+    outsider = User.objects.create_user('bench-outsider', 'outsider@bench.local', 'bench')
+    tags = Tag.objects.bulk_create([Tag(name=f'tag-{i}', color='#336699') for i in range(5)])
+
+    projects = Project.objects.bulk_create([
+        Project(name=f'Project {i}', owner=owner) for i in range(sizes['projects'])
+    ])
+    ProjectPermission.objects.bulk_create([
+        ProjectPermission(project=project, user=member, role='admin' if member is owner else 'editor')
+        for project in projects for member in members
+    ])
+    milestones = Milestone.objects.bulk_create([
+        Milestone(project=project, name=f'Milestone {i}')
+        for project in projects for i in range(sizes['milestones'])
+    ])
+    tasks = Task.objects.bulk_create([
+        Task(
+            milestone=milestone,
+            title=f'Task {i}',
+            description=f'Description of task {i} ' * 4,
+            status=Task.STATUS_CHOICES[i % len(Task.STATUS_CHOICES)][0],
+            assignee=members[i % len(members)],
+            start_date=now + timedelta(days=i),
+            due_date=now + timedelta(days=i + 2),
+        )
+        for milestone in milestones for i in range(sizes['tasks'])
+    ])
+    ChecklistItem.objects.bulk_create([
+        ChecklistItem(task=task, text=f'Step {i}', is_completed=i == 0) for task in tasks for i in range(2)
+    ])
+    Comment.objects.bulk_create([Comment(task=task, author=owner, text='Looks good') for task in tasks])
+    TaskTag.objects.bulk_create([TaskTag(task=task, tag=tags[task.pk % len(tags)]) for task in tasks])
+    Dependency.objects.bulk_create([
+        Dependency(from_task=previous, to_task=task, type='FS')
+        for previous, task in zip(tasks, tasks[1:]) if previous.milestone_id == task.milestone_id
+    ])
+    Log.objects.bulk_create([
+        Log(project=project, user=members[i % len(members)], task=tasks[i % len(tasks)], message=f'Change {i}')
+        for project in projects for i in range(sizes['logs'])
+    ])
+    if index:
+        # bulk writes send no signals, so search documents are built in one go
+        rebuild_index()
+
+    return {
+        'user': owner,
+        'outsider': outsider,
+        'project': projects[0].pk,
+        'milestone': milestones[0].pk,
+        'task': tasks[0].pk,
+        'tag': tags[0].pk,
+        'since': (now - timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+
+
+# (name, method, path, body); paths and bodies are formatted with seed_workspace()'s ids
+BENCHMARK_ROUTES = [
+    ('project-list', 'get', '/api/projects/', None),
+    ('project-delta', 'get', '/api/projects/?since={since}', None),
+    ('project-create', 'post', '/api/projects/', {'name': 'Benchmark project'}),
+    ('project-snapshot', 'get', '/api/projects/snapshot/', None),
+    ('project-detail', 'get', '/api/projects/{project}/', None),
+    ('project-update', 'put', '/api/projects/{project}/', {'name': 'Renamed', 'owner': '{user_id}'}),
+    ('project-delete', 'delete', '/api/projects/{project}/', None),
+    ('project-permissions', 'post', '/api/projects/{project}/permissions/', {'user_id': '{outsider_id}', 'role': 'viewer'}),
+    ('project-schedule', 'get', '/api/projects/{project}/schedule/', None),
+    ('project-activity', 'get', '/api/projects/{project}/activity/', None),
+    ('milestone-list', 'get', '/api/projects/{project}/milestones/', None),
+    ('milestone-create', 'post', '/api/projects/{project}/milestones/', {'name': 'Benchmark milestone'}),
+    ('milestone-logs', 'get', '/api/milestones/{milestone}/logs/', None),
+    # EventSource sends no headers; under the test client's WSGI handler the streams end after the replay
+    ('milestone-log-stream', 'get', '/api/milestones/{milestone}/logs/stream/?token={token}&after=0', None),
+    ('task-list', 'get', '/api/milestones/{milestone}/tasks/', None),
+    ('task-create', 'post', '/api/milestones/{milestone}/tasks/', {
+        'title': 'Benchmark task', 'description': 'New', 'checklist': [{'text': 'a'}, {'text': 'b'}],
+    }),
+    ('task-query', 'get', '/api/tasks/?milestone={milestone}&status=To+Do&status=In+Progress&fields=id,title,status,assignee,due_date,tags&ordering=due_date&limit=50', None),
+    ('task-detail', 'get', '/api/tasks/{task}/', None),
+    ('task-update', 'put', '/api/tasks/{task}/', {'status': 'Done', 'description': 'Changed'}),
+    ('task-delete', 'delete', '/api/tasks/{task}/', None),
+    ('task-bulk', 'post', '/api/tasks/bulk/', {'operations': [
+        {'op': 'update', 'id': '{task_id}', 'status': 'In Progress'},
+        {'op': 'create', 'milestone': '{milestone_id}', 'title': 'Bulk task', 'description': 'New'},
+    ]}),
+    ('checklist-create', 'post', '/api/tasks/{task}/checklist/', {'text': 'Benchmark step'}),
+    ('comment-create', 'post', '/api/tasks/{task}/comments/', {'text': 'Benchmark comment', 'author': '{user_id}'}),
+    ('tag-list', 'get', '/api/tags/', None),
+    ('tag-create', 'post', '/api/tags/', {'name': 'benchmark', 'color': '#000000'}),
+    ('log-list', 'get', '/api/projects/{project}/logs/', None),
+    ('log-stream', 'get', '/api/projects/{project}/logs/stream/?token={token}&after=0', None),
+    ('log-create', 'post', '/api/projects/{project}/logs/', {'message': 'Benchmark log', 'project': '{project_id}', 'user': '{user_id}'}),
+    ('all-logs', 'get', '/api/logs/', None),
+    ('project-users', 'get', '/api/project-users/', None),
+    ('search', 'get', '/api/search/?q=task+descr', None),
+    # last: the registry then holds every route measured before it
+    ('metrics', 'get', '/api/metrics/', None),
+]
+
+
+def _fill(value, ids):
+    # '{name_id}' placeholders become ints, other strings are formatted
+    if isinstance(value, dict):
+        return {key: _fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, ids) for item in value]
+    if isinstance(value, str) and value.startswith('{') and value.endswith('_id}'):
+        return ids[value[1:-4]]
+    if isinstance(value, str):
+        return value.format(**ids)
+    return value
+
+
+class QueryCounter:
+    """connection.execute_wrapper counting queries; unlike the debug query log it has no cap."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_benchmark(scale, repeat=5, routes=None):
+    """
+    Seed a workspace and call every route ``repeat`` times through the test
+    client. Each call runs in a rolled back transaction with a cold cache, so
+    writes don't pile up and query counts don't depend on call order.
+
+    Returns {route name: {'status', 'queries', 'ms', 'bytes'}} with the
+    median wall time.
+    """
+    workspace = seed_workspace(scale)
+    ids = {key: value.pk if isinstance(value, User) else value for key, value in workspace.items()}
+    ids['token'] = AccessToken.for_user(workspace['user'])
+    # every request sampled and only this run's, so the metrics route reports the same views each time
+    registry.clear()
+    with override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0):
+        client = _authenticated_client(workspace['user'])
+        results = {}
+        for name, method, path, body in BENCHMARK_ROUTES:
+            if routes and name not in routes:
+                continue
+            results[name] = _measure_route(client, method, _fill(path, ids), _fill(body, ids), repeat)
+    return results
+
+
+def _authenticated_client(user):
+    client = APIClient()
+    # a real token: the async read views don't know force_authenticate()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+def _read(response):
+    # a stream's queries run as it is read; under WSGI Django buffers the async ones
+    if not response.streaming:
+        return response.content
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', 'StreamingHttpResponse must consume asynchronous iterators')
+        return b''.join(response)
+
+
+def _measure_route(client, method, path, body, repeat, cold=True):
+    # each call in a rolled back transaction, with cold caches unless ``cold`` is false
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            for alias in caches:
+                caches[alias].clear()
+            schedule_cache.clear()
+        queries = QueryCounter()
+        with transaction.atomic():
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                response = getattr(client, method)(path, body, format='json')
+                content = _read(response)
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+    return {
+        'status': response.status_code,
+        'queries': queries.count,
+        'ms': round(statistics.median(timings), 2),
+        'bytes': len(content),
+    }
+
+
+def benchmark_snapshot(tasks, repeat=3):
+    """
+    Seed ``tasks`` tasks over 10 projects of 10 milestones and fetch all of
+    them with cold caches, as the flat /api/projects/snapshot/ tables and as
+    the nested ProjectSerializer trees of /api/projects/.
+
+    Returns {'snapshot'|'nested': {'status', 'queries', 'ms', 'bytes'}}.
+    """
+    sizes = {'projects': 10, 'milestones': 10, 'tasks': max(tasks // 100, 1), 'logs': 0, 'members': 5}
+    workspace = seed_workspace(sizes, index=False)
+    client = _authenticated_client(workspace['user'])
+    return {
+        'snapshot': _measure_route(client, 'get', '/api/projects/snapshot/', None, repeat),
+        'nested': _measure_route(client, 'get', '/api/projects/', None, repeat),
+    }
+
+
+def benchmark_log_feed(logs=3_000_000, repeat=5, batch_size=10000):
+    """
+    Seed ``logs`` logs over 10 projects, 5 of them the user's, and fetch the
+    first page and a page halfway down the project feed and the all-logs
+    feed. The same pages are also read the way the feeds did before keyset
+    pagination, with OFFSET and with OR + DISTINCT (limited to one page,
+    the old views returned every row).
+
+    Returns {'routes': {name: {'status', 'queries', 'ms', 'bytes'}},
+    'baselines': {name: {'queries', 'ms'}}}.
+    """
+    owner = User.objects.create_user('feed-owner', 'feed@bench.local', 'bench')
+    authors = [owner] + User.objects.bulk_create([
+        User(username=f'feed-author-{i}', email=f'author-{i}@bench.local') for i in range(4)
+    ])
+    projects = Project.objects.bulk_create([Project(name=f'Feed project {i}', owner=owner) for i in range(10)])
+    ProjectPermission.objects.bulk_create([
+        ProjectPermission(project=project, user=owner, role='admin') for project in projects[:5]
+    ])
+    rows = (
+        Log(project=projects[i % len(projects)], user=authors[i % len(authors) - 1], message=f'Change {i}')
+        for i in range(logs)
+    )
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        Log.objects.bulk_create(batch)
+
+    project = projects[0]
+    project_feed = Log.objects.filter(project=project).order_by(*LOG_ORDERING)
+    member_projects = ProjectPermission.objects.filter(user=owner).values('project_id')
+    own_feed = Log.objects.filter(Q(project_id__in=member_projects) | Q(user=owner)).order_by(*LOG_ORDERING)
+    depth = logs // len(projects) // 2
+    project_cursor = encode_cursor(project_feed.values_list('timestamp', 'id')[depth])
+    own_cursor = encode_cursor(own_feed.values_list('timestamp', 'id')[depth])
+
+    client = _authenticated_client(owner)
+    routes = {
+        'project first page': f'/api/projects/{project.pk}/logs/',
+        'project deep page': f'/api/projects/{project.pk}/logs/?cursor={project_cursor}',
+        'all-logs first page': '/api/logs/',
+        'all-logs deep page': f'/api/logs/?cursor={own_cursor}',
+    }
+    baselines = {
+        'project offset page': lambda: list(project_feed[depth:depth + DEFAULT_PAGE_SIZE]),
+        'or+distinct page': lambda: list(
+            Log.objects.filter(Q(project__permissions__user=owner) | Q(user=owner)).distinct()
+            .order_by('-timestamp')[:DEFAULT_PAGE_SIZE]
+        ),
+    }
+
+    results = {'routes': {}, 'baselines': {}}
+    for name, path in routes.items():
+        results['routes'][name] = _measure_route(client, 'get', path, None, repeat)
+    for name, query in baselines.items():
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            ms, _ = _median_ms(query, repeat)
+        results['baselines'][name] = {'queries': queries.count // repeat, 'ms': ms}
+    return results
+
+
+def benchmark_schedule(tasks=50_000, edges=200_000, repeat=5, seed=0):
+    """
+    Seed one project with ``tasks`` tasks over 50 milestones and ``edges``
+    random dependencies between nearby tasks (an acyclic graph, mostly FS),
+    and time the steps of its critical path schedule: loading the graph,
+    the CPM passes, the response payload, and an update of one task's dates,
+    plus the schedule endpoint with a cold and a warm schedule cache.
+
+    Returns {'steps': {name: {'queries', 'ms'}}, 'endpoint': {'cold'|'warm':
+    {'status', 'queries', 'ms', 'bytes'}}}.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    owner = User.objects.create_user('schedule-owner', 'schedule@bench.local', 'bench')
+    project = Project.objects.create(name='Schedule project', owner=owner)
+    ProjectPermission.objects.create(project=project, user=owner, role='admin')
+    milestones = Milestone.objects.bulk_create([Milestone(project=project, name=f'Milestone {i}') for i in range(50)])
+    created = []
+    for i in range(tasks):
+        # a tenth without dates, which start with the project and take no time
+        start = None if i % 10 == 0 else now + timedelta(hours=i)
+        created.append(Task(
+            milestone=milestones[i * len(milestones) // tasks], title=f'Task {i}', description='',
+            start_date=start, due_date=start and start + timedelta(days=rng.randint(1, 5)),
+        ))
+    task_ids = [task.pk for task in Task.objects.bulk_create(created, batch_size=5000)]
+
+    pairs = set()
+    while len(pairs) < min(edges, tasks * (tasks - 1) // 2):
+        first = rng.randrange(tasks - 1)
+        pairs.add((first, rng.randrange(first + 1, min(tasks, first + 1000))))
+    kinds = rng.choices(['FS', 'SS', 'FF', 'SF'], weights=[7, 1, 1, 1], k=len(pairs))
+    Dependency.objects.bulk_create([
+        Dependency(from_task_id=task_ids[first], to_task_id=task_ids[second], type=kind)
+        for (first, second), kind in zip(sorted(pairs), kinds)
+    ], batch_size=5000)
+
+    graph = {}
+    schedule = {}
+
+    def load():
+        graph['tasks'], _, graph['edges'] = load_project_graph(project.pk)
+
+    def compute():
+        schedule['current'] = ProjectSchedule(graph['tasks'], graph['edges'])
+
+    def update():
+        # one of the first tasks, so most of the graph is downstream of it
+        task_id = task_ids[rng.randrange(1, 100)]
+        start, duration = schedule['current'].tasks[task_id]
+        schedule['current'].update({task_id: (start, duration + 3600)})
+
+    steps = {}
+    for name, step in (('load graph', load), ('cpm passes', compute), ('payload', lambda: schedule['current'].payload()), ('update one task', update)):
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            ms, _ = _median_ms(step, repeat)
+        steps[name] = {'queries': queries.count // repeat, 'ms': ms}
+
+    client = _authenticated_client(owner)
+    path = f'/api/projects/{project.pk}/schedule/'
+    return {
+        'steps': steps,
+        'endpoint': {
+            'cold': _measure_route(client, 'get', path, None, repeat),
+            'warm': _measure_route(client, 'get', path, None, repeat, cold=False),
+        },
+    }
+
+
+def benchmark_digest(logs=100_000, repeat=5, batch_size=10000):
+    """
+    Seed a report group of 3 projects with ``logs`` logs, and as many in
+    projects of no group, and time its report digest over the last day:
+    capped at DIGEST_MAX_CHARS and uncapped, with query count, size and
+    peak Python memory.
+
+    Returns {name: {'queries', 'ms', 'chars', 'peak_kb'}}.
+    """
+    owner = User.objects.create_user('digest-owner', 'digest@bench.local', 'bench')
+    authors = [owner] + User.objects.bulk_create([
+        User(username=f'digest-author-{i}', email=f'author-{i}@bench.local') for i in range(4)
+    ])
+    projects = Project.objects.bulk_create([Project(name=f'Digest project {i}', owner=owner) for i in range(6)])
+    group = GroupModel.objects.create(verbose='Digest group', groupID='bench', systemMainPrompt='Summarize')
+    group.projects.set(projects[:3])
+    rows = (
+        Log(project=projects[i % len(projects)], user=authors[i % len(authors)], message=f'Task {i} changed status to Done')
+        for i in range(logs * 2)
+    )
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        Log.objects.bulk_create(batch)
+
+    to_time = timezone.now()
+    from_time = to_time - timedelta(days=1)
+    results = {}
+    for name, max_chars in (('capped', DIGEST_MAX_CHARS), ('uncapped', float('inf'))):
+        def digest():
+            return build_log_digest(group, from_time, to_time, max_chars)
+
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            ms, text = _median_ms(digest, repeat)
+        tracemalloc.start()
+        digest()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {'queries': queries.count // repeat, 'ms': ms, 'chars': len(text), 'peak_kb': peak // 1024}
+    return results
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2), result
+
+
+def benchmark_json(scale, repeat=5):
+    """
+    Encode the full ProjectSerializer payload of a seeded workspace, and
+    parse it back, with DRF's stdlib classes and with core.renderers.
+    Returns {'stdlib'|'fast': {'render_ms', 'parse_ms', 'bytes'}, 'orjson': bool}.
+    """
+    workspace = seed_workspace(scale)
+    projects = Project.objects.filter(permissions__user=workspace['user']).prefetch_related(*PROJECT_TREE_PREFETCH)
+    data = ProjectSerializer(projects, many=True).data
+
+    results = {'orjson': orjson is not None}
+    for name, renderer, parser in (('stdlib', JSONRenderer(), JSONParser()), ('fast', FastJSONRenderer(), FastJSONParser())):
+        render_ms, content = _median_ms(lambda: renderer.render(data, 'application/json'), repeat)
+        parse_ms, _ = _median_ms(lambda: parser.parse(io.BytesIO(content), 'application/json', {}), repeat)
+        results[name] = {'render_ms': render_ms, 'parse_ms': parse_ms, 'bytes': len(content)}
+    return results
+
+
+# the read paths served by core.async_views under ASGI
+LOAD_TEST_ROUTES = ('project-list', 'project-detail', 'task-list', 'log-list', 'milestone-logs', 'all-logs')
+
+
+def _root_urlconf(async_reads):
+    # a stand-in for SERVER.urls with the API served by the sync or the async read views
+    urlconf = types.ModuleType(f"loadtest_urls_{'async' if async_reads else 'sync'}")
+    urlconf.urlpatterns = [path('api/', include(build_urlpatterns(async_reads)))]
+    return urlconf
+
+
+def _percentiles(timings, elapsed):
+    timings = sorted(timings)
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(timings[len(timings) // 2], 2),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 2),
+    }
+
+
+def _wsgi_load(path, query, authorization, concurrency, requests, threads):
+    # ``concurrency`` clients sharing a server with ``threads`` worker threads
+    handler = WSGIHandler()
+    workers = threading.BoundedSemaphore(threads)
+    timings, errors = [], []
+
+    def client(count):
+        for _ in range(count):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+                'HTTP_AUTHORIZATION': authorization, 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+            }
+            statuses = []
+            started = time.perf_counter()
+            with workers:
+                response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+                b''.join(response)
+                response.close()
+            timings.append((time.perf_counter() - started) * 1000)
+            if not statuses[0].startswith('200'):
+                errors.append(statuses[0])
+
+    clients = [threading.Thread(target=client, args=(requests // concurrency,)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return timings, errors, time.perf_counter() - started
+
+
+def _asgi_load(path, query, authorization, concurrency, requests):
+    # ``concurrency`` clients on one event loop, as under an ASGI server
+    handler = ASGIHandler()
+    timings, errors = [], []
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'query_string': query.encode(), 'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        'headers': [(b'host', b'testserver'), (b'authorization', authorization.encode())],
+    }
+
+    async def call():
+        received = []
+
+        async def receive():
+            if received:
+                # the client stays connected until the response is sent
+                await asyncio.Future()
+            received.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        started = time.perf_counter()
+        await handler(dict(scope), receive, send)
+        timings.append((time.perf_counter() - started) * 1000)
+        if messages[0]['status'] != 200:
+            errors.append(messages[0]['status'])
+
+    async def client(count):
+        for _ in range(count):
+            await call()
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(client(requests // concurrency) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    return timings, errors, elapsed
+
+
+def run_load_test(scale, concurrency=100, requests=1000, threads=8, db_latency_ms=1.0, routes=None):
+    """
+    Hit the hot read routes with ``concurrency`` simultaneous clients, once
+    through Django's WSGI handler with the APIViews and ``threads`` server
+    threads, once through its ASGI handler with core.async_views.
+
+    The handlers are called in-process, without a server or sockets, so
+    this compares how each one waits, not network stacks. ``db_latency_ms``
+    is added to every query to stand in for a database on another host;
+    the in-memory test database answers in microseconds.
+
+    Returns {route name: {'wsgi'|'asgi': {'rps', 'p50_ms', 'p99_ms', 'errors'}}}.
+    """
+    workspace = seed_workspace(scale)
+    ids = {key: value.pk if isinstance(value, User) else value for key, value in workspace.items()}
+    authorization = f"Bearer {AccessToken.for_user(workspace['user'])}"
+
+    def latency(execute, sql, params, many, context):
+        time.sleep(db_latency_ms / 1000)
+        return execute(sql, params, many, context)
+
+    def add_latency(sender, connection, **kwargs):
+        connection.execute_wrappers.append(latency)
+
+    if db_latency_ms:
+        # every thread gets its own connection, the ASGI handler even one per request
+        connection_created.connect(add_latency)
+        connection.execute_wrappers.append(latency)
+
+    results = {}
+    try:
+        for name, method, url, body in BENCHMARK_ROUTES:
+            if name not in (routes or LOAD_TEST_ROUTES):
+                continue
+            route_path, _, query = _fill(url, ids).partition('?')
+            results[name] = {}
+            for mode in ('wsgi', 'asgi'):
+                with override_settings(ROOT_URLCONF=_root_urlconf(mode == 'asgi'), INSTRUMENTATION_SAMPLE_RATE=0):
+                    if mode == 'wsgi':
+                        timings, errors, elapsed = _wsgi_load(route_path, query, authorization, concurrency, requests, threads)
+                    else:
+                        timings, errors, elapsed = _asgi_load(route_path, query, authorization, concurrency, requests)
+                results[name][mode] = {**_percentiles(timings, elapsed), 'errors': len(errors)}
+    finally:
+        if db_latency_ms:
+            connection_created.disconnect(add_latency)
+            connection.execute_wrappers.remove(latency)
+    return results
+
+
+def _search_vocabulary(size=20000, seed=0):
+    # pronounceable pseudo-words, most frequent first
+    syllables = ['ba', 'ko', 'ri', 'tu', 'me', 'sa', 'no', 'li', 'de', 'pa', 'gu', 'fi', 'zo', 've', 'ha', 'ju']
+    vocabulary = [''.join(word) for word in itertools.product(syllables, repeat=4)]
+    random.Random(seed).shuffle(vocabulary)
+    return vocabulary[:size]
+
+
+def _search_corpus(documents, projects, vocabulary, seed=0):
+    # words drawn with Zipf frequencies, like real text
+    rng = random.Random(seed)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    for i in range(documents):
+        kind = SearchDocument.KIND_CHOICES[i % 3][0]
+        words = rng.choices(vocabulary, cum_weights=weights, k=16)
+        yield SearchDocument(
+            kind=kind, object_id=i, project_id=projects[i % len(projects)],
+            title=' '.join(words[:4]) if kind == 'task' else '', body=' '.join(words[4:]),
+        )
+
+
+def benchmark_search(documents=1_000_000, repeat=20, batch_size=10000):
+    """
+    Index ``documents`` synthetic search documents over 20 projects and time
+    indexing, single-document updates and searches of a member of 4 of the
+    projects: ranked full-text search against the LIKE scan it replaces.
+
+    Returns {'indexing': {...}, 'queries': {name: {'terms', 'fts_p50_ms',
+    'fts_p99_ms', 'like_p50_ms', 'like_p99_ms', 'hits'}}}.
+    """
+    owner = User.objects.create_user('search-owner', 'search@bench.local', 'bench')
+    projects = [project.pk for project in Project.objects.bulk_create([
+        Project(name=f'Search project {i}', owner=owner) for i in range(20)
+    ])]
+    member_projects = projects[:4]
+
+    vocabulary = _search_vocabulary()
+    corpus = _search_corpus(documents, projects, vocabulary)
+    started = time.perf_counter()
+    while True:
+        batch = list(itertools.islice(corpus, batch_size))
+        if not batch:
+            break
+        SearchDocument.objects.bulk_create(batch)
+    index_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    backend = get_search_backend()
+    backend.optimize()
+    optimize_seconds = time.perf_counter() - started
+
+    rng = random.Random(1)
+    updates = []
+    for _ in range(repeat):
+        # an existing log document (every third object id from 2) with new text
+        log = Log(pk=rng.randrange(2, documents, 3), project_id=projects[0], message=' '.join(rng.sample(vocabulary, 12)))
+        started = time.perf_counter()
+        index_documents([(log, log.project_id)])
+        updates.append((time.perf_counter() - started) * 1000)
+
+    queries = {
+        'frequent word': [vocabulary[0]],
+        'common word': [vocabulary[100]],
+        'rare word': [vocabulary[10000]],
+        'prefix': [vocabulary[50][:5]],
+        'two words': [vocabulary[20], vocabulary[300]],
+    }
+    results = {}
+    for name, terms in queries.items():
+        fts, like = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            hits = backend.search(terms, member_projects, [], 21)
+            fts.append((time.perf_counter() - started) * 1000)
+
+            condition = Q()
+            for term in terms:
+                condition &= Q(title__icontains=term) | Q(body__icontains=term)
+            started = time.perf_counter()
+            list(SearchDocument.objects.filter(condition, project_id__in=member_projects).order_by('-id')[:21])
+            like.append((time.perf_counter() - started) * 1000)
+        fts.sort()
+        like.sort()
+        results[name] = {
+            'terms': ' '.join(terms),
+            'hits': len(hits),
+            'fts_p50_ms': round(fts[len(fts) // 2], 2),
+            'fts_p99_ms': round(fts[min(len(fts) - 1, int(len(fts) * 0.99))], 2),
+            'like_p50_ms': round(like[len(like) // 2], 2),
+            'like_p99_ms': round(like[min(len(like) - 1, int(len(like) * 0.99))], 2),
+        }
+    return {
+        'indexing': {
+            'documents': documents,
+            'docs_per_s': round(documents / index_seconds),
+            'optimize_s': round(optimize_seconds, 2),
+            'update_p50_ms': round(sorted(updates)[len(updates) // 2], 2),
+        },
+        'queries': results,
+    }
+
+
+def over_budget(results, budgets, time_tolerance=2.0, bytes_tolerance=1.1, time_slack_ms=20):
+    """
+    The budget breaches in ``results``: [(route, metric, measured, budget)].
+    Query counts must not exceed the budget at all; wall time and size are
+    allowed ``time_tolerance`` / ``bytes_tolerance`` times their budget.
+    Times within ``time_slack_ms`` of the budget always pass, so scheduler
+    noise on millisecond routes doesn't fail the run. Time breaches depend
+    on the machine, the command only fails on them when asked to.
+    """
+    breaches = []
+    for name, measured in results.items():
+        budget = budgets.get(name)
+        if budget is None:
+            breaches.append((name, 'budget', None, None))
+            continue
+        if measured['status'] != budget['status']:
+            breaches.append((name, 'status', measured['status'], budget['status']))
+        if measured['queries'] > budget['queries']:
+            breaches.append((name, 'queries', measured['queries'], budget['queries']))
+        if measured['ms'] > max(budget['ms'] * time_tolerance, budget['ms'] + time_slack_ms):
+            breaches.append((name, 'ms', measured['ms'], budget['ms']))
+        if measured['bytes'] > budget['bytes'] * bytes_tolerance:
+            breaches.append((name, 'bytes', measured['bytes'], budget['bytes']))
+    return breaches
@@ -0,0 +1,222 @@
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import Milestone, Task, Log
+from .permissions import get_project_roles, EDIT_ROLES
+from .realtime import broadcast, hub
+from .rollups import record_activities
+from .search import index_documents, move_task_documents
+from .serializers import BulkTaskFieldsSerializer, BulkTaskReferencesSerializer
+from .snapshot import move_task_rows
+
+
+MAX_BULK_OPERATIONS = 500
+BULK_OPERATIONS = ('create', 'update', 'move', 'delete')
+
+
+def task_log_message(task, old_description, user):
+    message = f"{task} change status to {task.status}"
+    if old_description != task.description:
+        message = task.description
+        if task.assignee_id is not None and user.pk != task.assignee_id:
+            message += f"\nUser {user.get_full_name()} assigned the task to user {task.assignee.get_full_name()}"
+    return message
+
+
+class TaskBatch:
+    """
+    Validates a list of task operations and applies them in one transaction.
+
+    Each operation is a dict with an ``op`` of create, update, move or delete:
+    create needs ``milestone`` plus task fields, update needs ``id`` plus the
+    fields to change, move needs ``id``, ``milestone`` and optionally ``status``,
+    delete needs ``id``. Either every operation is applied or none is.
+    """
+
+    def __init__(self, request, operations):
+        self.request = request
+        self.operations = operations
+        self.results = [{'op': operation.get('op')} if isinstance(operation, dict) else {} for operation in operations]
+        self.errors = False
+
+    def fail(self, index, error):
+        self.results[index]['error'] = error
+        self.errors = True
+
+    def parse(self):
+        """The validated id and milestone of each operation, None for those with a bad op or reference."""
+        self.references = []
+        for index, operation in enumerate(self.operations):
+            references = None
+            if not isinstance(operation, dict) or operation.get('op') not in BULK_OPERATIONS:
+                self.fail(index, f"op must be one of {', '.join(BULK_OPERATIONS)}")
+            else:
+                serializer = BulkTaskReferencesSerializer(data=operation)
+                if serializer.is_valid():
+                    references = serializer.validated_data
+                else:
+                    self.fail(index, serializer.errors)
+            self.references.append(references)
+
+    def load(self):
+        roles = get_project_roles(self.request)
+        task_ids = {references['id'] for references in self.references if references and 'id' in references}
+        milestone_ids = {
+            references['milestone'] for references in self.references if references and 'milestone' in references
+        }
+
+        self.roles = roles
+        tasks = Task.objects.select_related('milestone__project', 'assignee').filter(
+            pk__in=task_ids, milestone__project_id__in=roles
+        )
+        milestones = Milestone.objects.select_related('project').filter(pk__in=milestone_ids, project_id__in=roles)
+        self.tasks = {task.pk: task for task in tasks}
+        self.milestones = {milestone.pk: milestone for milestone in milestones}
+
+    def can_edit(self, project_id):
+        return self.roles.get(project_id) in EDIT_ROLES
+
+    def validate(self):
+        self.parse()
+        self.load()
+        self.creates, self.updates, self.deletes = [], [], []
+        assignees = set()
+
+        for index, (operation, references) in enumerate(zip(self.operations, self.references)):
+            if references is None:
+                continue
+            op = operation['op']
+
+            task = None
+            if op != 'create':
+                task = self.tasks.get(references.get('id'))
+                if task is None:
+                    self.fail(index, 'Task not found')
+                    continue
+                if not self.can_edit(task.milestone.project_id):
+                    self.fail(index, 'Permission denied')
+                    continue
+
+            milestone = None
+            if op in ('create', 'move'):
+                milestone = self.milestones.get(references.get('milestone'))
+                if milestone is None:
+                    self.fail(index, 'Milestone not found')
+                    continue
+                if not self.can_edit(milestone.project_id):
+                    self.fail(index, 'Permission denied')
+                    continue
+
+            if op == 'delete':
+                self.deletes.append((index, task))
+                continue
+
+            data = {key: value for key, value in operation.items() if key not in ('op', 'id', 'milestone')}
+            if op == 'move':
+                data = {'status': data['status']} if 'status' in data else {}
+            serializer = BulkTaskFieldsSerializer(data=data, partial=op != 'create')
+            if not serializer.is_valid():
+                self.fail(index, serializer.errors)
+                continue
+            fields = serializer.validated_data
+            if fields.get('assignee') is not None:
+                assignees.add(fields['assignee'])
+
+            if op == 'create':
+                self.creates.append((index, milestone, fields))
+            else:
+                self.updates.append((index, task, milestone, fields))
+
+        self.users = User.objects.in_bulk(list(assignees))
+        for index, *_, fields in self.creates + self.updates:
+            if fields.get('assignee') is not None and fields['assignee'] not in self.users:
+                self.fail(index, {'assignee': ['User not found']})
+
+        return not self.errors
+
+    def apply(self):
+        now = timezone.now()
+        user = self.request.user
+        logs = []
+
+        with transaction.atomic():
+            created = []
+            for index, milestone, fields in self.creates:
+                task = Task(milestone=milestone, **self.model_fields(fields))
+                created.append(task)
+            Task.objects.bulk_create(created)
+            for (index, *_), task in zip(self.creates, created):
+                self.results[index]['id'] = task.pk
+
+            changed_fields = {'updated_at'}
+            updated = []
+            activity = []
+            moved = {}
+            for index, task, milestone, fields in self.updates:
+                old_description = task.description
+                if milestone is not None and milestone.project_id != task.milestone.project_id:
+                    moved.setdefault(task.pk, task.milestone.project_id)
+                if milestone is not None:
+                    task.milestone = milestone
+                    changed_fields.add('milestone')
+                for attr, value in self.model_fields(fields).items():
+                    setattr(task, attr, value)
+                    changed_fields.add(attr)
+                task.updated_at = now
+                updated.append(task)
+                if task.status != task._loaded_status:
+                    activity.append((task.milestone.project_id, task.assignee_id, 'status_changes'))
+                    if task.status == 'Done':
+                        activity.append((task.milestone.project_id, task.assignee_id, 'tasks_completed'))
+                    task._loaded_status = task.status
+                logs.append(Log(
+                    project=task.milestone.project,
+                    user=user,
+                    message=task_log_message(task, old_description, user),
+                    task=task,
+                ))
+                self.results[index]['id'] = task.pk
+            if updated:
+                Task.objects.bulk_update(updated, sorted(changed_fields))
+
+            delete_ids = {task.pk for index, task in self.deletes}
+            if delete_ids:
+                Task.objects.filter(pk__in=delete_ids).delete()
+            for index, task in self.deletes:
+                self.results[index]['id'] = task.pk
+
+            logs = Log.objects.bulk_create([log for log in logs if log.task_id not in delete_ids])
+            activity.extend((log.project_id, log.user_id, 'log_entries') for log in logs)
+            record_activities(activity)
+
+            # the project a task was in before the batch, unless it ends up there again
+            moved = {
+                task_id: project_id for task_id, project_id in moved.items()
+                if self.tasks[task_id].milestone.project_id != project_id
+            }
+            move_task_rows(moved, now)
+            for task_id in moved:
+                move_task_documents(task_id, self.tasks[task_id].milestone.project_id)
+            index_documents(
+                [(task, task.milestone.project_id) for task in created + updated if task.pk not in delete_ids]
+                + [(log, log.project_id) for log in logs]
+            )
+
+            if hub.active:
+                pushed = defaultdict(list)
+                for task in created + updated:
+                    if task.pk not in delete_ids:
+                        pushed[task.milestone.project_id].append(task)
+                for log in logs:
+                    pushed[log.project_id].append(log)
+                for project_id, rows in pushed.items():
+                    broadcast(project_id, rows)
+
+        return self.results
+
+    def model_fields(self, fields):
+        fields = dict(fields)
+        if 'assignee' in fields:
+            fields['assignee'] = self.users.get(fields['assignee'])
+        return fields
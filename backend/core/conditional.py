@@ -0,0 +1,107 @@
+import hashlib
+from django.db.models import Count, F, Max, Value
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .snapshot import SNAPSHOT_TABLES
+
+
+def make_etag(request, *state):
+    """
+    Strong ETag over ``state`` plus what else shapes the body: the path,
+    query string (page cursor, limit) and the negotiated format.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    parts = (request.get_full_path(), getattr(renderer, 'format', None), *state)
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    return bool(header) and (header.strip() == '*' or etag in parse_etags(header))
+
+
+def not_modified(request, etag):
+    """A bodiless 304 when the client's If-None-Match already has ``etag``, else None."""
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return None
+
+
+def _state_query(querysets, field, group=None):
+    # one UNION query of (latest value, row count) per queryset, per ``group`` value if given
+    branches = []
+    for index, queryset in enumerate(querysets):
+        keys = {'branch': Value(index)}
+        if group is not None:
+            keys['state_group'] = F(group[index])
+        columns = list(keys)
+        branches.append(
+            queryset.annotate(**keys).values(*columns)
+            .annotate(latest=Max(field), rows=Count('pk')).values_list(*columns, 'latest', 'rows')
+        )
+    return branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+
+
+def _flatten(rows):
+    # put back in queryset order
+    return [value for row in sorted(rows) for value in row]
+
+
+def _project_querysets(project_ids):
+    return [
+        model.objects.filter(**{f'{project_lookup}__in': project_ids}).order_by()
+        for model, project_lookup, _ in SNAPSHOT_TABLES.values()
+    ]
+
+
+PROJECT_LOOKUPS = [project_lookup for _, project_lookup, _ in SNAPSHOT_TABLES.values()]
+
+
+def _by_project(project_ids, rows):
+    states = {project_id: [None, 0] * len(PROJECT_LOOKUPS) for project_id in project_ids}
+    for branch, project_id, latest, count in rows:
+        states[project_id][2 * branch:2 * branch + 2] = [latest, count]
+    return states
+
+
+def project_states(project_ids):
+    """
+    {project id: latest ``updated_at`` and row count of every table in the
+    project's tree}, in one query. Any save bumps a timestamp and any
+    delete lowers a count, so a project's state changes whenever its
+    serialized tree could.
+    """
+    rows = _state_query(_project_querysets(project_ids), 'updated_at', PROJECT_LOOKUPS)
+    return _by_project(project_ids, rows)
+
+
+async def aproject_states(project_ids):
+    rows = _state_query(_project_querysets(project_ids), 'updated_at', PROJECT_LOOKUPS)
+    return _by_project(project_ids, [row async for row in rows])
+
+
+def project_state(project_ids):
+    """The projects' states as one value for an ETag."""
+    return sorted(project_states(project_ids).items())
+
+
+async def aproject_state(project_ids):
+    return sorted((await aproject_states(project_ids)).items())
+
+
+def table_states(querysets):
+    """(latest ``updated_at``, row count) of each queryset, in order, in one query."""
+    rows = _state_query([queryset.order_by() for queryset in querysets], 'updated_at')
+    found = {branch: (latest, count) for branch, latest, count in rows}
+    return [found.get(index, (None, 0)) for index in range(len(querysets))]
+
+
+def log_state(querysets):
+    """Newest id and row count of the log feeds; logs are only ever appended or deleted."""
+    return _flatten(_state_query([queryset.order_by() for queryset in querysets], 'id'))
+
+
+async def alog_state(querysets):
+    rows = _state_query([queryset.order_by() for queryset in querysets], 'id')
+    return _flatten([row async for row in rows])
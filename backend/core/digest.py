@@ -0,0 +1,59 @@
+from collections import deque
+from .models import Log
+from .rollups import activity_totals
+
+
+# roughly 25k tokens; the oldest entries are dropped beyond this
+DIGEST_MAX_CHARS = 100_000
+
+
+def iter_log_lines(project_ids, from_time, to_time, chunk_size=2000):
+    """
+    One line per log in (from_time, to_time], oldest first, streamed in
+    chunks. Project and user names come from the same query.
+    """
+    logs = Log.objects.filter(project__in=project_ids, timestamp__lte=to_time)
+    if from_time is not None:
+        logs = logs.filter(timestamp__gt=from_time)
+    rows = logs.order_by('timestamp', 'id').values_list(
+        'timestamp', 'project__name', 'user__username', 'message'
+    ).iterator(chunk_size=chunk_size)
+    for timestamp, project_name, username, message in rows:
+        yield f"{timestamp} Log entry for {project_name} by {username} message: {message}"
+
+
+def activity_summary_lines(project_ids, from_time, to_time):
+    """One line of counters per project member, read from the hourly rollups."""
+    for row in activity_totals(project_ids, from_time, to_time):
+        yield (
+            f"Activity in {row['project__name']} by {row['user__username'] or 'unassigned'}: "
+            f"{row['status_changes']} status changes, {row['tasks_completed']} tasks completed, "
+            f"{row['checklist_completed']} checklist items completed, {row['comments_added']} comments, "
+            f"{row['log_entries']} log entries"
+        )
+
+
+def build_log_digest(group, from_time, to_time, max_chars=DIGEST_MAX_CHARS):
+    """
+    The group's activity between ``from_time`` (None for everything) and
+    ``to_time`` as prompt text. Only the newest lines that fit in
+    ``max_chars`` are kept, preceded by a note of how many were left out
+    and by the per-member counters from the activity rollups.
+    """
+    project_ids = group.projects.values('pk')
+    lines = deque()
+    size = 0
+    omitted = 0
+    for line in iter_log_lines(project_ids, from_time, to_time):
+        lines.append(line)
+        size += len(line) + 1
+        while size > max_chars and lines:
+            size -= len(lines.popleft()) + 1
+            omitted += 1
+
+    if not lines and not omitted:
+        return f"report for not working of persons in team for {group.verbose} project"
+    if omitted:
+        lines.appendleft(f"[{omitted} older log entries omitted]")
+    summary = list(activity_summary_lines(project_ids, from_time, to_time))
+    return "\n".join([*summary, *lines])
@@ -0,0 +1,220 @@
+import contextvars
+import hmac
+import random
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from .scheduling import schedule_cache
+from .tree_cache import project_tree_cache
+
+
+# metrics of the request being handled; None when it isn't sampled
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'sql', 'serialize', 'render', 'bytes')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.bytes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self, total):
+        return ", ".join([
+            f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+class MetricsRegistry:
+    """Per-process totals by (view, method), in Prometheus text format via render()."""
+
+    FIELDS = (
+        ('requests', 'api_requests_total', 'counter', 'Sampled requests'),
+        ('seconds', 'api_request_seconds_total', 'counter', 'Time spent handling sampled requests'),
+        ('queries', 'api_db_queries_total', 'counter', 'Database queries run'),
+        ('sql', 'api_db_seconds_total', 'counter', 'Time spent in database queries'),
+        ('serialize', 'api_serialize_seconds_total', 'counter', 'Time spent in serializer .data, including the queries it runs'),
+        ('render', 'api_render_seconds_total', 'counter', 'Time spent rendering responses'),
+        ('bytes', 'api_response_bytes_total', 'counter', 'Response payload bytes'),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, method, seconds, metrics):
+        with self._lock:
+            totals = self._views.setdefault((view, method), dict.fromkeys((field for field, *_ in self.FIELDS), 0))
+            totals['requests'] += 1
+            totals['seconds'] += seconds
+            totals['queries'] += metrics.queries
+            totals['sql'] += metrics.sql
+            totals['serialize'] += metrics.serialize
+            totals['render'] += metrics.render
+            totals['bytes'] += metrics.bytes
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(totals) for key, totals in self._views.items()}
+
+    def render(self):
+        views = self.snapshot()
+        lines = []
+        for field, name, kind, help_text in self.FIELDS:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (view, method), totals in sorted(views.items()):
+                lines.append(f'{name}{{view="{view}",method="{method}"}} {totals[field]}')
+        for prefix, stats in (('schedule_cache', schedule_cache.stats()), ('project_tree_cache', project_tree_cache.stats())):
+            for stat, value in stats.items():
+                kind = 'gauge' if stat in ('projects', 'hit_rate') else 'counter'
+                name = f"{prefix}_{stat}" if kind == 'gauge' else f"{prefix}_{stat}_total"
+                lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class InstrumentationMiddleware:
+    """
+    Times a sample of requests (settings.INSTRUMENTATION_SAMPLE_RATE, 0 to 1):
+    queries and SQL time, serializer and renderer time, payload size. Sampled
+    responses carry a Server-Timing header and are added to ``registry``;
+    the others only pay for one random() call.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        # async views run their queries in the request's sync thread (Django
+        # gives each ASGI request its own), so the wrapper is installed there
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        wrapper = await sync_to_async(_enter_wrapper)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrapper.__exit__)(None, None, None)
+            _current.reset(token)
+        return self._finish(request, response, metrics, time.perf_counter() - started)
+
+    def _finish(self, request, response, metrics, total):
+        if not response.streaming:
+            metrics.bytes = len(response.content)
+        response['Server-Timing'] = metrics.server_timing(total)
+        match = request.resolver_match
+        registry.record(match.view_name if match else 'unresolved', request.method, total, metrics)
+        return response
+
+
+def _enter_wrapper(metrics):
+    wrapper = connection.execute_wrapper(metrics)
+    wrapper.__enter__()
+    return wrapper
+
+
+def _timed(prop, field):
+    def getter(self):
+        metrics = _current.get()
+        if metrics is None:
+            return prop.fget(self)
+        started = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            setattr(metrics, field, getattr(metrics, field) + time.perf_counter() - started)
+    getter.instrumented = True
+    return property(getter, prop.fset, prop.fdel, prop.__doc__)
+
+
+def install_drf_hooks():
+    """
+    Time DRF's serializer ``.data`` and ``Response.rendered_content`` for
+    sampled requests. Nested serializers don't go through ``.data``, so only
+    the outermost one is counted, with everything it triggers.
+    """
+    from rest_framework.response import Response
+    from rest_framework.serializers import Serializer, ListSerializer
+
+    for cls, name, field in ((Serializer, 'data', 'serialize'), (ListSerializer, 'data', 'serialize'),
+                             (Response, 'rendered_content', 'render')):
+        prop = cls.__dict__[name]
+        if not getattr(prop.fget, 'instrumented', False):
+            setattr(cls, name, _timed(prop, field))
+
+
+def _may_scrape(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    # without a token only staff may read the metrics, signed in or with an access token
+    user = request.user
+    if not user.is_authenticated:
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return False
+        user = authenticated[0] if authenticated else user
+    return user.is_active and user.is_staff
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; settings.METRICS_TOKEN as a Bearer token, or staff users when it isn't set."""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,151 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+
+class GeminiBackend:
+    """Google Gemini; configured once, with one GenerativeModel per system prompt."""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model_name, generation_config=None):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, system_prompt):
+        with self._lock:
+            if system_prompt not in self._models:
+                self._models[system_prompt] = self.genai.GenerativeModel(
+                    model_name=self.model_name,
+                    generation_config=self.generation_config,
+                    system_instruction=system_prompt,
+                )
+            return self._models[system_prompt]
+
+    def generate(self, system_prompt, prompt, timeout=None):
+        request_options = {} if timeout is None else {"timeout": timeout}
+        response = self._model(system_prompt).generate_content(prompt, request_options=request_options)
+        usage = getattr(response, "usage_metadata", None)
+        return response.text, {
+            "input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        }
+
+
+class FakeBackend:
+    """
+    Deterministic stand-in for tests and benchmarks: the same input always
+    gives the same text, after an optional fixed ``latency`` in seconds.
+    """
+
+    name = "fake"
+
+    def __init__(self, model_name="fake", latency=0):
+        self.model_name = model_name
+        self.latency = latency
+
+    def generate(self, system_prompt, prompt, timeout=None):
+        if self.latency:
+            time.sleep(self.latency if timeout is None else min(self.latency, timeout))
+        digest = hashlib.sha256(f"{system_prompt}\0{prompt}".encode()).hexdigest()[:12]
+        text = f"Report {digest}: {len(prompt.splitlines())} lines of activity reviewed."
+        return text, {"input_tokens": len(prompt.split()), "output_tokens": len(text.split())}
+
+
+LLM_BACKENDS = {
+    "gemini": GeminiBackend,
+    "fake": FakeBackend,
+}
+
+
+class LLMClient:
+    """
+    Wraps a backend with a content-addressed response cache and call stats.
+
+    The cache key is a hash of the backend, model, system prompt and prompt,
+    so a group whose digest hasn't changed (typically "no activity") gets
+    the stored answer without a request. Safe to share between threads.
+    """
+
+    def __init__(self, backend, cache_timeout=24 * 60 * 60):
+        self.backend = backend
+        self.cache_timeout = cache_timeout
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "cache_hits": 0, "errors": 0, "latency": 0.0,
+                       "max_latency": 0.0, "input_tokens": 0, "output_tokens": 0}
+
+    @property
+    def provider(self):
+        return self.backend.name
+
+    def cache_key(self, system_prompt, prompt):
+        content = f"{self.backend.name}\0{self.backend.model_name}\0{system_prompt}\0{prompt}"
+        return f"llm:{hashlib.sha256(content.encode()).hexdigest()}"
+
+    def generate(self, system_prompt, prompt, timeout=None):
+        key = self.cache_key(system_prompt, prompt)
+        text = cache.get(key)
+        if text is not None:
+            self._count(cache_hits=1)
+            return text
+
+        started = time.monotonic()
+        try:
+            text, usage = self.backend.generate(system_prompt, prompt, timeout)
+        except Exception:
+            self._count(errors=1)
+            raise
+        latency = time.monotonic() - started
+
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["latency"] += latency
+            self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+            self._stats["input_tokens"] += usage["input_tokens"]
+            self._stats["output_tokens"] += usage["output_tokens"]
+        cache.set(key, text, self.cache_timeout)
+        return text
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                self._stats[name] += count
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_latency"] = stats["latency"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client(backend=None):
+    """
+    The process-wide client for settings.LLM_BACKEND (or ``backend``),
+    created on first use and then shared by every report thread.
+    """
+    global _client
+    with _client_lock:
+        name = backend or settings.LLM_BACKEND
+        if _client is None or _client.provider != name:
+            backend_class = LLM_BACKENDS[name]
+            if backend_class is GeminiBackend:
+                if not settings.GEMINI_API_KEY:
+                    raise ImproperlyConfigured("The gemini LLM backend needs the GEMINI_API_KEY environment variable")
+                instance = GeminiBackend(settings.GEMINI_API_KEY, settings.LLM_MODEL, settings.LLM_GENERATION_CONFIG)
+            else:
+                instance = backend_class()
+            _client = LLMClient(instance, settings.LLM_CACHE_TIMEOUT)
+        return _client
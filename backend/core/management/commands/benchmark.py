@@ -0,0 +1,190 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from core.benchmark import (
+    BENCHMARK_SCALES, benchmark_digest, benchmark_json, benchmark_log_feed, benchmark_schedule, benchmark_search, benchmark_snapshot,
+    run_benchmark, run_load_test, over_budget,
+)
+
+
+DEFAULT_BUDGETS = Path(__file__).resolve().parents[2] / 'benchmark_budgets.json'
+
+
+class Command(BaseCommand):
+    help = "Call every API route on seeded workspaces and check query count, time and size against stored budgets"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", action="append", choices=sorted(BENCHMARK_SCALES), help="workspace size, repeatable (default: all)")
+        parser.add_argument("--route", action="append", help="only this route name, repeatable")
+        parser.add_argument("--repeat", type=int, default=5, help="calls per route, the median time is kept")
+        parser.add_argument("--budgets", default=str(DEFAULT_BUDGETS), help="budget file")
+        parser.add_argument("--update-budgets", action="store_true", help="store the measured values as the new budgets")
+        parser.add_argument("--time-tolerance", type=float, help="fail on routes slower than this multiple of their time budget (default: report those over twice it)")
+        parser.add_argument("--json", action="store_true", help="compare JSON rendering and parsing of the project payload instead")
+        parser.add_argument("--load", action="store_true", help="load test the hot read routes under WSGI and ASGI instead")
+        parser.add_argument("--concurrency", type=int, default=100, help="simultaneous clients of the load test")
+        parser.add_argument("--requests", type=int, default=1000, help="load test requests per route and server")
+        parser.add_argument("--wsgi-threads", type=int, default=8, help="worker threads of the load tested WSGI server")
+        parser.add_argument("--db-latency", type=float, default=1.0, help="milliseconds added to every load test query")
+        parser.add_argument("--search", action="store_true", help="time full-text indexing and search against LIKE instead")
+        parser.add_argument("--documents", type=int, default=1_000_000, help="documents indexed by the search benchmark")
+        parser.add_argument("--snapshot", action="store_true", help="compare the snapshot tables with the nested project trees instead")
+        parser.add_argument("--tasks", type=int, action="append", help="tasks of the snapshot benchmark, repeatable (default: 10000 and 100000)")
+        parser.add_argument("--log-feed", action="store_true", help="page through the log feeds of a multi-million-row log table instead")
+        parser.add_argument("--logs", type=int, default=3_000_000, help="logs seeded by the log feed benchmark")
+        parser.add_argument("--digest", action="store_true", help="time the report digest of a group with many logs instead")
+        parser.add_argument("--group-logs", type=int, default=100_000, help="logs of the digested group")
+        parser.add_argument("--schedule", action="store_true", help="time the critical path schedule of one large project instead")
+        parser.add_argument("--schedule-tasks", type=int, default=50_000, help="tasks of the scheduled project")
+        parser.add_argument("--edges", type=int, default=200_000, help="dependencies of the scheduled project")
+
+    def handle(self, *args, **options):
+
+        budgets_path = Path(options["budgets"])
+        budgets = json.loads(budgets_path.read_text()) if budgets_path.exists() else {}
+        scales = options["scale"] or list(BENCHMARK_SCALES)
+
+        # everything runs against throwaway test databases, never the real one
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            measured = {}
+            if options["search"]:
+                # one synthetic corpus, the workspace scales don't apply
+                scales = []
+                measured = benchmark_search(options["documents"], repeat=options["repeat"])
+            if options["digest"]:
+                scales = []
+                measured = benchmark_digest(options["group_logs"], repeat=options["repeat"])
+            if options["schedule"]:
+                scales = []
+                measured = benchmark_schedule(options["schedule_tasks"], options["edges"], repeat=options["repeat"])
+            if options["log_feed"]:
+                scales = []
+                measured = benchmark_log_feed(options["logs"], repeat=options["repeat"])
+            if options["snapshot"]:
+                # task counts instead of the workspace scales, each on a fresh database
+                scales = options["tasks"] or [10_000, 100_000]
+            for scale in scales:
+                if options["snapshot"]:
+                    measured[scale] = benchmark_snapshot(scale, repeat=options["repeat"])
+                elif options["json"]:
+                    measured[scale] = benchmark_json(scale, repeat=options["repeat"])
+                elif options["load"]:
+                    measured[scale] = run_load_test(
+                        scale, concurrency=options["concurrency"], requests=options["requests"],
+                        threads=options["wsgi_threads"], db_latency_ms=options["db_latency"], routes=options["route"],
+                    )
+                else:
+                    measured[scale] = run_benchmark(scale, repeat=options["repeat"], routes=options["route"])
+                runner.teardown_databases(old_config)
+                old_config = runner.setup_databases()
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        if options["json"]:
+            for scale, results in measured.items():
+                self.stdout.write(f"\n{scale} project payload{'' if results['orjson'] else ' (orjson not installed)'}")
+                self.stdout.write(f"  {'':<8}{'render ms':>11}{'parse ms':>10}{'bytes':>10}")
+                for name in ('stdlib', 'fast'):
+                    result = results[name]
+                    self.stdout.write(f"  {name:<8}{result['render_ms']:>11}{result['parse_ms']:>10}{result['bytes']:>10}")
+            return
+
+        if options["digest"]:
+            self.stdout.write(f"\n{options['group_logs']} logs in the group")
+            self.stdout.write(f"  {'digest':<10}{'queries':>9}{'ms':>10}{'chars':>12}{'peak kB':>10}")
+            for name, result in measured.items():
+                self.stdout.write(
+                    f"  {name:<10}{result['queries']:>9}{result['ms']:>10}{result['chars']:>12}{result['peak_kb']:>10}"
+                )
+            return
+
+        if options["schedule"]:
+            self.stdout.write(f"\n{options['schedule_tasks']} tasks, {options['edges']} dependencies")
+            self.stdout.write(f"  {'step':<18}{'status':>7}{'queries':>9}{'ms':>10}{'bytes':>12}")
+            for name, result in measured["steps"].items():
+                self.stdout.write(f"  {name:<18}{'':>7}{result['queries']:>9}{result['ms']:>10}{'':>12}")
+            for name, result in measured["endpoint"].items():
+                self.stdout.write(
+                    f"  {'endpoint ' + name:<18}{result['status']:>7}{result['queries']:>9}{result['ms']:>10}{result['bytes']:>12}"
+                )
+            return
+
+        if options["log_feed"]:
+            self.stdout.write(f"\n{options['logs']} logs")
+            self.stdout.write(f"  {'feed':<22}{'status':>7}{'queries':>9}{'ms':>10}{'bytes':>10}")
+            for name, result in measured["routes"].items():
+                self.stdout.write(f"  {name:<22}{result['status']:>7}{result['queries']:>9}{result['ms']:>10}{result['bytes']:>10}")
+            for name, result in measured["baselines"].items():
+                self.stdout.write(f"  {name:<22}{'':>7}{result['queries']:>9}{result['ms']:>10}{'':>10}")
+            return
+
+        if options["snapshot"]:
+            for tasks, results in measured.items():
+                self.stdout.write(f"\n{tasks} tasks")
+                self.stdout.write(f"  {'endpoint':<10}{'status':>7}{'queries':>9}{'ms':>10}{'bytes':>12}")
+                for name, result in results.items():
+                    self.stdout.write(
+                        f"  {name:<10}{result['status']:>7}{result['queries']:>9}{result['ms']:>10}{result['bytes']:>12}"
+                    )
+            return
+
+        if options["search"]:
+            indexing = measured["indexing"]
+            self.stdout.write(
+                f"\n{indexing['documents']} documents indexed at {indexing['docs_per_s']}/s, "
+                f"optimized in {indexing['optimize_s']}s, {indexing['update_p50_ms']}ms per update"
+            )
+            self.stdout.write(f"  {'query':<15}{'hits':>6}{'fts p50':>10}{'fts p99':>10}{'like p50':>10}{'like p99':>10}")
+            for name, result in measured["queries"].items():
+                self.stdout.write(
+                    f"  {name:<15}{result['hits']:>6}{result['fts_p50_ms']:>10}{result['fts_p99_ms']:>10}"
+                    f"{result['like_p50_ms']:>10}{result['like_p99_ms']:>10}"
+                )
+            return
+
+        if options["load"]:
+            for scale, results in measured.items():
+                self.stdout.write(
+                    f"\n{scale}, {options['concurrency']} clients, {options['wsgi_threads']} WSGI threads, "
+                    f"{options['db_latency']}ms per query"
+                )
+                self.stdout.write(f"  {'route':<16}{'server':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+                for name, modes in results.items():
+                    for mode, result in modes.items():
+                        self.stdout.write(
+                            f"  {name:<16}{mode:>7}{result['rps']:>9}{result['p50_ms']:>9}{result['p99_ms']:>9}{result['errors']:>8}"
+                        )
+            return
+
+        breaches = []
+        for scale, results in measured.items():
+            self.stdout.write(f"\n{scale}")
+            self.stdout.write(f"  {'route':<22}{'status':>7}{'queries':>9}{'ms':>10}{'bytes':>10}")
+            for name, result in results.items():
+                self.stdout.write(f"  {name:<22}{result['status']:>7}{result['queries']:>9}{result['ms']:>10}{result['bytes']:>10}")
+            if not options["update_budgets"]:
+                breaches += [(scale, *breach) for breach in over_budget(results, budgets.get(scale, {}), options["time_tolerance"] or 2.0)]
+
+        if options["update_budgets"]:
+            for scale, results in measured.items():
+                budgets.setdefault(scale, {}).update(results)
+            budgets_path.write_text(json.dumps(budgets, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(f"\nbudgets written to {budgets_path}")
+            return
+
+        # query counts, status and size are the gate; wall time only with --time-tolerance
+        failures = [breach for breach in breaches if breach[2] != 'ms' or options["time_tolerance"]]
+        for scale, name, metric, value, budget in breaches:
+            style = self.style.ERROR if (scale, name, metric, value, budget) in failures else self.style.WARNING
+            if metric == 'budget':
+                self.stdout.write(style(f"{scale} {name}: no budget stored"))
+            else:
+                self.stdout.write(style(f"{scale} {name}: {metric} {value} over budget {budget}"))
+        if failures:
+            raise CommandError(f"{len(failures)} budget breaches")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.query_plans import HOT_QUERIES, plan_problem, prefer_indexes
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot queries and fail if one no longer uses its index"
+
+    def handle(self, *args, **options):
+        prefer_indexes()
+
+        failures = []
+        for label, queryset, index in HOT_QUERIES:
+            plan = queryset().explain()
+            problem = plan_problem(plan, index)
+            if problem:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"FAIL {label}: {problem}, expected {index or 'an index'}\n{plan}"))
+            else:
+                self.stdout.write(f"ok   {label}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries lost their index")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from core.outbox import deliver_pending
+from core.telegram import TelegramClient
+from time import sleep
+
+
+class Command(BaseCommand):
+    help = "Send queued report messages to Telegram"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="messages sent per batch")
+        parser.add_argument("--interval", type=float, default=5, help="seconds between batches when the outbox is empty")
+        parser.add_argument("--max-attempts", type=int, default=8, help="attempts before a message is marked failed")
+        parser.add_argument("--api-url", help="Bot API base URL, e.g. a local stub")
+        parser.add_argument("--once", action="store_true", help="send one batch and exit")
+
+    def handle(self, *args, **options):
+
+        client = TelegramClient(api_url=options["api_url"])
+        try:
+            while True:
+
+                stats = deliver_pending(client, batch_size=options["batch_size"], max_attempts=options["max_attempts"])
+                if stats["sent"] or stats["retried"] or stats["failed"]:
+                    print(f"telegram outbox: {stats['sent']} sent, {stats['retried']} retried, {stats['failed']} failed")
+                if options["once"]:
+                    break
+
+                if stats["retry_after"] is not None:
+                    sleep(stats["retry_after"])
+                elif not stats["sent"]:
+                    sleep(options["interval"])
+        finally:
+            client.close()
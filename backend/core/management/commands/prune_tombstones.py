@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.snapshot import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete the tombstones older than TOMBSTONE_RETENTION_DAYS, e.g. daily from cron"
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} tombstones pruned"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_sync_updated_at_tombstone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['project', '-timestamp', '-id'], name='log_project_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='log_user_timestamp_idx'),
+        ),
+    ]
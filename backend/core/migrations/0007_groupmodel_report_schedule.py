@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:07
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_last_report(apps, schema_editor):
+    GroupModel = apps.get_model('core', 'GroupModel')
+    ReportModel = apps.get_model('core', 'ReportModel')
+    latest = ReportModel.objects.filter(group__isnull=False).values('group').annotate(last=Max('created_at'))
+    for row in latest:
+        GroupModel.objects.filter(pk=row['group']).update(lastReportAt=row['last'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_log_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupmodel',
+            name='lastReportAt',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='groupmodel',
+            name='updatedAt',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_last_report, migrations.RunPython.noop),
+    ]
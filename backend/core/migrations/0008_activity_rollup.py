@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_groupmodel_report_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('status_changes', models.PositiveIntegerField(default=0)),
+                ('tasks_completed', models.PositiveIntegerField(default=0)),
+                ('comments_added', models.PositiveIntegerField(default=0)),
+                ('checklist_completed', models.PositiveIntegerField(default=0)),
+                ('log_entries', models.PositiveIntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='core.project')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'hour'], name='activity_project_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'user', 'hour'), name='activity_rollup_bucket')],
+            },
+        ),
+    ]
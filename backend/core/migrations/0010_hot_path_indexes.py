@@ -0,0 +1,63 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+ROLE_RANK = {'viewer': 0, 'editor': 1, 'admin': 2}
+
+
+def drop_duplicates(apps, schema_editor):
+    # the unique constraints below would fail on rows duplicated so far;
+    # a member keeps their oldest row with the strongest role they held
+    ProjectPermission = apps.get_model('core', 'ProjectPermission')
+    TaskTag = apps.get_model('core', 'TaskTag')
+
+    duplicated = ProjectPermission.objects.values('project', 'user').annotate(rows=Count('pk')).filter(rows__gt=1)
+    for row in duplicated:
+        permissions = list(ProjectPermission.objects.filter(project=row['project'], user=row['user']).order_by('pk'))
+        kept = permissions[0]
+        kept.role = max((permission.role for permission in permissions), key=lambda role: ROLE_RANK.get(role, -1))
+        kept.save(update_fields=['role'])
+        ProjectPermission.objects.filter(pk__in=[permission.pk for permission in permissions[1:]]).delete()
+
+    duplicated = TaskTag.objects.values('task', 'tag').annotate(rows=Count('pk'), kept=Min('pk')).filter(rows__gt=1)
+    for row in duplicated:
+        TaskTag.objects.filter(task=row['task'], tag=row['tag']).exclude(pk=row['kept']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_telegram_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='projectpermission',
+            index=models.Index(fields=['user', 'project', 'role'], name='permission_user_roles_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportmodel',
+            index=models.Index(fields=['group', '-created_at'], name='report_group_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['milestone', 'status'], name='task_milestone_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assignee', 'due_date'], name='task_assignee_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectpermission',
+            constraint=models.UniqueConstraint(fields=('project', 'user'), name='project_permission_member'),
+        ),
+        migrations.AddConstraint(
+            model_name='tasktag',
+            constraint=models.UniqueConstraint(fields=('task', 'tag'), name='task_tag_unique'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# external-content FTS5 table over core_searchdocument, kept in step by triggers
+SQLITE_INDEX = [
+    """CREATE VIRTUAL TABLE core_searchdocument_fts USING fts5(
+        title, body, content='core_searchdocument', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER core_searchdocument_ai AFTER INSERT ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER core_searchdocument_ad AFTER DELETE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER core_searchdocument_au AFTER UPDATE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO core_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER core_searchdocument_au",
+    "DROP TRIGGER core_searchdocument_ad",
+    "DROP TRIGGER core_searchdocument_ai",
+    "DROP TABLE core_searchdocument_fts",
+]
+
+# a generated tsvector column with a GIN index; the database recomputes it on every write
+POSTGRES_INDEX = [
+    """ALTER TABLE core_searchdocument ADD COLUMN document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')
+    ) STORED""",
+    "CREATE INDEX search_document_fts_idx ON core_searchdocument USING GIN (document)",
+]
+POSTGRES_DROP = [
+    "DROP INDEX search_document_fts_idx",
+    "ALTER TABLE core_searchdocument DROP COLUMN document",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_full_text_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX})
+
+
+def drop_full_text_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP})
+
+
+def index_existing_rows(apps, schema_editor):
+    SearchDocument = apps.get_model('core', 'SearchDocument')
+    Task = apps.get_model('core', 'Task')
+    Comment = apps.get_model('core', 'Comment')
+    Log = apps.get_model('core', 'Log')
+
+    sources = [
+        ('task', Task.objects.values_list('pk', 'milestone__project_id', 'pk', 'title', 'description')),
+        ('comment', Comment.objects.values_list('pk', 'task__milestone__project_id', 'task_id', 'text')),
+        ('log', Log.objects.values_list('pk', 'project_id', 'task_id', 'message')),
+    ]
+    for kind, rows in sources:
+        batch = []
+        for object_id, project_id, task_id, *text in rows.iterator(chunk_size=5000):
+            batch.append(SearchDocument(
+                kind=kind, object_id=object_id, project_id=project_id, task_id=task_id,
+                title=text[0] if kind == 'task' else '', body=text[-1],
+            ))
+            if len(batch) == 5000:
+                SearchDocument.objects.bulk_create(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('comment', 'Comment'), ('log', 'Log')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.task')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='search_document_object')],
+            },
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
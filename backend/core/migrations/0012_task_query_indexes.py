@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['milestone', 'start_date'], name='task_milestone_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['milestone', 'due_date'], name='task_milestone_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['milestone', 'deadline'], name='task_milestone_deadline_idx'),
+        ),
+    ]
@@ -1,12 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
 from google.auth import default
-from telebot import TeleBot
-from SERVER.settings import BOTFATHER_HASH
+from django.db import transaction
 
 class Project(models.Model):
     name = models.CharField(max_length=255)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_projects')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -20,6 +20,17 @@ class ProjectPermission(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='permissions')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            # one role per member, the views get() it by (project, user)
+            models.UniqueConstraint(fields=['project', 'user'], name='project_permission_member'),
+        ]
+        indexes = [
+            # a user's roles, loaded on every request; covers the whole lookup
+            models.Index(fields=['user', 'project', 'role'], name='permission_user_roles_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.role} on {self.project.name}"
@@ -27,6 +38,7 @@ class ProjectPermission(models.Model):
 class Milestone(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='milestones')
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.name} ({self.project.name})"
@@ -46,23 +58,49 @@ class Task(models.Model):
     start_date = models.DateTimeField(null=True, blank=True)
     due_date = models.DateTimeField(null=True, blank=True)
     deadline = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['milestone', 'status'], name='task_milestone_status_idx'),
+            models.Index(fields=['assignee', 'due_date'], name='task_assignee_due_idx'),
+            # date ranges and orderings of the task query within a milestone
+            models.Index(fields=['milestone', 'start_date'], name='task_milestone_start_idx'),
+            models.Index(fields=['milestone', 'due_date'], name='task_milestone_due_idx'),
+            models.Index(fields=['milestone', 'deadline'], name='task_milestone_deadline_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.milestone.project.name} - {self.milestone.name})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # remembered so activity rollups can tell a status transition from any other save
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
 class ChecklistItem(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='checklist')
     text = models.CharField(max_length=255)
     is_completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.text} ({'Completed' if self.is_completed else 'Not Completed'})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_completed = instance.__dict__.get('is_completed')
+        return instance
+
 class Comment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.task.title}"
@@ -77,6 +115,7 @@ class Dependency(models.Model):
     from_task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='dependencies_from')
     to_task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='dependencies_to')
     type = models.CharField(max_length=2, choices=TYPE_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.from_task.title} -> {self.to_task.title} ({self.get_type_display()})"
@@ -91,6 +130,12 @@ class Tag(models.Model):
 class TaskTag(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='tags')
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'tag'], name='task_tag_unique'),
+        ]
 
     def __str__(self):
         return f"{self.task.title} - {self.tag.name}"
@@ -102,9 +147,73 @@ class Log(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='logs', null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the log feeds, newest first
+            models.Index(fields=['project', '-timestamp', '-id'], name='log_project_timestamp_idx'),
+            models.Index(fields=['user', '-timestamp', '-id'], name='log_user_timestamp_idx'),
+        ]
+
     def __str__(self):
         return f"Log entry for {self.project.name} by {self.user.username}"
 
+class ActivityRollup(models.Model):
+    # per (project, user, hour) activity counters, kept up to date as things happen
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='activity')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    hour = models.DateTimeField()
+    status_changes = models.PositiveIntegerField(default=0)
+    tasks_completed = models.PositiveIntegerField(default=0)
+    comments_added = models.PositiveIntegerField(default=0)
+    checklist_completed = models.PositiveIntegerField(default=0)
+    log_entries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'user', 'hour'], name='activity_rollup_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'hour'], name='activity_project_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"Activity in {self.project.name} at {self.hour}"
+
+class Tombstone(models.Model):
+    # left behind by deleted rows so clients syncing with ?since= can drop them
+    table = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    project_id = models.BigIntegerField(db_index=True)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.table} #{self.object_id} deleted at {self.deleted_at}"
+
+class SearchDocument(models.Model):
+    # the searchable text of a task, comment or log; the database keeps a
+    # full-text index over title and body in step with it (see core/search.py)
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('comment', 'Comment'),
+        ('log', 'Log'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # cascades drop the documents of deleted projects and tasks, including their logs and comments
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_document_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
 
 
 class GroupTimeChoice(models.IntegerChoices):
@@ -123,6 +232,9 @@ class GroupModel(models.Model):
     projects = models.ManyToManyField(Project, blank=True)
     fromTime = models.IntegerField(default=12)
     toTime = models.IntegerField(default=20)
+    # kept by the report scheduler so a restart knows when each group is due
+    lastReportAt = models.DateTimeField(null=True, blank=True)
+    updatedAt = models.DateTimeField(auto_now=True)
     
     
     def __str__(self):
@@ -136,15 +248,49 @@ class ReportModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     group = models.ForeignKey(GroupModel, null=True, blank=True, on_delete=models.CASCADE)
     
+    class Meta:
+        indexes = [
+            # a group's reports, newest first
+            models.Index(fields=['group', '-created_at'], name='report_group_created_idx'),
+        ]
+
     def __str__(self) -> str:
         return str(self.created_at)
 
     
     def save(self, *args, force_insert=False, force_update=False, using=None, update_fields=None):
         
-        # when report created send message to target group
-        if update_fields is None:
-            bot = TeleBot(BOTFATHER_HASH)
-            bot.send_message(self.group.groupID, self.text)
-            
-        return super().save(*args, force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
\ No newline at end of file
+        # when report created queue a message to the target group, the deliver_telegram worker sends it
+        created = self._state.adding
+        with transaction.atomic(using=using):
+            super().save(*args, force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+            if created and self.group is not None:
+                TelegramDelivery.objects.using(using).create(report=self, chatID=self.group.groupID, text=self.text)
+
+
+class TelegramDelivery(models.Model):
+    # outbox row, written in the same transaction as the report it carries
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    report = models.ForeignKey(ReportModel, null=True, blank=True, on_delete=models.SET_NULL, related_name='deliveries')
+    chatID = models.CharField(max_length=100)
+    text = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # parts of a split message already delivered, so a retry doesn't repeat them
+    partsSent = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    nextAttemptAt = models.DateTimeField(auto_now_add=True)
+    lastError = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sentAt = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'nextAttemptAt'], name='delivery_due_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.chatID} ({self.status})"
\ No newline at end of file
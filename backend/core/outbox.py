@@ -0,0 +1,53 @@
+from datetime import timedelta
+from django.utils import timezone
+from .models import TelegramDelivery
+from .telegram import TelegramError, TelegramRateLimited, split_message
+
+
+def deliver_pending(client, batch_size=50, max_attempts=8, backoff=30):
+    """
+    Send up to ``batch_size`` due outbox rows through ``client``, oldest
+    first. Long texts go out as several messages; ``partsSent`` is saved
+    after each so a retry resumes where it stopped. Failures are retried
+    with exponential backoff until ``max_attempts``. A rate limit stops the
+    batch and postpones the row by the ``retry_after`` Telegram asked for.
+
+    Returns {'sent', 'retried', 'failed', 'retry_after'}. Meant for a single
+    worker process (see the deliver_telegram command).
+    """
+    now = timezone.now()
+    deliveries = TelegramDelivery.objects.filter(status='pending', nextAttemptAt__lte=now).order_by('nextAttemptAt', 'id')[:batch_size]
+    stats = {'sent': 0, 'retried': 0, 'failed': 0, 'retry_after': None}
+
+    for delivery in deliveries:
+        parts = split_message(delivery.text)
+        try:
+            for part in parts[delivery.partsSent:]:
+                client.send_message(delivery.chatID, part)
+                delivery.partsSent += 1
+                TelegramDelivery.objects.filter(pk=delivery.pk).update(partsSent=delivery.partsSent)
+        except TelegramRateLimited as e:
+            # not the message's fault, so no attempt is counted
+            delivery.nextAttemptAt = timezone.now() + timedelta(seconds=e.retry_after)
+            delivery.lastError = str(e)
+            delivery.save(update_fields=['nextAttemptAt', 'lastError'])
+            stats['retry_after'] = e.retry_after
+            break
+        except TelegramError as e:
+            delivery.attempts += 1
+            delivery.lastError = str(e)
+            if delivery.attempts >= max_attempts:
+                delivery.status = 'failed'
+                stats['failed'] += 1
+            else:
+                delivery.nextAttemptAt = timezone.now() + timedelta(seconds=backoff * 2 ** (delivery.attempts - 1))
+                stats['retried'] += 1
+            delivery.save(update_fields=['attempts', 'lastError', 'status', 'nextAttemptAt'])
+            continue
+
+        delivery.status = 'sent'
+        delivery.sentAt = timezone.now()
+        delivery.save(update_fields=['status', 'sentAt'])
+        stats['sent'] += 1
+
+    return stats
@@ -0,0 +1,149 @@
+import base64
+import json
+import operator
+from functools import reduce
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    # null stays null, it can't be compared like the other values
+    raw = json.dumps([None if value is None else str(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValidationError({'error': 'Invalid cursor'})
+    if not isinstance(values, list) or len(values) != size:
+        raise ValidationError({'error': 'Invalid cursor'})
+    if not all(value is None or isinstance(value, str) for value in values):
+        raise ValidationError({'error': 'Invalid cursor'})
+    return values
+
+
+def cursor_values(model, ordering, values):
+    """
+    The decoded ``values`` converted to the types of their ``ordering``
+    fields; a tampered cursor is a 400 here rather than a database error
+    once the query runs.
+    """
+    typed = []
+    for field_name, value in zip(ordering, values):
+        field = model._meta.get_field(field_name.lstrip('-'))
+        if value is None and not field.null:
+            # only the nulls of nullable fields are sorted (last) and encoded
+            raise ValidationError({'error': 'Invalid cursor'})
+        try:
+            value = field.to_python(value)
+            if value is not None:
+                field.run_validators(value)
+        except (DjangoValidationError, TypeError, ValueError):
+            raise ValidationError({'error': 'Invalid cursor'})
+        typed.append(value)
+    return typed
+
+
+def get_page_size(request):
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError({'error': 'Invalid limit'})
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def after_cursor(ordering, values, nullable=()):
+    """
+    Q selecting the rows strictly after ``values`` in ``ordering``,
+    e.g. ('-timestamp', '-id') gives ts < v0 OR (ts = v0 AND id < v1).
+
+    Fields in ``nullable`` sort their nulls last in either direction, so
+    nulls come after any value and only ties come after a null.
+    """
+    conditions = []
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        if value is None:
+            equal[f'{name}__isnull'] = True
+            continue
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition = Q(**equal, **{f'{name}__{lookup}': value})
+        if name in nullable:
+            condition |= Q(**equal, **{f'{name}__isnull': True})
+        conditions.append(condition)
+        equal[name] = value
+    return reduce(operator.or_, conditions)
+
+
+def _order_by(ordering, nullable):
+    return [
+        (F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_last=True))
+        if field.lstrip('-') in nullable else field
+        for field in ordering
+    ]
+
+
+def _page_queryset(request, querysets, ordering, page_size):
+    meta = querysets[0].model._meta
+    nullable = {field.lstrip('-') for field in ordering if meta.get_field(field.lstrip('-')).null}
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        values = cursor_values(querysets[0].model, ordering, decode_cursor(cursor, len(ordering)))
+        condition = after_cursor(ordering, values, nullable)
+        querysets = [queryset.filter(condition) for queryset in querysets]
+
+    order_by = _order_by(ordering, nullable)
+    queryset = querysets[0]
+    if len(querysets) > 1:
+        # a page from each branch's own index; OR on the primary key also drops rows found twice
+        branches = [Q(pk__in=branch.order_by(*order_by).values('pk')[:page_size + 1]) for branch in querysets]
+        queryset = queryset.model.objects.filter(reduce(operator.or_, branches))
+    return queryset.order_by(*order_by)[:page_size + 1]
+
+
+def _page(request, rows, ordering, page_size):
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field.lstrip('-')) for field in ordering)
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+    return rows, next_url
+
+
+def keyset_paginate(request, querysets, ordering):
+    """
+    Return one page of rows from ``querysets`` in ``ordering`` plus the
+    URL of the next page (or None).
+
+    Several querysets are read as one query of the rows whose primary key
+    is in the first page of any of them, each branch ordered, filtered by
+    the cursor and limited on its own, so every branch is a short range
+    scan of its own index. ``ordering`` must end in a unique, non-null field (normally
+    'id'); nullable fields before it sort their nulls last.
+    """
+    page_size = get_page_size(request)
+    rows = list(_page_queryset(request, querysets, ordering, page_size))
+    return _page(request, rows, ordering, page_size)
+
+
+async def akeyset_paginate(request, querysets, ordering):
+    """keyset_paginate() for async views."""
+    page_size = get_page_size(request)
+    rows = [row async for row in _page_queryset(request, querysets, ordering, page_size)]
+    return _page(request, rows, ordering, page_size)
+
+
+def link_header(next_url):
+    if next_url is None:
+        return {}
+    return {'Link': f'<{next_url}>; rel="next"'}
@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from .models import Project, ProjectPermission, Milestone, Task
+
+
+EDIT_ROLES = ('admin', 'editor')
+ADMIN_ROLES = ('admin',)
+
+# seconds a user's role map may be served from the cache; saves and deletes
+# of ProjectPermission drop it right away in this process
+PROJECT_ROLES_CACHE_TIMEOUT = 30
+
+
+def _cache_key(user_id):
+    return f'project-roles:{user_id}'
+
+
+def load_project_roles(user_id):
+    roles = cache.get(_cache_key(user_id))
+    if roles is None:
+        roles = dict(ProjectPermission.objects.filter(user_id=user_id).values_list('project_id', 'role'))
+        cache.set(_cache_key(user_id), roles, PROJECT_ROLES_CACHE_TIMEOUT)
+    return roles
+
+
+async def aload_project_roles(user_id):
+    roles = await cache.aget(_cache_key(user_id))
+    if roles is None:
+        queryset = ProjectPermission.objects.filter(user_id=user_id).values_list('project_id', 'role')
+        roles = {project_id: role async for project_id, role in queryset}
+        await cache.aset(_cache_key(user_id), roles, PROJECT_ROLES_CACHE_TIMEOUT)
+    return roles
+
+
+def invalidate_project_roles(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def token_user_id(token):
+    """
+    Id of the user of access token ``token``, None if it isn't valid. For
+    the streaming endpoints, where browsers can't set an Authorization
+    header and the token comes in the query string.
+    """
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(token)).pk
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def token_member_id(token, project_id):
+    """Id of the user of access token ``token`` if they are a member of the project, else None."""
+    user_id = token_user_id(token)
+    if user_id is None or project_id not in load_project_roles(user_id):
+        return None
+    return user_id
+
+
+def get_project_roles(request):
+    """
+    The user's {project_id: role} map, loaded at most once per request.
+    Its keys are the projects the user is a member of.
+    """
+    roles = getattr(request, '_project_roles', None)
+    if roles is None:
+        roles = request._project_roles = load_project_roles(request.user.pk)
+    return roles
+
+
+async def aget_project_roles(request):
+    """get_project_roles() for async views."""
+    roles = getattr(request, '_project_roles', None)
+    if roles is None:
+        roles = request._project_roles = await aload_project_roles(request.user.pk)
+    return roles
+
+
+def project_id_of(obj):
+    if isinstance(obj, Project):
+        return obj.pk
+    if isinstance(obj, Milestone):
+        return obj.project_id
+    if isinstance(obj, Task):
+        return obj.milestone.project_id
+    raise TypeError(f'{type(obj).__name__} does not belong to a project')
+
+
+class HasProjectRole(BasePermission):
+    """
+    Object permission answered from the request's role map without queries.
+
+    Views list the roles each method needs in ``project_roles``,
+    e.g. {'PUT': EDIT_ROLES}; other methods only need membership.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        role = get_project_roles(request).get(project_id_of(obj))
+        required = getattr(view, 'project_roles', {}).get(request.method)
+        if role is None or (required is not None and role not in required):
+            raise PermissionDenied({'error': 'Permission denied'})
+        return True
@@ -0,0 +1,58 @@
+import re
+from datetime import datetime, timezone
+from django.db import connection
+from .models import ProjectPermission, Task, TaskTag, Log, ReportModel
+
+
+# (label, queryset, index expected in the plan; None for any index, e.g. a unique constraint's)
+HOT_QUERIES = [
+    ("project roles of a user (permissions.load_project_roles)",
+     lambda: ProjectPermission.objects.filter(user_id=1).values_list('project_id', 'role'),
+     'permission_user_roles_idx'),
+    ("membership of a user in a project",
+     lambda: ProjectPermission.objects.filter(project_id=1, user_id=1),
+     None),
+    ("project log feed page",
+     lambda: Log.objects.filter(project_id=1).order_by('-timestamp', '-id')[:100],
+     'log_project_timestamp_idx'),
+    ("own log feed page",
+     lambda: Log.objects.filter(user_id=1).order_by('-timestamp', '-id')[:100],
+     'log_user_timestamp_idx'),
+    ("report digest logs",
+     lambda: Log.objects.filter(project_id__in=[1, 2], timestamp__gt=datetime(2024, 1, 1, tzinfo=timezone.utc)).order_by('timestamp', 'id'),
+     'log_project_timestamp_idx'),
+    ("milestone tasks by status",
+     lambda: Task.objects.filter(milestone_id=1, status='Done'),
+     'task_milestone_status_idx'),
+    ("assigned tasks by due date",
+     lambda: Task.objects.filter(assignee_id=1).order_by('due_date'),
+     'task_assignee_due_idx'),
+    ("latest report of a group",
+     lambda: ReportModel.objects.filter(group_id=1).order_by('-created_at')[:1],
+     'report_group_created_idx'),
+    ("tag of a task",
+     lambda: TaskTag.objects.filter(task_id=1, tag_id=1),
+     None),
+]
+
+# a plan line reading the whole table: "SCAN core_task" (SQLite) / "Seq Scan on core_task" (PostgreSQL)
+FULL_SCAN = re.compile(r'\bSCAN (core_\w+)\b(?! USING)|Seq Scan on (core_\w+)')
+
+
+def prefer_indexes():
+    """On PostgreSQL, keep tiny tables from being seq-scanned whatever the indexes."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+
+
+def plan_problem(plan, index):
+    """Why the EXPLAIN output ``plan`` doesn't use ``index`` (any index when None), or None if it does."""
+    scan = FULL_SCAN.search(plan)
+    if scan:
+        return f"full scan of {scan.group(1) or scan.group(2)}"
+    if 'index' not in plan.lower():
+        return "no index used"
+    if index is not None and index not in plan:
+        return f"{index} not used"
+    return None
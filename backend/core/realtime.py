@@ -0,0 +1,141 @@
+import asyncio
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from .models import Task, ChecklistItem, Comment, Log
+from .renderers import FastJSONRenderer
+from .snapshot import SNAPSHOT_TABLES
+
+
+# model -> (table name, columns) of the rows pushed to board subscribers
+REALTIME_TABLES = {
+    Task: ('tasks', SNAPSHOT_TABLES['tasks'][2]),
+    ChecklistItem: ('checklist', SNAPSHOT_TABLES['checklist'][2]),
+    Comment: ('comments', SNAPSHOT_TABLES['comments'][2]),
+    Log: ('logs', ('id', 'project', 'user', 'message', 'timestamp', 'task')),
+}
+
+# sent instead of diffs to a client that fell too far behind; it should refetch the project
+RESYNC = FastJSONRenderer().render({'type': 'resync'}).decode()
+
+
+def row_event(instance, op):
+    """{'table', 'op': 'upsert'|'delete', 'id', 'row'} read from the instance, without queries."""
+    table, columns = REALTIME_TABLES[type(instance)]
+    event = {'table': table, 'op': op, 'id': instance.pk}
+    if op == 'upsert':
+        meta = instance._meta
+        event['row'] = {column: getattr(instance, meta.get_field(column).attname) for column in columns}
+    return event
+
+
+class Subscriber:
+    """One websocket's bounded outbox; a slow reader gets a resync instead of an ever-growing queue."""
+
+    CLOSE = object()
+
+    def __init__(self, project_id, user_id, maxsize, tables=None):
+        self.project_id = project_id
+        self.user_id = user_id
+        # only woken by changes to these tables, all when None
+        self.tables = tables
+        self.queue = asyncio.Queue(maxsize)
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # drop everything it hasn't read, it has to refetch anyway
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(self.CLOSE)
+
+
+class ProjectEventHub:
+    """
+    In-process fan-out of row changes to the websockets watching a project.
+
+    publish() may be called from any thread; everything else runs on the
+    event loop serving the websockets. Changes to a project are collected
+    for ``window`` seconds, reduced to the last state of each row, encoded
+    once and offered to every subscriber of that project.
+    """
+
+    def __init__(self, window=None, queue_size=None):
+        self.window = window if window is not None else getattr(settings, 'REALTIME_COALESCE_WINDOW', 0.1)
+        self.queue_size = queue_size or getattr(settings, 'REALTIME_QUEUE_SIZE', 100)
+        self.loop = None
+        self._subscribers = defaultdict(set)
+        self._pending = {}
+
+    def attach(self, loop):
+        self.loop = loop
+
+    @property
+    def active(self):
+        return self.loop is not None and bool(self._subscribers)
+
+    def publish(self, project_id, events):
+        if self.loop is None or not self._subscribers.get(project_id):
+            return
+        self.loop.call_soon_threadsafe(self._collect, project_id, events)
+
+    def revoke(self, project_id, user_id):
+        """Disconnect the user's subscriptions to the project, e.g. when their permission is removed."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._revoke, project_id, user_id)
+
+    def subscribe(self, project_id, user_id, tables=None):
+        subscriber = Subscriber(project_id, user_id, self.queue_size, tables)
+        self._subscribers[project_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self._subscribers.get(subscriber.project_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.project_id]
+
+    def _collect(self, project_id, events):
+        pending = self._pending.get(project_id)
+        if pending is None:
+            pending = self._pending[project_id] = {}
+            self.loop.call_later(self.window, self._flush, project_id)
+        for event in events:
+            # only the last state of a row within the window is sent
+            pending[event['table'], event['id']] = event
+
+    def _flush(self, project_id):
+        events = list(self._pending.pop(project_id, {}).values())
+        subscribers = list(self._subscribers.get(project_id, ()))
+        if not events or not subscribers:
+            return
+        message = FastJSONRenderer().render({'type': 'diff', 'project': project_id, 'events': events}).decode()
+        changed = {event['table'] for event in events}
+        for subscriber in subscribers:
+            if subscriber.tables is None or not changed.isdisjoint(subscriber.tables):
+                subscriber.offer(message)
+
+    def _revoke(self, project_id, user_id):
+        for subscriber in list(self._subscribers.get(project_id, ())):
+            if subscriber.user_id == user_id:
+                self.unsubscribe(subscriber)
+                subscriber.close()
+
+
+hub = ProjectEventHub()
+
+
+def broadcast(project_id, instances, op='upsert'):
+    """Push ``instances`` of one project to its board subscribers once the transaction commits."""
+    if project_id is None or not hub.active:
+        return
+    events = [row_event(instance, op) for instance in instances]
+    if events:
+        transaction.on_commit(lambda: hub.publish(project_id, events))
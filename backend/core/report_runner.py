@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+
+
+class ReportDeadlineExceeded(Exception):
+    pass
+
+
+class ReportRunner:
+    """
+    Runs one report job per group on a bounded thread pool.
+
+    ``job(group, deadline)`` builds the prompt and stores the report; it calls
+    ``runner.call(provider, func, deadline)`` around each LLM request so calls
+    to the same provider share a concurrency limit and are retried with
+    exponential backoff. ``deadline`` is a time.monotonic() value after which
+    the group is given up on; the remaining time is also passed to ``func``
+    as its timeout. One slow or failing group never holds up the others.
+    """
+
+    def __init__(self, max_workers=8, provider_limits=None, default_limit=2,
+                 call_timeout=60, retries=3, backoff=2.0, group_deadline=300):
+        self.max_workers = max_workers
+        self.provider_limits = provider_limits or {}
+        self.default_limit = default_limit
+        self.call_timeout = call_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.group_deadline = group_deadline
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _semaphore(self, provider):
+        with self._lock:
+            if provider not in self._semaphores:
+                limit = self.provider_limits.get(provider, self.default_limit)
+                self._semaphores[provider] = threading.BoundedSemaphore(limit)
+            return self._semaphores[provider]
+
+    def call(self, provider, func, deadline):
+        """Call ``func(timeout)`` under the provider's limit, retrying failures until ``deadline``."""
+        semaphore = self._semaphore(provider)
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ReportDeadlineExceeded(f"{provider} call ran out of time")
+            if not semaphore.acquire(timeout=remaining):
+                raise ReportDeadlineExceeded(f"waited too long for a free {provider} slot")
+            try:
+                return func(min(self.call_timeout, deadline - time.monotonic()))
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            finally:
+                semaphore.release()
+
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            if time.monotonic() + delay >= deadline:
+                raise ReportDeadlineExceeded(f"{provider} call kept failing")
+            time.sleep(delay)
+
+    def _run_job(self, job, group):
+        deadline = time.monotonic() + self.group_deadline
+        try:
+            return job(group, deadline)
+        finally:
+            # worker threads open their own connections, don't leak them
+            connection.close()
+
+    def submit(self, job, group):
+        """Start ``job`` for ``group`` on the pool and return its Future without waiting for it."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='report')
+            return self._pool.submit(self._run_job, job, group)
+
+    def run(self, groups, job):
+        """Run ``job`` for every group and wait; returns {group pk: result or the exception raised}."""
+        futures = {group.pk: self.submit(job, group) for group in groups}
+        results = {}
+        for group_pk, future in futures.items():
+            try:
+                results[group_pk] = future.result()
+            except Exception as e:
+                results[group_pk] = e
+        return results
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
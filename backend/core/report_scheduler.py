@@ -0,0 +1,96 @@
+import heapq
+from datetime import timedelta
+from django.db.models import Count, Max
+from django.utils.timezone import localtime
+from .models import GroupModel
+
+
+def next_report_time(group, now):
+    """
+    When ``group`` is next due: ``repeetHour`` hours after its last report
+    (or right away if it never had one), moved forward into its daily
+    [fromTime, toTime) local-hour window. None if the window is empty.
+    """
+    if not 0 <= group.fromTime < group.toTime <= 24:
+        return None
+
+    due = now if group.lastReportAt is None else max(group.lastReportAt + timedelta(hours=group.repeetHour), now)
+    due = localtime(due)
+    if due.hour < group.fromTime:
+        due = due.replace(hour=group.fromTime, minute=0, second=0, microsecond=0)
+    elif due.hour >= group.toTime:
+        due = (due + timedelta(days=1)).replace(hour=group.fromTime, minute=0, second=0, microsecond=0)
+    return due
+
+
+class ReportScheduler:
+    """
+    Min-heap of (next due time, group) built from GroupModel alone; the
+    persisted ``lastReportAt`` means a restart needs no report history.
+
+    The groups are reloaded when their count or latest ``updatedAt`` changes,
+    which is checked at least every ``reload_interval`` seconds. Groups
+    popped by pop_due() are running until reported() or failed(); a reload
+    doesn't queue them again, and keeps the retry time of failed groups.
+    """
+
+    def __init__(self, reload_interval=60, retry_delay=300):
+        self.reload_interval = reload_interval
+        self.retry_delay = retry_delay
+        self._heap = []
+        self._groups = {}
+        self._fingerprint = None
+        self._running = set()
+        self._retry_at = {}
+
+    def reload(self, now):
+        fingerprint = GroupModel.objects.aggregate(count=Count('pk'), updated=Max('updatedAt'))
+        if fingerprint == self._fingerprint:
+            return False
+        self._fingerprint = fingerprint
+        self._groups = {group.pk: group for group in GroupModel.objects.all()}
+        self._retry_at = {pk: when for pk, when in self._retry_at.items() if pk in self._groups}
+        self._heap = []
+        for group in self._groups.values():
+            if group.pk not in self._running:
+                self._push(group, self._next_time(group, now))
+        return True
+
+    def _next_time(self, group, now):
+        # a failed group waits out its retry delay, still inside its window
+        retry_at = self._retry_at.get(group.pk)
+        return next_report_time(group, now if retry_at is None else max(now, retry_at))
+
+    def _push(self, group, due):
+        if due is not None:
+            heapq.heappush(self._heap, (due, group.pk))
+
+    def pop_due(self, now):
+        """Remove and return the groups whose time has come; they are running until reported or failed."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, group_pk = heapq.heappop(self._heap)
+            self._running.add(group_pk)
+            due.append(self._groups[group_pk])
+        return due
+
+    def sleep_seconds(self, now):
+        if not self._heap:
+            return self.reload_interval
+        return max(0, min((self._heap[0][0] - now).total_seconds(), self.reload_interval))
+
+    def reported(self, group, when):
+        self._running.discard(group.pk)
+        self._retry_at.pop(group.pk, None)
+        # the group may have been reloaded (or deleted) while its report ran
+        group = self._groups.get(group.pk)
+        if group is not None:
+            group.lastReportAt = when
+            self._push(group, next_report_time(group, when))
+
+    def failed(self, group, now):
+        self._running.discard(group.pk)
+        self._retry_at[group.pk] = now + timedelta(seconds=self.retry_delay)
+        group = self._groups.get(group.pk)
+        if group is not None:
+            self._push(group, self._next_time(group, now))
@@ -0,0 +1,51 @@
+from collections import Counter, defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import ActivityRollup
+
+
+ROLLUP_COUNTERS = ('status_changes', 'tasks_completed', 'comments_added', 'checklist_completed', 'log_entries')
+
+
+def _hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity(project_id, user_id, when=None, **counts):
+    """Add ``counts`` (keyword per ROLLUP_COUNTERS field) to the bucket of that project, user and hour."""
+    counts = {field: count for field, count in counts.items() if count}
+    if project_id is None or not counts:
+        return
+    bucket = {'project_id': project_id, 'user_id': user_id, 'hour': _hour(when or timezone.now())}
+    increments = {field: F(field) + count for field, count in counts.items()}
+
+    if ActivityRollup.objects.filter(**bucket).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            ActivityRollup.objects.create(**bucket, **counts)
+    except IntegrityError:
+        # created by a concurrent writer in the meantime
+        ActivityRollup.objects.filter(**bucket).update(**increments)
+
+
+def record_activities(events):
+    """record_activity for many (project_id, user_id, counter) events, one write per bucket."""
+    buckets = defaultdict(Counter)
+    for project_id, user_id, counter in events:
+        buckets[project_id, user_id][counter] += 1
+    for (project_id, user_id), counts in buckets.items():
+        record_activity(project_id, user_id, **counts)
+
+
+def activity_totals(project_ids, from_time=None, to_time=None):
+    """Counters summed per project and user over the hours touching [from_time, to_time]."""
+    rollups = ActivityRollup.objects.filter(project__in=project_ids)
+    if from_time is not None:
+        rollups = rollups.filter(hour__gte=_hour(from_time))
+    if to_time is not None:
+        rollups = rollups.filter(hour__lte=to_time)
+    return rollups.values('project', 'project__name', 'user', 'user__username').annotate(
+        **{field: Sum(field) for field in ROLLUP_COUNTERS}
+    ).order_by('project', 'user')
@@ -0,0 +1,302 @@
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from .conditional import table_states
+from .models import Milestone, Task, Dependency
+
+
+class DependencyCycleError(Exception):
+
+    def __init__(self, task_ids):
+        self.task_ids = sorted(task_ids)
+        super().__init__(f"Dependency cycle between tasks {self.task_ids}")
+
+
+def _seconds(value):
+    return None if value is None else int(value.timestamp())
+
+
+def _datetime(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def task_timing(start_date, due_date):
+    """(start, duration) of a task in epoch seconds; duration is 0 without both dates."""
+    start, due = _seconds(start_date), _seconds(due_date)
+    duration = max(due - start, 0) if start is not None and due is not None else 0
+    return start, duration
+
+
+def load_project_graph(project_id):
+    """
+    Tasks of a project as {id: (start, duration)} in epoch seconds, its
+    milestone ids and its dependency edges as (from_task, to_task, type),
+    in two queries. Edges reaching outside the project are dropped.
+    """
+    tasks = {}
+    milestones = set()
+    for task_id, milestone_id, start_date, due_date in Task.objects.filter(
+        milestone__project_id=project_id
+    ).values_list('id', 'milestone_id', 'start_date', 'due_date'):
+        tasks[task_id] = task_timing(start_date, due_date)
+        milestones.add(milestone_id)
+
+    edges = [
+        edge for edge in Dependency.objects.filter(from_task__milestone__project_id=project_id).values_list(
+            'from_task_id', 'to_task_id', 'type'
+        )
+        if edge[0] in tasks and edge[1] in tasks
+    ]
+    return tasks, milestones, edges
+
+
+def topological_order(tasks, edges):
+    """Kahn's algorithm over the task ids, raising DependencyCycleError on a cycle."""
+    successors = {task_id: [] for task_id in tasks}
+    in_degree = dict.fromkeys(tasks, 0)
+    for from_id, to_id, _ in edges:
+        successors[from_id].append(to_id)
+        in_degree[to_id] += 1
+
+    queue = deque(task_id for task_id, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        task_id = queue.popleft()
+        order.append(task_id)
+        for successor in successors[task_id]:
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                queue.append(successor)
+
+    if len(order) < len(tasks):
+        raise DependencyCycleError(task_id for task_id, degree in in_degree.items() if degree > 0)
+    return order
+
+
+def _reachable(task_ids, neighbours):
+    seen = set(task_ids)
+    queue = deque(task_ids)
+    while queue:
+        for next_id, _ in neighbours[queue.popleft()]:
+            if next_id not in seen:
+                seen.add(next_id)
+                queue.append(next_id)
+    return seen
+
+
+class ProjectSchedule:
+    """
+    Critical path method over one project's task graph, in O(V + E).
+
+    A task starts no earlier than its own start date (or the project start
+    when it has none) and whatever its predecessors require:
+    FS  successor starts after the predecessor finishes
+    SS  successor starts after the predecessor starts
+    FF  successor finishes after the predecessor finishes
+    SF  successor finishes after the predecessor starts
+    Tasks without successors must finish by the project finish.
+
+    ``early`` and ``late`` map task ids to (start, finish) in epoch seconds.
+    """
+
+    def __init__(self, tasks, edges):
+        self.tasks = dict(tasks)
+        self.order = topological_order(self.tasks, edges)
+        self.position = {task_id: index for index, task_id in enumerate(self.order)}
+        self.predecessors = {task_id: [] for task_id in self.tasks}
+        self.successors = {task_id: [] for task_id in self.tasks}
+        for from_id, to_id, kind in edges:
+            self.predecessors[to_id].append((from_id, kind))
+            self.successors[from_id].append((to_id, kind))
+        self.early = {}
+        self.late = {}
+        self.compute()
+
+    def compute(self):
+        self.project_start = self._project_start()
+        for task_id in self.order:
+            self._forward(task_id)
+        self.project_finish = self._project_finish()
+        for task_id in reversed(self.order):
+            self._backward(task_id)
+
+    def update(self, changes):
+        """
+        Apply new {task_id: (start, duration)} timings without touching the
+        graph. Early dates are recomputed for the changed tasks and everything
+        downstream of them; late dates only depend on durations further down,
+        so they are redone for the changed tasks and their ancestors unless
+        the project finish moved. A new project start redoes everything.
+        """
+        self.tasks.update(changes)
+        if self._project_start() != self.project_start:
+            self.compute()
+            return
+
+        downstream = _reachable(list(changes), self.successors)
+        for task_id in sorted(downstream, key=self.position.__getitem__):
+            self._forward(task_id)
+
+        project_finish = self._project_finish()
+        if project_finish != self.project_finish:
+            self.project_finish = project_finish
+            upstream = self.order
+        else:
+            upstream = sorted(_reachable(list(changes), self.predecessors), key=self.position.__getitem__)
+        for task_id in reversed(upstream):
+            self._backward(task_id)
+
+    def _project_start(self):
+        starts = [start for start, _ in self.tasks.values() if start is not None]
+        return min(starts) if starts else _seconds(timezone.now())
+
+    def _project_finish(self):
+        return max((finish for _, finish in self.early.values()), default=self.project_start)
+
+    def _forward(self, task_id):
+        start, duration = self.tasks[task_id]
+        early_start = self.project_start if start is None else start
+        for from_id, kind in self.predecessors[task_id]:
+            from_start, from_finish = self.early[from_id]
+            if kind == 'FS':
+                early_start = max(early_start, from_finish)
+            elif kind == 'SS':
+                early_start = max(early_start, from_start)
+            elif kind == 'FF':
+                early_start = max(early_start, from_finish - duration)
+            else:
+                early_start = max(early_start, from_start - duration)
+        self.early[task_id] = (early_start, early_start + duration)
+
+    def _backward(self, task_id):
+        _, duration = self.tasks[task_id]
+        late_finish = self.project_finish
+        for to_id, kind in self.successors[task_id]:
+            to_start, to_finish = self.late[to_id]
+            if kind == 'FS':
+                late_finish = min(late_finish, to_start)
+            elif kind == 'SS':
+                late_finish = min(late_finish, to_start + duration)
+            elif kind == 'FF':
+                late_finish = min(late_finish, to_finish)
+            else:
+                late_finish = min(late_finish, to_finish + duration)
+        self.late[task_id] = (late_finish - duration, late_finish)
+
+    def payload(self):
+        """Response body: per-task dates with slack in seconds, and the zero-slack tasks in order."""
+        tasks = {}
+        critical_path = []
+        for task_id in self.order:
+            early_start, early_finish = self.early[task_id]
+            late_start, late_finish = self.late[task_id]
+            slack = late_start - early_start
+            tasks[task_id] = {
+                'early_start': _datetime(early_start),
+                'early_finish': _datetime(early_finish),
+                'late_start': _datetime(late_start),
+                'late_finish': _datetime(late_finish),
+                'slack': slack,
+            }
+            if slack == 0:
+                critical_path.append(task_id)
+        return {'tasks': tasks, 'critical_path': critical_path}
+
+
+class ScheduleCache:
+    """
+    Project schedules kept in process memory, the SCHEDULE_CACHE_SIZE most
+    recently used projects.
+
+    An entry is checked against the database on every get(): the latest
+    updated_at and row count of the project's tasks, dependencies and
+    milestones, in one query. Writes from any process move one of those,
+    so no invalidation has to reach this process. When only task dates can
+    have changed (no row added, removed or moved, no edge or milestone
+    edited), the tasks saved since are re-timed with ProjectSchedule.update
+    instead of reloading the project.
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def _size(self):
+        return self.size or getattr(settings, 'SCHEDULE_CACHE_SIZE', 100)
+
+    @staticmethod
+    def _state(project_id):
+        return table_states([
+            Task.objects.filter(milestone__project_id=project_id),
+            Dependency.objects.filter(from_task__milestone__project_id=project_id),
+            Milestone.objects.filter(project_id=project_id),
+        ])
+
+    @staticmethod
+    def _only_retimed(known, state):
+        # same rows everywhere and untouched edges and milestones: at most task fields changed
+        (_, known_tasks), *known_rest = known
+        (_, tasks), *rest = state
+        return known_tasks == tasks and known_rest == rest
+
+    def get(self, project_id):
+        state = self._state(project_id)
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is not None:
+                self._entries.move_to_end(project_id)
+                if entry['state'] == state:
+                    self.hits += 1
+                    return entry['payload']
+                known = entry['state']
+
+        if entry is not None and self._only_retimed(known, state):
+            saved = Task.objects.filter(
+                milestone__project_id=project_id, updated_at__gt=known[0][0]
+            ).values_list('id', 'start_date', 'due_date')
+            saved = {task_id: task_timing(start_date, due_date) for task_id, start_date, due_date in saved}
+            with self._lock:
+                schedule = entry['schedule']
+                if self._entries.get(project_id) is entry and entry['state'] == known and saved.keys() <= schedule.tasks.keys():
+                    changes = {task_id: timing for task_id, timing in saved.items() if schedule.tasks[task_id] != timing}
+                    if changes:
+                        schedule.update(changes)
+                        entry['payload'] = schedule.payload()
+                    entry['state'] = state
+                    self.updates += 1
+                    return entry['payload']
+
+        with self._lock:
+            self.misses += 1
+        tasks, _, edges = load_project_graph(project_id)
+        schedule = ProjectSchedule(tasks, edges)
+        payload = schedule.payload()
+        with self._lock:
+            # read after ``state``, so never older than it
+            self._entries[project_id] = {'state': state, 'schedule': schedule, 'payload': payload}
+            self._entries.move_to_end(project_id)
+            while len(self._entries) > self._size():
+                self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        """Forget every project, e.g. when the database has been replaced."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'updates': self.updates, 'projects': len(self._entries)}
+
+
+schedule_cache = ScheduleCache()
+
+
+def build_project_schedule(project_id):
+    return schedule_cache.get(project_id)
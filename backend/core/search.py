@@ -0,0 +1,208 @@
+import re
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+from .models import Task, Comment, Log, SearchDocument
+from .pagination import encode_cursor, decode_cursor, get_page_size
+
+
+SEARCH_KINDS = [kind for kind, _ in SearchDocument.KIND_CHOICES]
+
+# words of a query that are looked up; the rest is ignored
+MAX_SEARCH_TERMS = 8
+
+
+def search_terms(query):
+    """The words of a user's query, lowercased; punctuation and search syntax are dropped."""
+    return re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+
+
+def document_for(instance, project_id):
+    """The unsaved SearchDocument of a Task, Comment or Log of the given project."""
+    if isinstance(instance, Task):
+        return SearchDocument(kind='task', object_id=instance.pk, project_id=project_id, task_id=instance.pk,
+                              title=instance.title, body=instance.description)
+    if isinstance(instance, Comment):
+        return SearchDocument(kind='comment', object_id=instance.pk, project_id=project_id, task_id=instance.task_id,
+                              body=instance.text)
+    if isinstance(instance, Log):
+        return SearchDocument(kind='log', object_id=instance.pk, project_id=project_id, task_id=instance.task_id,
+                              body=instance.message)
+    raise TypeError(f'{type(instance).__name__} is not searchable')
+
+
+def index_documents(instances):
+    """
+    Add or refresh the documents of ``instances``, (instance, project id)
+    pairs, in one upsert. Saves do this through signals; bulk writes, which
+    send none, call it directly.
+    """
+    documents = [document_for(instance, project_id) for instance, project_id in instances]
+    if documents:
+        SearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['project', 'task', 'title', 'body'],
+        )
+
+
+def remove_documents(kind, object_ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def move_task_documents(task_id, project_id):
+    # a task moved to another project takes its comments and logs with it
+    SearchDocument.objects.filter(task_id=task_id).exclude(project_id=project_id).update(project_id=project_id)
+
+
+def rebuild_index(batch_size=5000):
+    """Replace every document with one built from the current tasks, comments and logs, in one transaction."""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        sources = [
+            (Task.objects.select_related('milestone'), lambda task: task.milestone.project_id),
+            (Comment.objects.select_related('task__milestone'), lambda comment: comment.task.milestone.project_id),
+            (Log.objects.all(), lambda log: log.project_id),
+        ]
+        indexed = 0
+        for queryset, project_of in sources:
+            batch = []
+            for instance in queryset.iterator(chunk_size=batch_size):
+                batch.append(document_for(instance, project_of(instance)))
+                if len(batch) == batch_size:
+                    SearchDocument.objects.bulk_create(batch)
+                    indexed += len(batch)
+                    batch = []
+            SearchDocument.objects.bulk_create(batch)
+            indexed += len(batch)
+        get_search_backend().optimize()
+    return indexed
+
+
+class SQLiteSearchBackend:
+    """FTS5 table core_searchdocument_fts, ranked by bm25 with titles weighing more than bodies."""
+
+    SCORE = 'bm25(core_searchdocument_fts, %s, 1.0)'
+
+    def __init__(self, title_weight):
+        self.title_weight = title_weight
+
+    @staticmethod
+    def match(terms):
+        # every word, as a prefix: "deploy"* "stag"*
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, terms, project_ids, kinds, page_size, after=None):
+        """(id, kind, object id, project id, task id, title, snippet, score) rows, best first."""
+        score = self.SCORE % self.title_weight
+        sql = [
+            f"SELECT d.id, d.kind, d.object_id, d.project_id, d.task_id, d.title,"
+            f" snippet(core_searchdocument_fts, -1, '', '', '…', 16), {score}"
+            " FROM core_searchdocument_fts JOIN core_searchdocument d ON d.id = core_searchdocument_fts.rowid"
+            " WHERE core_searchdocument_fts MATCH %s"
+            f" AND d.project_id IN ({', '.join(['%s'] * len(project_ids))})"
+        ]
+        params = [self.match(terms), *project_ids]
+        if kinds:
+            sql.append(f" AND d.kind IN ({', '.join(['%s'] * len(kinds))})")
+            params += kinds
+        if after is not None:
+            sql.append(f" AND ({score} > %s OR ({score} = %s AND d.id > %s))")
+            params += [after[0], after[0], after[1]]
+        sql.append(f" ORDER BY {score}, d.id LIMIT %s")
+        params.append(page_size)
+        with connection.cursor() as cursor:
+            cursor.execute(''.join(sql), params)
+            return cursor.fetchall()
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO core_searchdocument_fts(core_searchdocument_fts) VALUES ('optimize')")
+
+
+class PostgresSearchBackend:
+    """Generated tsvector column core_searchdocument.document with a GIN index, ranked by ts_rank."""
+
+    def __init__(self, title_weight):
+        # ts_rank weights of the D, C, B (bodies) and A (titles) labels
+        self.weights = '{0.1, 0.2, %s, 1.0}' % (1.0 / title_weight)
+
+    @staticmethod
+    def match(terms):
+        # every word, as a prefix: deploy:* & stag:*
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def search(self, terms, project_ids, kinds, page_size, after=None):
+        """(id, kind, object id, project id, task id, title, snippet, score) rows, best first."""
+        # negated so that both backends order by ascending score
+        score = f"-ts_rank('{self.weights}', d.document, q.query)"
+        sql = [
+            "SELECT d.id, d.kind, d.object_id, d.project_id, d.task_id, d.title,"
+            " ts_headline('simple', d.body, q.query, 'StartSel=\"\", StopSel=\"\", MaxWords=24, MinWords=8'),"
+            f" {score}"
+            " FROM core_searchdocument d, to_tsquery('simple', %s) AS q(query)"
+            " WHERE d.document @@ q.query AND d.project_id = ANY(%s)"
+        ]
+        params = [self.match(terms), list(project_ids)]
+        if kinds:
+            sql.append(" AND d.kind = ANY(%s)")
+            params.append(list(kinds))
+        if after is not None:
+            sql.append(f" AND ({score} > %s OR ({score} = %s AND d.id > %s))")
+            params += [after[0], after[0], after[1]]
+        sql.append(f" ORDER BY {score}, d.id LIMIT %s")
+        params.append(page_size)
+        with connection.cursor() as cursor:
+            cursor.execute(''.join(sql), params)
+            return cursor.fetchall()
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_searchdocument")
+
+
+# database vendor -> backend; the index itself is created by migration 0011
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        raise ImproperlyConfigured(f'No full-text search backend for {connection.vendor}')
+    return backend_class(getattr(settings, 'SEARCH_TITLE_WEIGHT', 4.0))
+
+
+def search(request, terms, project_ids, kinds=()):
+    """
+    One page of the documents of ``project_ids`` matching all ``terms``, best
+    first (highest ``score``), plus the URL of the next page (or None).
+    Pages are keyset paginated on (score, id) like the log feeds.
+    """
+    if not project_ids:
+        return [], None
+    page_size = get_page_size(request)
+    after = None
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        score, document_id = decode_cursor(cursor, 2)
+        try:
+            after = (float(score), int(document_id))
+        except (TypeError, ValueError):
+            raise ValidationError({'error': 'Invalid cursor'})
+
+    rows = get_search_backend().search(terms, sorted(project_ids), list(kinds), page_size + 1, after)
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor([rows[-1][7], rows[-1][0]]))
+    hits = [
+        {'kind': kind, 'id': object_id, 'project': project_id, 'task': task_id, 'title': title, 'snippet': snippet, 'score': -score}
+        for _, kind, object_id, project_id, task_id, title, snippet, score in rows
+    ]
+    return hits, next_url
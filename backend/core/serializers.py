@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from django.utils import timezone
+from .realtime import broadcast, hub
+from .rollups import record_activity
 from django.contrib.auth.models import User
 from .models import Project, ProjectPermission, Milestone, Task, ChecklistItem, Comment, Dependency, Tag, TaskTag, Log
 
@@ -17,6 +20,51 @@ class ChecklistItemSerializer(serializers.ModelSerializer):
         model = ChecklistItem
         fields = ['id', 'text', 'is_completed']
 
+class TaskChecklistItemSerializer(ChecklistItemSerializer):
+    # writable so updates can be matched to the existing rows
+    id = serializers.IntegerField(required=False)
+
+def sync_checklist(task, items):
+    """
+    Make the task's checklist match ``items`` by id: changed rows are
+    bulk-updated, rows without a known id are bulk-created and rows missing
+    from ``items`` are deleted. Unchanged rows are not written at all.
+    """
+    existing = {item.pk: item for item in task.checklist.all()}
+    now = timezone.now()
+    kept, changed, created = set(), [], []
+
+    for data in items:
+        data = dict(data)
+        item = existing.get(data.pop('id', None))
+        if item is None or item.pk in kept:
+            created.append(ChecklistItem(task=task, **data))
+            continue
+        kept.add(item.pk)
+        if any(getattr(item, field) != value for field, value in data.items()):
+            for field, value in data.items():
+                setattr(item, field, value)
+            item.updated_at = now
+            changed.append(item)
+
+    completed = sum(1 for item in changed if item.is_completed and not item._loaded_is_completed)
+    completed += sum(1 for item in created if item.is_completed)
+    for item in changed:
+        item._loaded_is_completed = item.is_completed
+
+    removed = existing.keys() - kept
+    if removed:
+        ChecklistItem.objects.filter(pk__in=removed).delete()
+    if changed:
+        ChecklistItem.objects.bulk_update(changed, ['text', 'is_completed', 'updated_at'])
+    if created:
+        ChecklistItem.objects.bulk_create(created)
+    # the bulk writes above send no signals
+    if completed:
+        record_activity(task.milestone.project_id, task.assignee_id, checklist_completed=completed)
+    if hub.active:
+        broadcast(task.milestone.project_id, changed + created)
+
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
@@ -39,9 +87,17 @@ class TaskTagSerializer(serializers.ModelSerializer):
         model = TaskTag
         fields = ['id', 'tag']
 
+def set_task_tags(task, tags, replace=True):
+    """Make ``tags`` (repeats allowed) the task's tags, one TaskTag per tag; ``replace`` drops the others."""
+    tag_ids = {tag.pk for tag in tags}
+    if replace:
+        task.tags.exclude(tag_id__in=tag_ids).delete()
+    for tag_id in tag_ids:
+        TaskTag.objects.get_or_create(task=task, tag_id=tag_id)
+
 class TaskSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all(), required=False)
-    checklist = ChecklistItemSerializer(many=True, required=False)
+    checklist = TaskChecklistItemSerializer(many=True, required=False)
     comments = CommentSerializer(many=True, read_only=True)
     dependencies_from = DependencySerializer(many=True, read_only=True)
 
@@ -53,9 +109,17 @@ class TaskSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', [])
         checklist_data = validated_data.pop('checklist', [])
         task = Task.objects.create(**validated_data)
-        task.tags.set(tags)
-        for item_data in checklist_data:
-            ChecklistItem.objects.create(task=task, **item_data)
+        set_task_tags(task, tags, replace=False)
+        checklist = ChecklistItem.objects.bulk_create([
+            ChecklistItem(task=task, **{field: value for field, value in item_data.items() if field != 'id'})
+            for item_data in checklist_data
+        ])
+        # bulk_create sends no signals, so items created completed are counted here, as in sync_checklist
+        completed = sum(1 for item in checklist if item.is_completed)
+        if completed:
+            record_activity(task.milestone.project_id, task.assignee_id, checklist_completed=completed)
+        if hub.active:
+            broadcast(task.milestone.project_id, checklist)
         return task
 
     def update(self, instance, validated_data):
@@ -67,15 +131,39 @@ class TaskSerializer(serializers.ModelSerializer):
         instance.save()
 
         if tags is not None:
-            instance.tags.set(tags)
+            set_task_tags(instance, tags)
 
         if checklist_data is not None:
-            instance.checklist.all().delete()
-            for item_data in checklist_data:
-                ChecklistItem.objects.create(task=instance, **item_data)
+            sync_checklist(instance, checklist_data)
 
         return instance
 
+class SparseTaskSerializer(TaskSerializer):
+    """TaskSerializer rendering only ``fields`` (sparse fieldsets); read-only."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+# the key ranges of AutoField (users) and BigAutoField (everything in core)
+MAX_USER_ID = 2 ** 31 - 1
+MAX_ID = 2 ** 63 - 1
+
+class BulkTaskFieldsSerializer(serializers.ModelSerializer):
+    # checked against the database in one query for the whole batch
+    assignee = serializers.IntegerField(allow_null=True, required=False, min_value=1, max_value=MAX_USER_ID)
+
+    class Meta:
+        model = Task
+        fields = ['title', 'description', 'status', 'assignee', 'start_date', 'due_date', 'deadline']
+
+class BulkTaskReferencesSerializer(serializers.Serializer):
+    # the rows a bulk operation refers to; which are required depends on its op
+    id = serializers.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    milestone = serializers.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+
 class MilestoneSerializer(serializers.ModelSerializer):
     tasks = TaskSerializer(many=True, read_only=True)
 
@@ -0,0 +1,225 @@
+import threading
+from collections import defaultdict
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import Project, ProjectPermission, Milestone, Task, ChecklistItem, Comment, Dependency, TaskTag, Log, Tombstone
+from .permissions import invalidate_project_roles
+from .realtime import REALTIME_TABLES, broadcast, hub
+from .rollups import record_activity
+from .search import index_documents, remove_documents
+from .snapshot import SNAPSHOT_TABLE_NAMES
+
+
+# tables whose project is found through their task
+TASK_CHILDREN = (ChecklistItem, Comment, Dependency, TaskTag)
+
+
+def _project_id(instance):
+    """
+    The id of the instance's project. Looked up ones are kept on the
+    instance with the parent they were found through, so the receivers of
+    one save share a single query, and a moved row is looked up again.
+    """
+    if isinstance(instance, Project):
+        return instance.pk
+    if isinstance(instance, (ProjectPermission, Milestone, Log)):
+        return instance.project_id
+    parent = instance.milestone_id if isinstance(instance, Task) else _parent_task_id(instance)
+    known = getattr(instance, '_project_id_lookup', None)
+    if known is not None and known[0] == parent:
+        return known[1]
+    if isinstance(instance, Task) and Task.milestone.is_cached(instance):
+        project_id = instance.milestone.project_id
+    elif isinstance(instance, Task):
+        project_id = Milestone.objects.filter(pk=parent).values_list('project_id', flat=True).first()
+    else:
+        project_id = Task.objects.filter(pk=parent).values_list('milestone__project_id', flat=True).first()
+    instance._project_id_lookup = (parent, project_id)
+    return project_id
+
+
+def _parent_task_id(instance):
+    return instance.from_task_id if isinstance(instance, Dependency) else instance.task_id
+
+
+def _resolve_deleted_project_ids(rows):
+    """
+    Set ``_deleted_project_id`` on every row of one delete, {model: rows}.
+    Parents deleted along with a row are among ``rows``; the others still
+    exist and are looked up with at most one query per parent table.
+    """
+    milestone_projects = {milestone.pk: milestone.project_id for milestone in rows[Milestone]}
+    milestone_projects.update(
+        (task.milestone_id, task.milestone.project_id) for task in rows[Task] if Task.milestone.is_cached(task)
+    )
+    missing = {task.milestone_id for task in rows[Task]} - milestone_projects.keys()
+    if missing:
+        milestone_projects.update(Milestone.objects.filter(pk__in=missing).values_list('pk', 'project_id'))
+
+    task_projects = {task.pk: milestone_projects.get(task.milestone_id) for task in rows[Task]}
+    missing = {_parent_task_id(row) for model in TASK_CHILDREN for row in rows[model]} - task_projects.keys()
+    if missing:
+        task_projects.update(Task.objects.filter(pk__in=missing).values_list('pk', 'milestone__project_id'))
+
+    for model, instances in rows.items():
+        for instance in instances:
+            if model is Project:
+                instance._deleted_project_id = instance.pk
+            elif model in (ProjectPermission, Milestone):
+                instance._deleted_project_id = instance.project_id
+            elif model is Task:
+                instance._deleted_project_id = task_projects[instance.pk]
+            else:
+                instance._deleted_project_id = task_projects.get(_parent_task_id(instance))
+
+
+# the rows of each delete in progress in this thread, by id() of the delete's
+# origin, which is kept alive with them so its id can't be reused meanwhile
+_deletes = threading.local()
+
+
+def _pending_deletes():
+    if not hasattr(_deletes, 'pending'):
+        _deletes.pending = {}
+    return _deletes.pending
+
+
+@receiver(pre_delete, sender=Project)
+@receiver(pre_delete, sender=ProjectPermission)
+@receiver(pre_delete, sender=Milestone)
+@receiver(pre_delete, sender=Task)
+@receiver(pre_delete, sender=ChecklistItem)
+@receiver(pre_delete, sender=Comment)
+@receiver(pre_delete, sender=Dependency)
+@receiver(pre_delete, sender=TaskTag)
+@receiver(pre_delete, sender=Log)
+def collect_deleted_row(sender, instance, origin=None, **kwargs):
+    # every pre_delete of a delete is sent before its first row is removed
+    _, rows = _pending_deletes().setdefault(id(origin), (origin, {}))
+    rows[sender, instance.pk] = instance
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectPermission)
+@receiver(post_delete, sender=Milestone)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=ChecklistItem)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Dependency)
+@receiver(post_delete, sender=TaskTag)
+@receiver(post_delete, sender=Log)
+def handle_deleted_rows(sender, instance, origin=None, **kwargs):
+    """
+    Tombstones, search documents, caches and board pushes for all the rows
+    of a delete, on its first post_delete. Done per row, a cascade would
+    cost queries for every row it removes.
+    """
+    pending = _pending_deletes().pop(id(origin), None)
+    if pending is None:
+        return
+    rows = defaultdict(list)
+    for (model, _), row in pending[1].items():
+        rows[model].append(row)
+    # logs have no tombstones and aren't pushed, they only leave the search index
+    logs = rows.pop(Log, [])
+    _resolve_deleted_project_ids(rows)
+
+    Tombstone.objects.bulk_create([
+        Tombstone(
+            table=SNAPSHOT_TABLE_NAMES[model],
+            object_id=row.pk,
+            project_id=row._deleted_project_id,
+            user_id=getattr(row, 'user_id', None),
+        )
+        for model, instances in rows.items() for row in instances
+        if row._deleted_project_id is not None
+    ])
+
+    # comments and logs of deleted tasks and projects lose their documents by cascade
+    deleted_task_ids = {task.pk for task in rows[Task]}
+    deleted_project_ids = {project.pk for project in rows[Project]}
+    comment_ids = [comment.pk for comment in rows[Comment] if comment.task_id not in deleted_task_ids]
+    if comment_ids:
+        remove_documents('comment', comment_ids)
+    log_ids = [
+        log.pk for log in logs
+        if log.task_id not in deleted_task_ids and log.project_id not in deleted_project_ids
+    ]
+    if log_ids:
+        remove_documents('log', log_ids)
+
+    changed = defaultdict(list)
+    for model, instances in rows.items():
+        for row in instances:
+            if row._deleted_project_id is not None:
+                changed[row._deleted_project_id].append(row)
+    for project_id, instances in changed.items():
+        broadcast(project_id, [row for row in instances if type(row) in REALTIME_TABLES], 'delete')
+
+
+@receiver(post_save, sender=ProjectPermission)
+@receiver(post_delete, sender=ProjectPermission)
+def drop_cached_project_roles(sender, instance, signal, **kwargs):
+    invalidate_project_roles(instance.user_id)
+    # again once committed, in case a concurrent request cached the old roles meanwhile
+    transaction.on_commit(lambda: invalidate_project_roles(instance.user_id))
+    if signal is post_delete:
+        transaction.on_commit(lambda: hub.revoke(instance.project_id, instance.user_id))
+
+
+@receiver(post_save, sender=Task)
+def count_status_change(sender, instance, created, **kwargs):
+    loaded_status = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if created or loaded_status is None or loaded_status == instance.status:
+        return
+    record_activity(
+        _project_id(instance),
+        instance.assignee_id,
+        status_changes=1,
+        tasks_completed=int(instance.status == 'Done'),
+    )
+
+
+@receiver(post_save, sender=ChecklistItem)
+def count_checklist_completion(sender, instance, created, **kwargs):
+    was_completed = getattr(instance, '_loaded_is_completed', False)
+    instance._loaded_is_completed = instance.is_completed
+    if instance.is_completed and not was_completed:
+        task = Task.objects.filter(pk=instance.task_id).values('milestone__project_id', 'assignee_id').first()
+        if task is not None:
+            record_activity(task['milestone__project_id'], task['assignee_id'], checklist_completed=1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        record_activity(_project_id(instance), instance.author_id, when=instance.timestamp, comments_added=1)
+
+
+@receiver(post_save, sender=Log)
+def count_log_entry(sender, instance, created, **kwargs):
+    if created:
+        record_activity(instance.project_id, instance.user_id, when=instance.timestamp, log_entries=1)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=ChecklistItem)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Log)
+def push_board_update(sender, instance, **kwargs):
+    if not hub.active:
+        # nobody is watching a board in this process, skip the project lookup
+        return
+    broadcast(_project_id(instance), [instance])
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Log)
+def index_for_search(sender, instance, **kwargs):
+    project_id = _project_id(instance)
+    if project_id is not None:
+        index_documents([(instance, project_id)])
+
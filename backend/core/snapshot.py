@@ -0,0 +1,123 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import Project, ProjectPermission, Milestone, Task, ChecklistItem, Comment, Dependency, TaskTag, Tombstone
+
+
+# table name -> (model, lookup from the model to its project id, selected columns)
+# every row is emitted as a plain dict straight from .values(), no serializer involved
+SNAPSHOT_TABLES = {
+    'projects': (Project, 'pk', ('id', 'name', 'owner')),
+    'permissions': (ProjectPermission, 'project_id', ('id', 'project', 'user', 'role')),
+    'milestones': (Milestone, 'project_id', ('id', 'project', 'name')),
+    'tasks': (
+        Task,
+        'milestone__project_id',
+        ('id', 'milestone', 'title', 'description', 'status', 'assignee', 'start_date', 'due_date', 'deadline'),
+    ),
+    'checklist': (ChecklistItem, 'task__milestone__project_id', ('id', 'task', 'text', 'is_completed')),
+    'comments': (Comment, 'task__milestone__project_id', ('id', 'task', 'author', 'text', 'timestamp')),
+    'dependencies': (Dependency, 'from_task__milestone__project_id', ('id', 'from_task', 'to_task', 'type')),
+    'task_tags': (TaskTag, 'task__milestone__project_id', ('id', 'task', 'tag')),
+}
+
+# model -> snapshot table name, used when writing tombstones
+SNAPSHOT_TABLE_NAMES = {model: table for table, (model, _, _) in SNAPSHOT_TABLES.items()}
+
+
+# tables of rows that belong to a task, and the field pointing at it
+TASK_ROW_TABLES = {'checklist': 'task', 'comments': 'task', 'dependencies': 'from_task', 'task_tags': 'task'}
+
+
+def new_sync_cursor():
+    """
+    URL-safe cursor for the next ?since= request: the current time less
+    SYNC_CURSOR_OVERLAP seconds. Rows are stamped when written but show up
+    at commit, so a transaction still open now may commit rows stamped
+    earlier; the overlap sends those (and a few others) again rather than
+    never.
+    """
+    overlap = timedelta(seconds=getattr(settings, 'SYNC_CURSOR_OVERLAP', 60))
+    return (timezone.now() - overlap).isoformat().replace('+00:00', 'Z')
+
+
+def tombstone_horizon():
+    """Tombstones older than this may be pruned, and ?since= cursors older than this are refused."""
+    return timezone.now() - timedelta(days=getattr(settings, 'TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def prune_tombstones():
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=tombstone_horizon()).delete()
+    return deleted
+
+
+def move_task_rows(moves, now):
+    """
+    Sync bookkeeping for tasks moved to another project, {task id: old
+    project id}: in the old project the tasks and their rows are
+    tombstoned, and their rows get ``now`` as updated_at so clients of the
+    new project receive them along with the (already updated) tasks.
+    """
+    if not moves:
+        return
+    tombstones = [Tombstone(table='tasks', object_id=task_id, project_id=project_id) for task_id, project_id in moves.items()]
+    for table, task_field in TASK_ROW_TABLES.items():
+        model = SNAPSHOT_TABLES[table][0]
+        rows = model.objects.filter(**{f'{task_field}_id__in': moves})
+        tombstones += [
+            Tombstone(table=table, object_id=row_id, project_id=moves[task_id])
+            for row_id, task_id in rows.values_list('pk', f'{task_field}_id')
+        ]
+        rows.update(updated_at=now)
+    Tombstone.objects.bulk_create(tombstones)
+
+
+def _table_rows(table, project_ids, condition=None):
+    model, project_lookup, columns = SNAPSHOT_TABLES[table]
+    queryset = model.objects.filter(**{f'{project_lookup}__in': project_ids})
+    if condition is not None:
+        queryset = queryset.filter(condition)
+    return {row['id']: row for row in queryset.values(*columns)}
+
+
+def build_project_snapshot(project_ids):
+    """
+    Return every table of the given projects as {table: {id: row}}.
+    One query per table, rows are plain dicts keyed by primary key.
+    """
+    return {table: _table_rows(table, project_ids) for table in SNAPSHOT_TABLES}
+
+
+def build_project_delta(user, since):
+    """
+    Return the rows of the user's projects upserted or deleted since ``since``.
+
+    Projects the user was granted access to (or whose role changed) after the
+    cursor are sent whole, since their older rows never reached the client.
+    """
+    project_ids = Project.objects.filter(permissions__user=user).values('pk')
+    granted_ids = ProjectPermission.objects.filter(user=user, updated_at__gte=since).values('project_id')
+
+    upserted = {}
+    for table, (_, project_lookup, _) in SNAPSHOT_TABLES.items():
+        changed = Q(updated_at__gte=since) | Q(**{f'{project_lookup}__in': granted_ids})
+        upserted[table] = _table_rows(table, project_ids, changed)
+
+    deleted = {table: [] for table in SNAPSHOT_TABLES}
+    tombstones = Tombstone.objects.filter(deleted_at__gte=since).filter(
+        Q(project_id__in=project_ids) | Q(table='permissions', user_id=user.pk)
+    ).values_list('table', 'object_id', 'project_id', 'user_id')
+    for table, object_id, project_id, user_id in tombstones:
+        deleted[table].append(object_id)
+        # losing your own permission means the whole project is gone for you,
+        # unless access was granted again and the project is being resent
+        if (
+            table == 'permissions'
+            and user_id == user.pk
+            and project_id not in upserted['projects']
+            and project_id not in deleted['projects']
+        ):
+            deleted['projects'].append(project_id)
+
+    return {'upserted': upserted, 'deleted': deleted}
@@ -0,0 +1,147 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from .models import Log, Milestone
+from .pagination import MAX_PAGE_SIZE
+from .permissions import load_project_roles, token_member_id, token_user_id
+from .realtime import hub, Subscriber
+from .renderers import FastJSONRenderer
+from .serializers import LogSerializer
+
+
+def _access_token(request):
+    # EventSource can't set headers, so ?token= is accepted as well
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    return request.GET.get('token', '')
+
+
+def _log_events(logs):
+    renderer = FastJSONRenderer()
+    return ''.join(
+        f"id: {row['id']}\nevent: log\ndata: {renderer.render(row).decode()}\n\n"
+        for row in LogSerializer(logs, many=True).data
+    )
+
+
+async def _newer_logs(project_id, after):
+    queryset = Log.objects.filter(project_id=project_id, id__gt=after).order_by('id')[:MAX_PAGE_SIZE]
+    return [log async for log in queryset]
+
+
+async def _replay_start(project_id, after):
+    """
+    Where to start replaying after log ``after``: at most LOG_STREAM_REPLAY
+    logs are sent, the newest ones. Returns (start, skipped), skipped being
+    the (after, until) id range left out, or None.
+    """
+    replay = getattr(settings, 'LOG_STREAM_REPLAY', MAX_PAGE_SIZE)
+    newer = Log.objects.filter(project_id=project_id, id__gt=after).order_by('-id').values_list('id', flat=True)
+    until = await newer[replay:replay + 1].afirst()
+    if until is None:
+        return after, None
+    return until, (after, until)
+
+
+async def _tail(project_id, user_id, after, follow, skipped=None):
+    """
+    Replay the project's logs with ids above ``after``, then (when
+    ``follow``) send new ones as they are written. ``skipped`` is announced
+    first as an ``event: gap`` with the ids of the logs not replayed,
+    which the client can fetch from the paginated log feed.
+
+    New logs of this process arrive through the realtime hub; every
+    heartbeat also checks the database, which picks up logs written by
+    other processes within one heartbeat interval.
+    """
+    heartbeat = getattr(settings, 'LOG_STREAM_HEARTBEAT', 15)
+    subscriber = None
+    if follow:
+        # subscribe before the replay so nothing written in between is missed
+        hub.attach(asyncio.get_running_loop())
+        subscriber = hub.subscribe(project_id, user_id, tables={'logs'})
+    try:
+        yield f"retry: {getattr(settings, 'LOG_STREAM_RETRY', 3000)}\n\n"
+        if skipped is not None:
+            gap = FastJSONRenderer().render({'after': skipped[0], 'until': skipped[1]}).decode()
+            yield f"event: gap\ndata: {gap}\n\n"
+        replayed = False
+        while True:
+            logs = await _newer_logs(project_id, after)
+            if logs:
+                after = logs[-1].id
+                replayed = True
+                yield _log_events(logs)
+            if len(logs) == MAX_PAGE_SIZE:
+                continue
+            if subscriber is None:
+                if not replayed:
+                    # a dataless event still sets lastEventId, so the reconnect carries a cursor
+                    yield f'id: {after}\n\n'
+                return
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': heartbeat\n\n'
+                continue
+            # whatever else is queued is covered by the next query
+            while message is not Subscriber.CLOSE and not subscriber.queue.empty():
+                message = subscriber.queue.get_nowait()
+            if message is Subscriber.CLOSE:
+                return
+    finally:
+        if subscriber is not None:
+            hub.unsubscribe(subscriber)
+
+
+def _not_a_member():
+    return JsonResponse({'error': 'Not a member of this project'}, status=403)
+
+
+async def _log_stream(request, project_id, user_id):
+    # Last-Event-ID on reconnects, ?after=<log id> to continue from a page the client already has
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    skipped = None
+    if cursor is None:
+        after = await Log.objects.filter(project_id=project_id).order_by('-id').values_list('id', flat=True).afirst() or 0
+    else:
+        try:
+            after = int(cursor)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid Last-Event-ID'}, status=400)
+        # a capped replay, also what a WSGI worker buffers before sending it
+        after, skipped = await _replay_start(project_id, after)
+
+    # a WSGI worker would try to buffer an endless stream; there the response
+    # ends after the replay and EventSource reconnects after `retry` ms
+    follow = isinstance(request, ASGIRequest)
+    response = StreamingHttpResponse(_tail(project_id, user_id, after, follow, skipped), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def project_log_stream(request, project_pk):
+    """Server-Sent Events of the project's logs: ``event: log``, ``id`` the log id, ``data`` as LogSerializer."""
+    user_id = await sync_to_async(token_member_id)(_access_token(request), project_pk)
+    if user_id is None:
+        return _not_a_member()
+    return await _log_stream(request, project_pk, user_id)
+
+
+@require_GET
+async def milestone_log_stream(request, milestone_pk):
+    """The log stream of the milestone's project, like MilestoneLogAPIView: 404 unless the user is a member."""
+    user_id = await sync_to_async(token_user_id)(_access_token(request))
+    if user_id is None:
+        return _not_a_member()
+    roles = await sync_to_async(load_project_roles)(user_id)
+    project_id = await Milestone.objects.filter(pk=milestone_pk, project_id__in=roles).values_list('project_id', flat=True).afirst()
+    if project_id is None:
+        return JsonResponse({'error': 'Milestone not found'}, status=404)
+    return await _log_stream(request, project_id, user_id)
@@ -0,0 +1,89 @@
+from django.db.models import Exists, OuterRef, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import Task, TaskTag
+from .serializers import TaskSerializer
+
+
+STATUSES = [status for status, _ in Task.STATUS_CHOICES]
+
+# ?ordering= values, each paginated on (field, id); prefix with - for descending
+TASK_ORDERINGS = ('id', 'title', 'start_date', 'due_date', 'deadline', 'updated_at')
+
+# ?<field>_after= (inclusive) and ?<field>_before= (exclusive) ranges
+DATE_FILTERS = ('start_date', 'due_date', 'deadline')
+
+# prefetched only when they are among the requested fields
+RELATED_FIELDS = ('checklist', 'comments', 'dependencies_from', 'tags')
+
+
+def _ids(values, param):
+    if not all(value.isdigit() for value in values):
+        raise ValidationError({'error': f'Invalid {param}'})
+    return [int(value) for value in values]
+
+
+def task_filter(query_params):
+    """
+    Q of the tasks matching ?status=, ?assignee= (a user id or "none"),
+    ?tag= and the date ranges. Repeated values of a parameter match any of
+    them, different parameters must all match.
+    """
+    condition = Q()
+
+    statuses = query_params.getlist('status')
+    if statuses:
+        if any(status not in STATUSES for status in statuses):
+            raise ValidationError({'error': f"status must be one of {', '.join(STATUSES)}"})
+        condition &= Q(status__in=statuses)
+
+    assignees = query_params.getlist('assignee')
+    if assignees:
+        assigned = Q(assignee_id__in=_ids([value for value in assignees if value != 'none'], 'assignee'))
+        condition &= (assigned | Q(assignee__isnull=True)) if 'none' in assignees else assigned
+
+    tags = query_params.getlist('tag')
+    if tags:
+        # EXISTS instead of a join, which would repeat tasks having several of the tags
+        condition &= Q(Exists(TaskTag.objects.filter(task=OuterRef('pk'), tag_id__in=_ids(tags, 'tag'))))
+
+    for field in DATE_FILTERS:
+        for suffix, lookup in (('after', 'gte'), ('before', 'lt')):
+            param = f'{field}_{suffix}'
+            value = query_params.get(param)
+            if value is None:
+                continue
+            when = parse_datetime(value)
+            if when is None:
+                raise ValidationError({'error': f'Invalid {param} time'})
+            condition &= Q(**{f'{field}__{lookup}': when})
+
+    return condition
+
+
+def task_ordering(query_params):
+    """The keyset ordering of ?ordering=, 'id' by default; ties are broken by id."""
+    ordering = query_params.get('ordering', 'id')
+    if ordering.lstrip('-') not in TASK_ORDERINGS:
+        raise ValidationError({'error': f"ordering must be one of {', '.join(TASK_ORDERINGS)}, optionally prefixed with -"})
+    return (ordering,) if ordering.lstrip('-') == 'id' else (ordering, 'id')
+
+
+def task_fields(query_params):
+    """The TaskSerializer fields of ?fields=a,b,... (sparse fieldsets), all by default; id is always included."""
+    fields = query_params.get('fields')
+    if not fields:
+        return list(TaskSerializer.Meta.fields)
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - set(TaskSerializer.Meta.fields)
+    if unknown:
+        raise ValidationError({'error': f"Unknown fields {', '.join(sorted(unknown))}"})
+    return [field for field in TaskSerializer.Meta.fields if field in requested or field == 'id']
+
+
+def task_queryset(queryset, fields, ordering):
+    """``queryset`` loading only the columns and relations of ``fields``, plus what ``ordering`` needs."""
+    related = [field for field in fields if field in RELATED_FIELDS]
+    columns = {field for field in fields if field not in RELATED_FIELDS}
+    columns.update(field.lstrip('-') for field in ordering)
+    return queryset.only(*columns).prefetch_related(*related)
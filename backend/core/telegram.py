@@ -0,0 +1,68 @@
+import requests
+from django.conf import settings
+
+
+# Telegram rejects longer messages
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+
+class TelegramError(Exception):
+    pass
+
+
+class TelegramRateLimited(TelegramError):
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def split_message(text, limit=TELEGRAM_MAX_MESSAGE_LENGTH):
+    """Split ``text`` into parts of at most ``limit`` characters, preferring line breaks."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    if text or not parts:
+        parts.append(text)
+    return parts
+
+
+class TelegramClient:
+    """
+    Minimal Bot API client over one ``requests.Session``, so a batch of
+    messages reuses the same connection. ``api_url`` defaults to
+    settings.TELEGRAM_API_URL and can point at a local HTTP stub.
+    """
+
+    def __init__(self, token=None, api_url=None, timeout=30):
+        self.token = token or settings.BOTFATHER_HASH
+        self.api_url = (api_url or settings.TELEGRAM_API_URL).rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send_message(self, chat_id, text):
+        try:
+            response = self.session.post(
+                f"{self.api_url}/bot{self.token}/sendMessage",
+                json={'chat_id': chat_id, 'text': text},
+                timeout=self.timeout,
+            )
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise TelegramError(str(e)) from e
+        if not isinstance(body, dict):
+            # a proxy or stub answering with something other than a Bot API reply
+            raise TelegramError(f"Unexpected reply, HTTP {response.status_code}")
+
+        if response.status_code == 429 or body.get('error_code') == 429:
+            parameters = body.get('parameters')
+            raise TelegramRateLimited(parameters.get('retry_after', 1) if isinstance(parameters, dict) else 1)
+        if not body.get('ok'):
+            raise TelegramError(body.get('description') or f"HTTP {response.status_code}")
+        return body.get('result')
+
+    def close(self):
+        self.session.close()
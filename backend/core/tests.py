@@ -1,3 +1,1761 @@
-from django.test import TestCase
+import asyncio
+import http.server
+import io
+import json
+import threading
+import warnings
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.core.management import CommandError, call_command
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import include, path
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import (
+    Project, ProjectPermission, Milestone, Task, ChecklistItem, Comment, Dependency, Tag, TaskTag, Tombstone, Log,
+    GroupModel, SearchDocument, TelegramDelivery,
+)
+from .async_views import AsyncLogView
+from .benchmark import BENCHMARK_ROUTES, over_budget, run_benchmark
+from .conditional import project_states
+from .digest import build_log_digest
+from .llm import get_llm_client
+from .outbox import deliver_pending
+from .pagination import encode_cursor
+from .report_runner import ReportRunner
+from .rollups import activity_totals
+from .report_scheduler import ReportScheduler
+from .query_plans import HOT_QUERIES, plan_problem, prefer_indexes
+from .renderers import FastJSONParser, FastJSONRenderer
+from .realtime import ProjectEventHub, Subscriber, broadcast, hub
+from .scheduling import DependencyCycleError, ProjectSchedule, ScheduleCache, load_project_graph, schedule_cache
+from .snapshot import SNAPSHOT_TABLES, prune_tombstones
+from .telegram import TelegramClient, TelegramError, TelegramRateLimited
+from .tree_cache import ProjectTreeCache, project_tree_cache
+from .urls import build_urlpatterns
+from .websocket import board_updates
 
-# Create your tests here.
+
+# the API with the plain read views, and again under /async/ with core.async_views
+urlpatterns = [
+    path('api/', include(build_urlpatterns(False))),
+    path('async/api/', include(build_urlpatterns(True))),
+]
+
+
+def create_project(owner, tasks, name='Project'):
+    """A project of one milestone with ``tasks`` tasks, each with two checklist items, a comment, a tag and a dependency."""
+    project = Project.objects.create(name=name, owner=owner)
+    ProjectPermission.objects.create(project=project, user=owner, role='admin')
+    milestone = Milestone.objects.create(project=project, name='Milestone')
+    tag = Tag.objects.create(name='tag', color='#336699')
+    created = Task.objects.bulk_create([
+        Task(milestone=milestone, title=f'Task {i}', description='Description') for i in range(tasks)
+    ])
+    ChecklistItem.objects.bulk_create([ChecklistItem(task=task, text=f'Step {i}') for task in created for i in range(2)])
+    Comment.objects.bulk_create([Comment(task=task, author=owner, text='Looks good') for task in created])
+    TaskTag.objects.bulk_create([TaskTag(task=task, tag=tag) for task in created])
+    Dependency.objects.bulk_create([
+        Dependency(from_task=previous, to_task=task, type='FS') for previous, task in zip(created, created[1:])
+    ])
+    return project
+
+
+class DeleteCascadeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+
+    def delete_queries(self, obj):
+        with CaptureQueriesContext(connection) as queries:
+            obj.delete()
+        return len(queries)
+
+    def test_project_delete_queries_do_not_grow_with_its_rows(self):
+        small = create_project(self.owner, 2, 'Small')
+        large = create_project(self.owner, 20, 'Large')
+        self.assertEqual(self.delete_queries(large), self.delete_queries(small))
+
+    def test_task_delete_queries_do_not_grow_with_its_rows(self):
+        project = create_project(self.owner, 3)
+        task = Task.objects.filter(milestone__project=project).first()
+        baseline = self.delete_queries(task)
+
+        task = Task.objects.filter(milestone__project=project).first()
+        ChecklistItem.objects.bulk_create([ChecklistItem(task=task, text=f'Extra {i}') for i in range(50)])
+        Comment.objects.bulk_create([Comment(task=task, author=self.owner, text='More') for i in range(50)])
+        self.assertEqual(self.delete_queries(task), baseline)
+
+    def test_cascade_leaves_a_tombstone_per_row_in_its_project(self):
+        project = create_project(self.owner, 3)
+        expected = {
+            'projects': [project.pk],
+            'permissions': list(ProjectPermission.objects.filter(project=project).values_list('pk', flat=True)),
+            'milestones': list(Milestone.objects.filter(project=project).values_list('pk', flat=True)),
+            'tasks': list(Task.objects.filter(milestone__project=project).values_list('pk', flat=True)),
+            'checklist': list(ChecklistItem.objects.values_list('pk', flat=True)),
+            'comments': list(Comment.objects.values_list('pk', flat=True)),
+            'dependencies': list(Dependency.objects.values_list('pk', flat=True)),
+            'task_tags': list(TaskTag.objects.values_list('pk', flat=True)),
+        }
+        project_id = project.pk
+        project.delete()
+
+        for table, ids in expected.items():
+            tombstones = Tombstone.objects.filter(table=table)
+            self.assertCountEqual(tombstones.values_list('object_id', flat=True), ids, table)
+            self.assertEqual(set(tombstones.values_list('project_id', flat=True)), {project_id}, table)
+
+    def test_logs_do_not_add_queries_per_row(self):
+        small = create_project(self.owner, 2, 'Small')
+        large = create_project(self.owner, 2, 'Large')
+        for project, logs in ((small, 1), (large, 50)):
+            task = Task.objects.filter(milestone__project=project).first()
+            for i in range(logs):
+                Log.objects.create(project=project, user=self.owner, task=task if i % 2 else None, message='Changed')
+        self.assertEqual(self.delete_queries(large), self.delete_queries(small))
+        self.assertFalse(SearchDocument.objects.filter(kind='log').exists())
+
+    def test_direct_child_delete_is_tombstoned_in_its_project(self):
+        project = create_project(self.owner, 2)
+        item = ChecklistItem.objects.first()
+        item_id = item.pk
+        item.delete()
+        self.assertEqual(
+            list(Tombstone.objects.filter(table='checklist').values_list('object_id', 'project_id')),
+            [(item_id, project.pk)],
+        )
+
+
+class DeltaSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.source = create_project(cls.owner, 2, 'Source')
+        cls.target = create_project(cls.owner, 1, 'Target')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_cursor_reaches_back_over_transactions_still_open(self):
+        cursor = parse_datetime(self.client.get('/api/projects/snapshot/').data['cursor'])
+        self.assertLessEqual(cursor, timezone.now() - timedelta(seconds=59))
+
+        # committed after the cursor was taken, stamped before it
+        task = Task.objects.filter(milestone__project=self.source).first()
+        Task.objects.filter(pk=task.pk).update(title='Late commit', updated_at=timezone.now() - timedelta(seconds=30))
+
+        delta = self.client.get('/api/projects/', {'since': cursor.isoformat()}).data
+        self.assertIn(task.pk, delta['upserted']['tasks'])
+
+    def test_moved_task_is_tombstoned_in_its_old_project(self):
+        cursor = self.client.get('/api/projects/snapshot/').data['cursor']
+        task = Task.objects.filter(milestone__project=self.source).first()
+        item_ids = list(task.checklist.values_list('pk', flat=True))
+        milestone = Milestone.objects.get(project=self.target)
+
+        response = self.client.post('/api/tasks/bulk/', {
+            'operations': [{'op': 'move', 'id': task.pk, 'milestone': milestone.pk}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertCountEqual(
+            Tombstone.objects.filter(project_id=self.source.pk, table='checklist').values_list('object_id', flat=True),
+            item_ids,
+        )
+        delta = self.client.get('/api/projects/', {'since': cursor}).data
+        self.assertIn(task.pk, delta['deleted']['tasks'])
+        # resent for the new project, with the rows that came along
+        self.assertEqual(delta['upserted']['tasks'][task.pk]['milestone'], milestone.pk)
+        self.assertLessEqual(set(item_ids), set(delta['upserted']['checklist']))
+
+    def test_task_moved_back_within_a_batch_is_not_tombstoned(self):
+        task = Task.objects.filter(milestone__project=self.source).first()
+        response = self.client.post('/api/tasks/bulk/', {'operations': [
+            {'op': 'move', 'id': task.pk, 'milestone': Milestone.objects.get(project=self.target).pk},
+            {'op': 'move', 'id': task.pk, 'milestone': task.milestone_id},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_cursor_older_than_tombstone_retention_is_refused(self):
+        since = timezone.now() - timedelta(days=31)
+        self.assertEqual(self.client.get('/api/projects/', {'since': since.isoformat()}).status_code, 410)
+        naive = since.replace(tzinfo=None).isoformat()
+        self.assertEqual(self.client.get('/api/projects/', {'since': naive}).status_code, 410)
+
+    def test_prune_keeps_tombstones_within_retention(self):
+        Tombstone.objects.bulk_create([
+            Tombstone(table='tasks', object_id=1, project_id=self.source.pk),
+            Tombstone(table='tasks', object_id=2, project_id=self.source.pk),
+        ])
+        Tombstone.objects.filter(object_id=1).update(deleted_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [2])
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class LogFeedCursorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 1)
+        cls.milestone = Milestone.objects.get(project=cls.project)
+        Log.objects.bulk_create([Log(project=cls.project, user=cls.owner, message=f'Log {i}') for i in range(5)])
+
+    def setUp(self):
+        # a real token, the async views authenticate it themselves
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.owner)}')
+
+    def feeds(self):
+        for prefix in ('/api', '/async/api'):
+            yield f'{prefix}/projects/{self.project.pk}/logs/'
+            yield f'{prefix}/milestones/{self.milestone.pk}/logs/'
+            yield f'{prefix}/logs/'
+
+    def test_pages_follow_on(self):
+        for url in self.feeds():
+            first = self.client.get(url, {'limit': 3})
+            self.assertEqual(len(first.json()), 3, url)
+            rest = self.client.get(first['Link'][1:first['Link'].index('>')])
+            self.assertEqual(len(rest.json()), 2, url)
+            self.assertFalse({row['id'] for row in first.json()} & {row['id'] for row in rest.json()}, url)
+
+    def test_all_logs_merges_member_projects_and_own_logs_once(self):
+        other = User.objects.create_user('other', 'other@example.com', 'secret')
+        shared = create_project(other, 1, 'Shared')
+        ProjectPermission.objects.create(project=shared, user=self.owner, role='viewer')
+        foreign = create_project(other, 1, 'Foreign')
+        Log.objects.bulk_create(
+            [Log(project=shared, user=other, message=f'Shared {i}') for i in range(4)]
+            + [Log(project=foreign, user=self.owner, message=f'Own {i}') for i in range(3)]
+            + [Log(project=foreign, user=other, message='Not visible')]
+        )
+        expected = list(
+            Log.objects.exclude(message='Not visible').order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+        for prefix in ('/api', '/async/api'):
+            seen = []
+            url = f'{prefix}/logs/?limit=4'
+            while url:
+                response = self.client.get(url)
+                seen += [row['id'] for row in response.json()]
+                url = response['Link'][1:response['Link'].index('>')] if response.has_header('Link') else None
+            self.assertEqual(seen, expected, prefix)
+
+    def test_tampered_cursor_is_a_bad_request(self):
+        cursors = [
+            'not base64 json',
+            encode_cursor(['2026-01-01T00:00:00+00:00']),
+            encode_cursor(['abc', '1']),
+            encode_cursor(['2026-01-01T00:00:00+00:00', 'abc']),
+            encode_cursor(['2026-01-01T00:00:00+00:00', '99999999999999999999999']),
+            'WzEsIDJd',  # [1, 2], not strings
+        ]
+        for url in self.feeds():
+            for cursor in cursors:
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400, (url, cursor))
+
+
+class TaskQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 6)
+        cls.milestone = Milestone.objects.get(project=cls.project)
+        now = timezone.now()
+        for i, task in enumerate(Task.objects.filter(milestone=cls.milestone).order_by('id')):
+            # every other task without a due date
+            task.due_date = now + timedelta(days=i) if i % 2 else None
+            task.save()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def walk(self, params):
+        ids, url = [], '/api/tasks/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data]
+            link = response.get('Link')
+            url, params = (link[1:link.index('>')], None) if link else (None, None)
+        return ids
+
+    def test_nullable_orderings_page_through_every_task_once(self):
+        tasks = Task.objects.filter(milestone=self.milestone)
+        for ordering in ('due_date', '-due_date'):
+            expected = [task.pk for task in tasks if task.due_date is not None]
+            expected.sort(key=lambda pk: tasks.get(pk=pk).due_date, reverse=ordering.startswith('-'))
+            expected += sorted(task.pk for task in tasks if task.due_date is None)
+            self.assertEqual(self.walk({'milestone': self.milestone.pk, 'ordering': ordering, 'limit': 1}), expected)
+
+    def test_tampered_cursor_is_a_bad_request(self):
+        cases = [
+            ('id', [None]),
+            ('id', ['abc']),
+            ('due_date', ['abc', '1']),
+            ('due_date', ['2026-01-01T00:00:00+00:00', None]),
+            ('-due_date', [None, 'abc']),
+            ('title', ['Task 1', '1', '2']),
+        ]
+        for ordering, values in cases:
+            response = self.client.get('/api/tasks/', {'ordering': ordering, 'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, (ordering, values))
+
+    def test_null_cursor_of_a_nullable_ordering_is_accepted(self):
+        response = self.client.get('/api/tasks/', {'ordering': 'due_date', 'cursor': encode_cursor([None, '1'])})
+        self.assertEqual(response.status_code, 200)
+
+
+class TaskBulkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 2)
+        cls.milestone = Milestone.objects.get(project=cls.project)
+        cls.task = Task.objects.filter(milestone=cls.milestone).first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def post(self, data):
+        return self.client.post('/api/tasks/bulk/', data, format='json')
+
+    def test_body_must_be_an_object(self):
+        for body in ([{'op': 'delete', 'id': self.task.pk}], 'operations', 5):
+            response = self.post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.data)
+
+    def test_malformed_references_fail_their_operation(self):
+        valid = {'op': 'update', 'id': self.task.pk, 'status': 'Done'}
+        malformed = [
+            {'op': 'update', 'id': {}, 'status': 'Done'},
+            {'op': 'update', 'id': [self.task.pk], 'status': 'Done'},
+            {'op': 'create', 'milestone': [self.milestone.pk], 'title': 'T', 'description': 'D'},
+            {'op': 'move', 'id': self.task.pk, 'milestone': {'id': self.milestone.pk}},
+            {'op': 'delete', 'id': 10 ** 30},
+            {'op': 'update', 'id': self.task.pk, 'assignee': 10 ** 30},
+            {'op': ['update']},
+        ]
+        response = self.post({'operations': [valid, *malformed]})
+        self.assertEqual(response.status_code, 400)
+        results = response.data['results']
+        self.assertNotIn('error', results[0])
+        for operation, result in zip(malformed, results[1:]):
+            self.assertIn('error', result, operation)
+        # nothing was applied
+        self.task.refresh_from_db()
+        self.assertNotEqual(self.task.status, 'Done')
+
+    def test_numeric_strings_are_accepted_as_ids(self):
+        response = self.post({'operations': [{'op': 'update', 'id': str(self.task.pk), 'status': 'Done'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'op': 'update', 'id': self.task.pk}])
+
+
+# the role map query of core.permissions.load_project_roles
+ROLE_MAP_SQL = 'SELECT "core_projectpermission"."project_id", "core_projectpermission"."role"'
+
+
+class ProjectRoleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.editor = User.objects.create_user('editor', 'editor@example.com', 'secret')
+        cls.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'secret')
+        cls.outsider = User.objects.create_user('outsider', 'outsider@example.com', 'secret')
+        cls.project = create_project(cls.owner, 3)
+        ProjectPermission.objects.create(project=cls.project, user=cls.editor, role='editor')
+        ProjectPermission.objects.create(project=cls.project, user=cls.viewer, role='viewer')
+        cls.milestone = Milestone.objects.get(project=cls.project)
+        cls.task = Task.objects.filter(milestone=cls.milestone).first()
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        schedule_cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def endpoints(self):
+        """(method, url, body, queries with a cold role map) of the views that check roles."""
+        project, milestone, task = self.project.pk, self.milestone.pk, self.task.pk
+        return [
+            ('get', f'/api/projects/{project}/schedule/', None, 5),
+            ('put', f'/api/projects/{project}/', {'name': 'Renamed', 'owner': self.owner.pk}, 13),
+            ('post', f'/api/projects/{project}/permissions/', {'user_id': self.viewer.pk, 'role': 'viewer'}, 5),
+            ('post', f'/api/projects/{project}/milestones/', {'name': 'Next'}, 4),
+            ('post', f'/api/milestones/{milestone}/tasks/', {'title': 'New', 'description': 'New'}, 8),
+            ('get', f'/api/tasks/{task}/', None, 6),
+            ('put', f'/api/tasks/{task}/', {'status': 'Done'}, 18),
+            ('post', f'/api/tasks/{task}/checklist/', {'text': 'Step'}, 3),
+            ('post', f'/api/tasks/{task}/comments/', {'text': 'Note', 'author': self.owner.pk}, 7),
+            ('delete', f'/api/tasks/{task}/', None, 16),
+        ]
+
+    def test_query_counts_per_endpoint(self):
+        client = self.client_for(self.owner)
+        for method, url, body, expected in self.endpoints():
+            caches['default'].clear()
+            with self.subTest(method=method, url=url), self.assertNumQueries(expected):
+                response = getattr(client, method)(url, body, format='json')
+                self.assertLess(response.status_code, 300)
+
+    def test_milestone_list_and_project_update_do_not_query_per_task(self):
+        client = self.client_for(self.owner)
+        project = self.project.pk
+        requests = [
+            ('get', f'/api/projects/{project}/milestones/', None),
+            ('put', f'/api/projects/{project}/', {'name': 'Renamed', 'owner': self.owner.pk}),
+        ]
+
+        def counts():
+            result = []
+            for method, url, body in requests:
+                for alias in caches:
+                    caches[alias].clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(client, method)(url, body, format='json')
+                self.assertEqual(response.status_code, 200)
+                result.append(len(queries))
+            return result
+
+        before = counts()
+        milestone = Milestone.objects.create(project=self.project, name='Second')
+        tasks = Task.objects.bulk_create([Task(milestone=milestone, title=f'More {i}', description='More') for i in range(5)])
+        ChecklistItem.objects.bulk_create([ChecklistItem(task=task, text='Step') for task in tasks])
+        Comment.objects.bulk_create([Comment(task=task, author=self.owner, text='Note') for task in tasks])
+        self.assertEqual(counts(), before)
+        # the update answers with the whole tree, as GET does
+        response = client.put(f'/api/projects/{project}/', requests[1][2], format='json')
+        self.assertEqual(response.data, client.get(f'/api/projects/{project}/').data)
+        self.assertEqual(len(response.data['milestones'][1]['tasks']), 5)
+
+    def test_role_map_is_loaded_once_per_request_and_then_cached(self):
+        client = self.client_for(self.owner)
+        for method, url, body, _ in self.endpoints():
+            for cached in (False, True):
+                if not cached:
+                    caches['default'].clear()
+                with self.subTest(method=method, url=url, cached=cached):
+                    with CaptureQueriesContext(connection) as queries:
+                        getattr(client, method)(url, body, format='json')
+                    role_queries = [query for query in queries if query['sql'].startswith(ROLE_MAP_SQL)]
+                    self.assertEqual(len(role_queries), 0 if cached else 1)
+                if method == 'delete':
+                    break
+
+    def test_roles_keep_their_meaning(self):
+        task_url = f'/api/tasks/{self.task.pk}/'
+        project_url = f'/api/projects/{self.project.pk}/'
+        self.assertEqual(self.client_for(self.viewer).get(task_url).status_code, 200)
+        self.assertEqual(self.client_for(self.viewer).put(task_url, {'status': 'Done'}, format='json').status_code, 403)
+        self.assertEqual(self.client_for(self.editor).put(task_url, {'status': 'Done'}, format='json').status_code, 200)
+        self.assertEqual(self.client_for(self.editor).delete(project_url).status_code, 403)
+        self.assertEqual(self.client_for(self.outsider).get(task_url).status_code, 404)
+        self.assertEqual(self.client_for(self.outsider).put(task_url, {'status': 'Done'}, format='json').status_code, 404)
+
+    def test_permission_changes_drop_the_cached_role_map(self):
+        client = self.client_for(self.viewer)
+        task_url = f'/api/tasks/{self.task.pk}/'
+        self.assertEqual(client.put(task_url, {'status': 'Done'}, format='json').status_code, 403)
+
+        permission = ProjectPermission.objects.get(project=self.project, user=self.viewer)
+        permission.role = 'editor'
+        permission.save()
+        self.assertEqual(client.put(task_url, {'status': 'Done'}, format='json').status_code, 200)
+
+        permission.delete()
+        self.assertEqual(client.get(task_url).status_code, 404)
+
+
+class ChecklistSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.user, 2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checklist_with(self, task, items):
+        ChecklistItem.objects.filter(task=task).delete()
+        ChecklistItem.objects.bulk_create([ChecklistItem(task=task, text=f'Step {i}') for i in range(items)])
+        return [
+            {'id': item.pk, 'text': item.text, 'is_completed': item.is_completed}
+            for item in ChecklistItem.objects.filter(task=task).order_by('pk')
+        ]
+
+    def toggle_first(self, task, checklist):
+        """Queries of a PUT of ``checklist`` with its first item toggled."""
+        checklist[0]['is_completed'] = True
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(f'/api/tasks/{task.pk}/', {'checklist': checklist}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_toggling_one_of_200_items_writes_one_row(self):
+        small, large = Task.objects.filter(milestone__project=self.project).order_by('pk')
+        # the first request also loads the role map and creates this hour's rollup rows
+        self.toggle_first(small, self.checklist_with(small, 2))
+        small_queries = self.toggle_first(small, self.checklist_with(small, 2))
+        checklist = self.checklist_with(large, 200)
+        large_queries = self.toggle_first(large, checklist)
+
+        self.assertEqual(len(large_queries), len(small_queries))
+        writes = [sql for sql in large_queries if '"core_checklistitem"' in sql and not sql.startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE "core_checklistitem"'))
+        self.assertEqual(
+            list(ChecklistItem.objects.filter(task=large, is_completed=True).values_list('pk', flat=True)),
+            [checklist[0]['id']],
+        )
+        self.assertEqual(ChecklistItem.objects.filter(task=large).count(), 200)
+
+    def test_put_without_checklist_keeps_it(self):
+        task = Task.objects.filter(milestone__project=self.project).first()
+        self.checklist_with(task, 5)
+        response = self.client.put(f'/api/tasks/{task.pk}/', {'title': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ChecklistItem.objects.filter(task=task).count(), 5)
+
+
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_their_indexes(self):
+        prefer_indexes()
+        for label, queryset, index in HOT_QUERIES:
+            with self.subTest(label):
+                plan = queryset().explain()
+                self.assertIsNone(plan_problem(plan, index), plan)
+
+    def test_plan_problems(self):
+        self.assertEqual(plan_problem('SCAN core_task', None), 'full scan of core_task')
+        self.assertEqual(plan_problem('Seq Scan on core_log  (cost=0.00..1.01)', None), 'full scan of core_log')
+        self.assertEqual(
+            plan_problem('SEARCH core_task USING INDEX task_assignee_due_idx (assignee_id=?)', 'task_milestone_status_idx'),
+            'task_milestone_status_idx not used',
+        )
+        self.assertIsNone(plan_problem('SCAN core_task USING INDEX task_assignee_due_idx', 'task_assignee_due_idx'))
+
+
+class UniqueMembershipTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.user, 1)
+        cls.task = Task.objects.get(milestone__project=cls.project)
+
+    def test_duplicate_rows_are_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ProjectPermission.objects.create(project=self.project, user=self.user, role='viewer')
+        tag = TaskTag.objects.get(task=self.task).tag
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TaskTag.objects.create(task=self.task, tag=tag)
+
+    def test_repeated_tag_ids_tag_the_task_once(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        tag = Tag.objects.get()
+        response = client.post(
+            f'/api/milestones/{self.task.milestone_id}/tasks/',
+            {'title': 'New', 'description': 'New', 'tags': [tag.pk, tag.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TaskTag.objects.filter(task_id=response.json()['id']).count(), 1)
+
+    def test_put_replaces_the_tags(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        other = Tag.objects.create(name='other', color='#993366')
+        response = client.put(f'/api/tasks/{self.task.pk}/', {'tags': [other.pk, other.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(TaskTag.objects.filter(task=self.task).values_list('tag_id', flat=True)), [other.pk])
+
+
+class ReportSchedulerTests(TestCase):
+
+    def setUp(self):
+        self.group = GroupModel.objects.create(
+            verbose='Team', groupID='team', systemMainPrompt='Summarize', repeetHour=1, fromTime=9, toTime=17,
+        )
+        # shortly before the group's window closes
+        self.now = timezone.localtime().replace(hour=16, minute=58, second=0, microsecond=0)
+        self.scheduler = ReportScheduler(retry_delay=300)
+        self.scheduler.reload(self.now)
+
+    def next_due(self):
+        return min(due for due, _ in self.scheduler._heap)
+
+    def test_retry_stays_inside_the_window(self):
+        [group] = self.scheduler.pop_due(self.now)
+        self.scheduler.failed(group, self.now)
+        tomorrow = (self.now + timedelta(days=1)).replace(hour=9, minute=0)
+        self.assertEqual(self.next_due(), tomorrow)
+
+    def test_reload_keeps_the_retry_delay(self):
+        self.now = self.now.replace(hour=10)
+        self.scheduler = ReportScheduler(retry_delay=300)
+        self.scheduler.reload(self.now)
+        [group] = self.scheduler.pop_due(self.now)
+        self.scheduler.failed(group, self.now)
+
+        self.group.verbose = 'Renamed team'
+        self.group.save()
+        self.assertTrue(self.scheduler.reload(self.now))
+        self.assertEqual(self.scheduler.pop_due(self.now), [])
+        self.assertEqual(self.next_due(), self.now + timedelta(seconds=300))
+
+    def test_running_group_is_not_queued_again(self):
+        [group] = self.scheduler.pop_due(self.now)
+        self.group.save()
+        self.assertTrue(self.scheduler.reload(self.now))
+        self.assertEqual(self.scheduler.pop_due(self.now), [])
+
+        earlier = self.now.replace(hour=10)
+        self.scheduler.reported(group, earlier)
+        self.assertEqual(self.next_due(), earlier + timedelta(hours=1))
+
+    def test_submitted_jobs_run_without_blocking(self):
+        runner = ReportRunner(max_workers=2)
+        release = threading.Event()
+        try:
+            slow = runner.submit(lambda group, deadline: release.wait(5) and 'slow', self.group)
+            fast = runner.submit(lambda group, deadline: 'fast', self.group)
+            self.assertEqual(fast.result(timeout=5), 'fast')
+            self.assertFalse(slow.done())
+            release.set()
+            self.assertEqual(slow.result(timeout=5), 'slow')
+        finally:
+            release.set()
+            runner.shutdown()
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class AsyncReadViewErrorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.owner)}')
+        self.urls = [f'{prefix}/projects/{self.project.pk}/logs/' for prefix in ('/api', '/async/api')]
+
+    def test_django_errors_get_the_apiview_response(self):
+        with mock.patch.object(AsyncLogView, 'get', side_effect=PermissionDenied), \
+                mock.patch('core.views.LogAPIView.get', side_effect=PermissionDenied):
+            sync, async_ = (self.client.get(url) for url in self.urls)
+        self.assertEqual(async_.status_code, 403)
+        self.assertEqual(async_.json(), sync.json())
+
+    def test_unauthenticated_gets_the_apiview_response(self):
+        self.client.credentials()
+        sync, async_ = (self.client.get(url) for url in self.urls)
+        self.assertEqual(async_.status_code, 401)
+        self.assertEqual(async_.json(), sync.json())
+        self.assertEqual(async_['WWW-Authenticate'], sync['WWW-Authenticate'])
+
+    def test_unexpected_errors_are_raised(self):
+        with mock.patch.object(AsyncLogView, 'get', side_effect=ValueError('boom')):
+            with self.assertRaises(ValueError):
+                self.client.get(self.urls[1])
+
+    def test_configured_exception_handler_is_used(self):
+        def handler(exc, context):
+            return Response({'handled': type(exc).__name__}, status=418, headers={'X-Handled': '1'})
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'EXCEPTION_HANDLER': handler}):
+            with mock.patch.object(AsyncLogView, 'get', side_effect=ValueError('boom')):
+                response = self.client.get(self.urls[1])
+        self.assertEqual(response.status_code, 418)
+        self.assertEqual(response.json(), {'handled': 'ValueError'})
+        self.assertEqual(response['X-Handled'], '1')
+
+
+@override_settings(ROOT_URLCONF='core.tests', LOG_STREAM_REPLAY=10)
+class LogStreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.outsider = User.objects.create_user('outsider', 'outsider@example.com', 'secret')
+        cls.project = create_project(cls.owner, 1)
+        cls.milestone = Milestone.objects.get(project=cls.project)
+        Log.objects.bulk_create([Log(project=cls.project, user=cls.owner, message=f'Log {i}') for i in range(30)])
+        cls.log_ids = list(Log.objects.filter(project=cls.project).order_by('id').values_list('id', flat=True))
+
+    def stream(self, url, user=None, **headers):
+        token = {'token': str(AccessToken.for_user(user))} if user else {}
+        return self.client.get(url, token, **headers)
+
+    def events(self, response):
+        # under the test client (WSGI) the stream ends after the replay, which Django buffers
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', 'StreamingHttpResponse must consume asynchronous iterators')
+            return b''.join(response).decode().split('\n\n')
+
+    def test_replay_is_capped(self):
+        url = f'/api/projects/{self.project.pk}/logs/stream/'
+        events = self.events(self.stream(url, self.owner, HTTP_LAST_EVENT_ID='0'))
+        ids = [int(event.split('\n')[0][len('id: '):]) for event in events if event.startswith('id: ')]
+        self.assertEqual(ids, self.log_ids[-10:])
+        gap = next(event for event in events if event.startswith('event: gap'))
+        self.assertEqual(json.loads(gap.split('data: ')[1]), {'after': 0, 'until': self.log_ids[-11]})
+
+    def test_short_replay_has_no_gap(self):
+        url = f'/api/projects/{self.project.pk}/logs/stream/'
+        events = self.events(self.stream(url, self.owner, HTTP_LAST_EVENT_ID=str(self.log_ids[-4])))
+        self.assertEqual(len([event for event in events if event.startswith('id: ')]), 3)
+        self.assertFalse(any(event.startswith('event: gap') for event in events))
+
+    def test_milestone_stream_authenticates_first(self):
+        missing = Milestone.objects.order_by('-pk').first().pk + 1
+        for milestone_pk in (self.milestone.pk, missing):
+            response = self.stream(f'/api/milestones/{milestone_pk}/logs/stream/')
+            self.assertEqual(response.status_code, 403, milestone_pk)
+        for milestone_pk in (self.milestone.pk, missing):
+            response = self.stream(f'/api/milestones/{milestone_pk}/logs/stream/', self.outsider)
+            self.assertEqual(response.status_code, 404, milestone_pk)
+        response = self.stream(f'/api/milestones/{self.milestone.pk}/logs/stream/', self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+    def test_stream_without_a_cursor_hands_one_to_the_reconnect(self):
+        # under WSGI the response ends at once; EventSource must come back with a Last-Event-ID
+        url = f'/api/projects/{self.project.pk}/logs/stream/'
+        events = self.events(self.stream(url, self.owner))
+        self.assertFalse(any('event: log' in event for event in events))
+        self.assertIn(f'id: {self.log_ids[-1]}', events)
+
+        log = Log.objects.create(project=self.project, user=self.owner, message='After the first connect')
+        events = self.events(self.stream(url, self.owner, HTTP_LAST_EVENT_ID=str(self.log_ids[-1])))
+        self.assertEqual([event.split('\n')[0] for event in events if event.startswith('id: ')], [f'id: {log.pk}'])
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class MetricsAccessTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'secret')
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'secret', is_staff=True)
+
+    def scrape(self, authorization=None):
+        headers = {} if authorization is None else {'HTTP_AUTHORIZATION': authorization}
+        return self.client.get('/api/metrics/', **headers)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_staff_only_without_a_token(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape('Bearer not-a-token').status_code, 403)
+        self.assertEqual(self.scrape(f'Bearer {AccessToken.for_user(self.user)}').status_code, 403)
+        self.assertEqual(self.scrape(f'Bearer {AccessToken.for_user(self.staff)}').status_code, 200)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_when_set(self):
+        self.assertEqual(self.scrape('Bearer scrape-secret').status_code, 200)
+        self.assertEqual(self.scrape('Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape().status_code, 403)
+
+
+class LLMConfigurationTests(TestCase):
+
+    @override_settings(GEMINI_API_KEY=None)
+    def test_gemini_without_a_key_fails_clearly(self):
+        with mock.patch('core.llm._client', None):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'GEMINI_API_KEY'):
+                get_llm_client('gemini')
+            with self.assertRaisesMessage(CommandError, 'GEMINI_API_KEY'):
+                call_command('report', llm_backend='gemini')
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class ProjectTreeCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 2)
+
+    def setUp(self):
+        caches[settings.PROJECT_TREE_CACHE].clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.owner)}')
+
+    def test_second_read_is_served_from_the_cache(self):
+        before = project_tree_cache.stats()
+        first = self.client.get(f'/api/projects/{self.project.pk}/')
+        second = self.client.get(f'/api/projects/{self.project.pk}/')
+        after = project_tree_cache.stats()
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['builds'] - before['builds'], 1)
+
+    def test_write_that_sends_no_signal_is_never_served_stale(self):
+        # as if written by another process, whose cache invalidations this one would never see
+        task = Task.objects.filter(milestone__project=self.project).first()
+        for prefix in ('/api/', '/async/api/'):
+            first = self.client.get(f'{prefix}projects/{self.project.pk}/')
+            title = f'Renamed for {prefix}'
+            Task.objects.filter(pk=task.pk).update(title=title, updated_at=timezone.now())
+            second = self.client.get(f'{prefix}projects/{self.project.pk}/')
+            self.assertNotEqual(second['ETag'], first['ETag'], prefix)
+            titles = [t['title'] for m in json.loads(second.content)['milestones'] for t in m['tasks']]
+            self.assertIn(title, titles, prefix)
+
+            listed = json.loads(self.client.get(f'{prefix}projects/').content)
+            titles = [t['title'] for p in listed for m in p['milestones'] for t in m['tasks']]
+            self.assertIn(title, titles, prefix)
+
+    def test_delete_moves_readers_to_a_new_tree(self):
+        first = self.client.get(f'/api/projects/{self.project.pk}/')
+        comment = Comment.objects.filter(task__milestone__project=self.project).first()
+        Comment.objects.filter(pk=comment.pk)._raw_delete(Comment.objects.db)
+        second = self.client.get(f'/api/projects/{self.project.pk}/')
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        comment_ids = [c['id'] for m in second.data['milestones'] for t in m['tasks'] for c in t['comments']]
+        self.assertNotIn(comment.pk, comment_ids)
+
+    def test_concurrent_miss_waits_for_the_build_in_progress(self):
+        tree_cache = ProjectTreeCache(lock_timeout=5, wait_interval=0.01)
+        states = project_states([self.project.pk])
+        key = tree_cache._keys(states)[self.project.pk]
+        # another request is building this tree
+        self.assertTrue(tree_cache.cache.add(f'{key}:lock', 1, 5))
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(tree_cache.get_many(states)))
+        waiter.start()
+        deadline = timezone.now() + timedelta(seconds=5)
+        while tree_cache.stats()['lock_waits'] == 0 and timezone.now() < deadline:
+            threading.Event().wait(0.01)
+        tree_cache.cache.set(key, {'id': self.project.pk, 'built': 'elsewhere'})
+        waiter.join(5)
+
+        self.assertEqual(results, [[{'id': self.project.pk, 'built': 'elsewhere'}]])
+        self.assertEqual(tree_cache.stats()['builds'], 0)
+        self.assertEqual(tree_cache.stats()['lock_waits'], 1)
+
+    def test_build_releases_its_lock(self):
+        tree_cache = ProjectTreeCache()
+        states = project_states([self.project.pk])
+        key = tree_cache._keys(states)[self.project.pk]
+        [tree] = tree_cache.get_many(states)
+        self.assertEqual(tree['id'], self.project.pk)
+        self.assertIsNone(tree_cache.cache.get(f'{key}:lock'))
+        self.assertEqual(tree_cache.cache.get(key), tree)
+
+
+DAY = 86400
+
+
+class CriticalPathTests(TestCase):
+    """ProjectSchedule on small graphs worked out by hand, durations in days from a project start of 0."""
+
+    def days(self, dates):
+        return {task_id: (start / DAY, finish / DAY) for task_id, (start, finish) in dates.items()}
+
+    def test_each_dependency_type(self):
+        # predecessor 1 runs days 0-4, successor 2 lasts 2 days
+        expected = {'FS': (4, 6), 'SS': (0, 2), 'FF': (2, 4), 'SF': (0, 2)}
+        for kind, dates in expected.items():
+            with self.subTest(kind=kind):
+                schedule = ProjectSchedule({1: (0, 4 * DAY), 2: (None, 2 * DAY)}, [(1, 2, kind)])
+                self.assertEqual(self.days(schedule.early)[2], dates)
+
+    def test_early_and_late_dates_slack_and_critical_path(self):
+        # 1 -FS-> 2 -FS-> 4, 1 -SS-> 3 -FF-> 4
+        tasks = {1: (0, 2 * DAY), 2: (None, 3 * DAY), 3: (None, DAY), 4: (None, DAY)}
+        schedule = ProjectSchedule(tasks, [(1, 2, 'FS'), (2, 4, 'FS'), (1, 3, 'SS'), (3, 4, 'FF')])
+
+        self.assertEqual(self.days(schedule.early), {1: (0, 2), 2: (2, 5), 3: (0, 1), 4: (5, 6)})
+        self.assertEqual(self.days(schedule.late), {1: (0, 2), 2: (2, 5), 3: (5, 6), 4: (5, 6)})
+        self.assertEqual(schedule.project_finish, 6 * DAY)
+        payload = schedule.payload()
+        self.assertEqual({task_id: dates['slack'] for task_id, dates in payload['tasks'].items()}, {1: 0, 2: 0, 3: 5 * DAY, 4: 0})
+        self.assertEqual(payload['critical_path'], [1, 2, 4])
+
+    def test_start_to_finish_and_own_start_dates(self):
+        # 2 starts on day 0 by itself, but can't finish before 1 starts on day 4
+        schedule = ProjectSchedule({1: (4 * DAY, 2 * DAY), 2: (0, 3 * DAY)}, [(1, 2, 'SF')])
+        self.assertEqual(self.days(schedule.early), {1: (4, 6), 2: (1, 4)})
+        self.assertEqual(self.days(schedule.late), {1: (4, 6), 2: (3, 6)})
+        self.assertEqual(schedule.payload()['critical_path'], [1])
+
+    def test_two_task_cycle(self):
+        with self.assertRaises(DependencyCycleError) as raised:
+            ProjectSchedule({1: (0, DAY), 2: (None, DAY), 3: (None, DAY)}, [(3, 1, 'FS'), (1, 2, 'FS'), (2, 1, 'SS')])
+        self.assertEqual(raised.exception.task_ids, [1, 2])
+
+    @override_settings(ROOT_URLCONF='core.tests')
+    def test_cycle_is_a_bad_request(self):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        project = create_project(owner, 2)
+        first, second = Task.objects.filter(milestone__project=project).order_by('pk')
+        Dependency.objects.create(from_task=second, to_task=first, type='FS')
+        schedule_cache.clear()
+
+        client = APIClient()
+        client.force_authenticate(owner)
+        response = client.get(f'/api/projects/{project.pk}/schedule/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Dependency cycle', 'tasks': [first.pk, second.pk]})
+
+
+class ScheduleUpdateTests(TestCase):
+    """ProjectSchedule.update() and ScheduleCache re-timing give what a fresh schedule would."""
+
+    # a -FS-> b -FS-> d, a -SS-> c -FF-> d; c has slack
+    TASKS = {1: (0, 2 * DAY), 2: (None, 3 * DAY), 3: (None, DAY), 4: (None, DAY)}
+    EDGES = [(1, 2, 'FS'), (2, 4, 'FS'), (1, 3, 'SS'), (3, 4, 'FF')]
+
+    def assertSameSchedule(self, schedule, tasks):
+        fresh = ProjectSchedule(tasks, self.EDGES)
+        self.assertEqual(schedule.project_start, fresh.project_start)
+        self.assertEqual(schedule.project_finish, fresh.project_finish)
+        self.assertEqual(schedule.early, fresh.early)
+        self.assertEqual(schedule.late, fresh.late)
+        self.assertEqual(schedule.payload(), fresh.payload())
+
+    def retimed(self, changes):
+        schedule = ProjectSchedule(self.TASKS, self.EDGES)
+        schedule.update(changes)
+        self.assertSameSchedule(schedule, {**self.TASKS, **changes})
+        return schedule
+
+    def test_slack_task_moves_without_moving_the_finish(self):
+        before = ProjectSchedule(self.TASKS, self.EDGES).project_finish
+        self.assertEqual(self.retimed({3: (None, 2 * DAY)}).project_finish, before)
+
+    def test_critical_task_moves_the_finish(self):
+        before = ProjectSchedule(self.TASKS, self.EDGES).project_finish
+        self.assertEqual(self.retimed({2: (None, 5 * DAY)}).project_finish, before + 2 * DAY)
+
+    def test_finish_moves_earlier(self):
+        before = ProjectSchedule(self.TASKS, self.EDGES).project_finish
+        self.assertEqual(self.retimed({2: (None, DAY)}).project_finish, before - 2 * DAY)
+
+    def test_start_moves(self):
+        self.assertEqual(self.retimed({1: (-DAY, 2 * DAY)}).project_start, -DAY)
+        self.assertEqual(self.retimed({1: (DAY, 2 * DAY)}).project_start, DAY)
+
+    def test_successive_updates(self):
+        schedule = ProjectSchedule(self.TASKS, self.EDGES)
+        tasks = dict(self.TASKS)
+        for changes in ({3: (None, 4 * DAY)}, {1: (DAY, DAY)}, {4: (5 * DAY, DAY)}, {3: (None, DAY), 2: (None, 0)}):
+            schedule.update(changes)
+            tasks.update(changes)
+            self.assertSameSchedule(schedule, tasks)
+
+
+class ScheduleCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 4)
+        start = timezone.now().replace(microsecond=0)
+        cls.tasks = list(Task.objects.filter(milestone__project=cls.project).order_by('pk'))
+        for index, task in enumerate(cls.tasks):
+            task.start_date = start + timedelta(days=index)
+            task.due_date = task.start_date + timedelta(days=2)
+        Task.objects.bulk_update(cls.tasks, ['start_date', 'due_date'])
+
+    def setUp(self):
+        self.cache = ScheduleCache()
+
+    def fresh(self):
+        tasks, _, edges = load_project_graph(self.project.pk)
+        return ProjectSchedule(tasks, edges).payload()
+
+    def stats(self, before):
+        after = self.cache.stats()
+        return {name: after[name] - before[name] for name in ('hits', 'misses', 'updates')}
+
+    def test_unchanged_project_is_a_hit_after_one_query(self):
+        self.cache.get(self.project.pk)
+        before = self.cache.stats()
+        with self.assertNumQueries(1):
+            payload = self.cache.get(self.project.pk)
+        self.assertEqual(payload, self.fresh())
+        self.assertEqual(self.stats(before), {'hits': 1, 'misses': 0, 'updates': 0})
+
+    def test_dates_saved_elsewhere_are_retimed(self):
+        # written without signals, as by another process
+        self.cache.get(self.project.pk)
+        for task, shift in ((self.tasks[1], timedelta(days=3)), (self.tasks[0], -timedelta(days=2)), (self.tasks[3], timedelta(0))):
+            before = self.cache.stats()
+            Task.objects.filter(pk=task.pk).update(
+                due_date=task.due_date + shift + timedelta(days=1), start_date=task.start_date + shift,
+                updated_at=timezone.now(),
+            )
+            self.assertEqual(self.cache.get(self.project.pk), self.fresh())
+            self.assertEqual(self.stats(before), {'hits': 0, 'misses': 0, 'updates': 1})
+
+    def test_graph_changes_rebuild(self):
+        first, second, third, fourth = self.tasks
+        writes = [
+            lambda: Dependency.objects.create(from_task=first, to_task=fourth, type='SS'),
+            lambda: Dependency.objects.filter(from_task=first, to_task=second).update(type='SF', updated_at=timezone.now()),
+            lambda: Task.objects.create(milestone=first.milestone, title='New', start_date=first.start_date),
+            lambda: Task.objects.filter(pk=third.pk).delete(),
+        ]
+        self.cache.get(self.project.pk)
+        for write in writes:
+            before = self.cache.stats()
+            write()
+            self.assertEqual(self.cache.get(self.project.pk), self.fresh())
+            self.assertEqual(self.stats(before), {'hits': 0, 'misses': 1, 'updates': 0})
+
+    def test_task_moved_between_projects_rebuilds_both(self):
+        other = create_project(self.owner, 2, 'Other')
+        self.cache.get(self.project.pk)
+        self.cache.get(other.pk)
+        Task.objects.filter(pk=self.tasks[3].pk).update(
+            milestone=Milestone.objects.get(project=other), updated_at=timezone.now(),
+        )
+        before = self.cache.stats()
+        for project in (self.project, other):
+            tasks, _, edges = load_project_graph(project.pk)
+            self.assertEqual(self.cache.get(project.pk), ProjectSchedule(tasks, edges).payload())
+        self.assertEqual(self.stats(before), {'hits': 0, 'misses': 2, 'updates': 0})
+
+    def test_least_recently_read_project_is_dropped(self):
+        cache = ScheduleCache(size=1)
+        other = create_project(self.owner, 1, 'Other')
+        cache.get(self.project.pk)
+        cache.get(other.pk)
+        self.assertEqual(cache.stats()['projects'], 1)
+        cache.get(self.project.pk)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.outsider = User.objects.create_user('outsider', 'outsider@example.com', 'secret')
+        cls.project = create_project(cls.owner, 0, 'Mine')
+        cls.other = create_project(cls.outsider, 0, 'Theirs')
+        for project, user in ((cls.project, cls.owner), (cls.other, cls.outsider)):
+            milestone = Milestone.objects.get(project=project)
+            for i in range(3):
+                task = Task.objects.create(milestone=milestone, title=f'Deploy staging {i}', description='Roll out')
+                Comment.objects.create(task=task, author=user, text='Deploy went fine')
+                Log.objects.create(project=project, user=user, task=task, message=f'Deployed build {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def search(self, **params):
+        return self.client.get('/api/search/', params)
+
+    def test_only_member_projects_are_searched(self):
+        hits = self.search(q='deploy').data
+        self.assertEqual(len(hits), 9)
+        self.assertEqual({hit['project'] for hit in hits}, {self.project.pk})
+        self.assertEqual(self.search(q='deploy', project=self.other.pk).data, [])
+
+    def test_kind_filter(self):
+        for kind in ('task', 'comment', 'log'):
+            hits = self.search(q='deploy', kind=kind).data
+            self.assertEqual([hit['kind'] for hit in hits], [kind] * 3, kind)
+        hits = self.client.get('/api/search/?q=deploy&kind=task&kind=log').data
+        self.assertEqual(sorted({hit['kind'] for hit in hits}), ['log', 'task'])
+        self.assertEqual(self.search(q='deploy', kind='user').status_code, 400)
+
+    def test_cursor_pages_cover_every_hit_once(self):
+        everything = [(hit['kind'], hit['id']) for hit in self.search(q='deploy').data]
+        paged = []
+        response = self.search(q='deploy', limit=2)
+        while True:
+            self.assertLessEqual(len(response.data), 2)
+            paged += [(hit['kind'], hit['id']) for hit in response.data]
+            if 'Link' not in response:
+                break
+            response = self.client.get(response['Link'][1:response['Link'].index('>')])
+        self.assertEqual(paged, everything)
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', encode_cursor(['1.5']), encode_cursor(['best', '1'])):
+            response = self.search(q='deploy', cursor=cursor)
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.data, {'error': 'Invalid cursor'})
+
+    def test_deleted_logs_leave_the_index(self):
+        log = Log.objects.filter(project=self.project).first()
+        log.delete()
+        Log.objects.filter(project=self.project, message='Deployed build 1').delete()
+        hits = self.search(q='deploy', kind='log').data
+        self.assertEqual([hit['id'] for hit in hits], list(
+            Log.objects.filter(project=self.project).values_list('pk', flat=True)
+        ))
+        self.assertFalse(SearchDocument.objects.filter(kind='log', object_id=log.pk).exists())
+
+
+class BotAPIStub(http.server.ThreadingHTTPServer):
+    """A local Bot API: answers each request with the next of ``replies``, (status, JSON body), and keeps the requests."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(handler):
+                body = handler.rfile.read(int(handler.headers['Content-Length']))
+                self.requests.append((handler.path, json.loads(body)))
+                status, reply = self.replies.pop(0)
+                content = json.dumps(reply).encode()
+                handler.send_response(status)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(content)))
+                handler.end_headers()
+                handler.wfile.write(content)
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def client(self):
+        return TelegramClient(token='bot-token', api_url=self.url, timeout=5)
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+def sent(text='Sent'):
+    return 200, {'ok': True, 'result': {'message_id': 1, 'text': text}}
+
+
+class TelegramClientTests(TestCase):
+
+    def stub(self, *replies):
+        stub = BotAPIStub(replies)
+        self.addCleanup(stub.close)
+        client = stub.client()
+        self.addCleanup(client.close)
+        return stub, client
+
+    def test_success(self):
+        stub, client = self.stub(sent('Hello'))
+        self.assertEqual(client.send_message('42', 'Hello'), {'message_id': 1, 'text': 'Hello'})
+        self.assertEqual(stub.requests, [('/botbot-token/sendMessage', {'chat_id': '42', 'text': 'Hello'})])
+
+    def test_rate_limit(self):
+        replies = [
+            (429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests', 'parameters': {'retry_after': 7}}),
+            (200, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 3}}),
+            (429, {'ok': False}),
+        ]
+        _, client = self.stub(*replies)
+        for retry_after in (7, 3, 1):
+            with self.assertRaises(TelegramRateLimited) as raised:
+                client.send_message('42', 'Hello')
+            self.assertEqual(raised.exception.retry_after, retry_after)
+
+    def test_refused(self):
+        _, client = self.stub((400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'}), (502, {}))
+        with self.assertRaisesMessage(TelegramError, 'chat not found'):
+            client.send_message('42', 'Hello')
+        with self.assertRaisesMessage(TelegramError, 'HTTP 502'):
+            client.send_message('42', 'Hello')
+
+    def test_reply_that_is_not_an_object(self):
+        _, client = self.stub((200, ['ok']), (200, 'ok'), (200, None))
+        for _ in range(3):
+            with self.assertRaisesMessage(TelegramError, 'Unexpected reply'):
+                client.send_message('42', 'Hello')
+
+    def test_unreachable(self):
+        stub, client = self.stub()
+        stub.close()
+        with self.assertRaises(TelegramError):
+            client.send_message('42', 'Hello')
+
+
+class TelegramOutboxTests(TestCase):
+
+    def deliver(self, *replies, **options):
+        stub = BotAPIStub(replies)
+        client = stub.client()
+        try:
+            return deliver_pending(client, **options), stub.requests
+        finally:
+            client.close()
+            stub.close()
+
+    def make_due(self):
+        TelegramDelivery.objects.update(nextAttemptAt=timezone.now() - timedelta(seconds=1))
+
+    def test_split_message_resumes_after_the_parts_sent(self):
+        text = 'a' * 4000 + '\n' + 'b' * 100
+        delivery = TelegramDelivery.objects.create(chatID='42', text=text)
+
+        before = timezone.now()
+        stats, requests = self.deliver(sent(), (500, {'ok': False, 'description': 'Internal Server Error'}), backoff=30)
+        self.assertEqual(stats, {'sent': 0, 'retried': 1, 'failed': 0, 'retry_after': None})
+        self.assertEqual([body['text'] for _, body in requests], ['a' * 4000, 'b' * 100])
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.partsSent, delivery.attempts), ('pending', 1, 1))
+        self.assertEqual(delivery.lastError, 'Internal Server Error')
+        self.assertGreaterEqual(delivery.nextAttemptAt, before + timedelta(seconds=30))
+
+        # not due yet
+        self.assertEqual(self.deliver()[0]['sent'], 0)
+
+        self.make_due()
+        stats, requests = self.deliver(sent())
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual([body['text'] for _, body in requests], ['b' * 100])
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.partsSent), ('sent', 2))
+        self.assertIsNotNone(delivery.sentAt)
+
+    def test_backoff_doubles_until_the_last_attempt(self):
+        delivery = TelegramDelivery.objects.create(chatID='42', text='Hello')
+        refused = (400, {'ok': False, 'description': 'Bad Request'})
+        for attempt in (1, 2):
+            self.make_due()
+            before = timezone.now()
+            stats, _ = self.deliver(refused, max_attempts=3, backoff=10)
+            self.assertEqual(stats['retried'], 1)
+            delivery.refresh_from_db()
+            self.assertEqual(delivery.attempts, attempt)
+            delay = delivery.nextAttemptAt - before
+            self.assertGreaterEqual(delay, timedelta(seconds=10 * 2 ** (attempt - 1)))
+            self.assertLess(delay, timedelta(seconds=10 * 2 ** (attempt - 1) + 5))
+
+        self.make_due()
+        stats, _ = self.deliver(refused, max_attempts=3, backoff=10)
+        self.assertEqual(stats, {'sent': 0, 'retried': 0, 'failed': 1, 'retry_after': None})
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), ('failed', 3))
+
+    def test_rate_limit_stops_the_batch_without_counting_an_attempt(self):
+        first = TelegramDelivery.objects.create(chatID='42', text='First')
+        second = TelegramDelivery.objects.create(chatID='42', text='Second')
+        self.make_due()
+        before = timezone.now()
+        stats, requests = self.deliver((429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 20}}))
+        self.assertEqual(stats, {'sent': 0, 'retried': 0, 'failed': 0, 'retry_after': 20})
+        self.assertEqual(len(requests), 1)
+        first.refresh_from_db()
+        self.assertEqual(first.attempts, 0)
+        self.assertGreaterEqual(first.nextAttemptAt, before + timedelta(seconds=20))
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.attempts), ('pending', 0))
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 3)
+        cls.other = create_project(cls.owner, 1, 'Other')
+        cls.milestone = Milestone.objects.get(project=cls.project)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.owner)}')
+
+    def urls(self):
+        project, milestone = self.project.pk, self.milestone.pk
+        urls = [f'/api/projects/{project}/milestones/', f'/api/tasks/?project={project}']
+        for prefix in ('/api/', '/async/api/'):
+            urls += [f'{prefix}projects/', f'{prefix}projects/{project}/', f'{prefix}milestones/{milestone}/tasks/']
+        return urls
+
+    def etags(self):
+        etags = {}
+        for url in self.urls():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etags[url] = response['ETag']
+        return etags
+
+    def test_unchanged_read_is_not_modified(self):
+        for url, etag in self.etags().items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response['ETag'], etag, url)
+            self.assertEqual(response.content, b'', url)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", {etag}').status_code, 304, url)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200, url)
+
+    def test_write_to_each_table_changes_every_etag(self):
+        project = Project.objects.filter(pk=self.project.pk)
+        tasks = Task.objects.filter(milestone__project=self.project)
+        task = tasks.first()
+        # saves without signals bump updated_at; deletes lower a count
+        writes = {
+            'projects': lambda now: project.update(name='Renamed', updated_at=now),
+            'permissions': lambda now: ProjectPermission.objects.filter(project=self.project).update(role='editor', updated_at=now),
+            'milestones': lambda now: Milestone.objects.filter(pk=self.milestone.pk).update(name='Renamed', updated_at=now),
+            'tasks': lambda now: tasks.filter(pk=task.pk).update(status='Done', updated_at=now),
+            'checklist': lambda now: ChecklistItem.objects.filter(task=task).update(is_completed=True, updated_at=now),
+            'comments': lambda now: Comment.objects.filter(task=task).update(text='Edited', updated_at=now),
+            'dependencies': lambda now: Dependency.objects.filter(to_task__milestone=self.milestone).update(type='SS', updated_at=now),
+            'task_tags': lambda now: TaskTag.objects.filter(task=task).update(updated_at=now),
+            'deleted checklist item': lambda now: ChecklistItem.objects.filter(task=task).first().delete(),
+            'deleted comment': lambda now: Comment.objects.filter(task=task).delete(),
+            'deleted dependency': lambda now: Dependency.objects.filter(to_task__milestone=self.milestone).first().delete(),
+            'deleted task tag': lambda now: TaskTag.objects.filter(task=task).delete(),
+        }
+        self.assertTrue(set(SNAPSHOT_TABLES) <= set(writes))
+        for table, write in writes.items():
+            before = self.etags()
+            write(timezone.now())
+            after = self.etags()
+            for url in before:
+                self.assertNotEqual(after[url], before[url], f'{table} {url}')
+
+    def test_write_to_another_project_keeps_the_etag(self):
+        url = f'/api/projects/{self.project.pk}/'
+        etag = self.client.get(url)['ETag']
+        Task.objects.filter(milestone__project=self.other).update(title='Elsewhere', updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+def task_event(task_id, title):
+    return {'table': 'tasks', 'op': 'upsert', 'id': task_id, 'row': {'id': task_id, 'title': title}}
+
+
+class ProjectEventHubTests(TestCase):
+
+    def run_on_hub(self, test, **options):
+        async def run():
+            hub = ProjectEventHub(**{'window': 0.01, 'queue_size': 10, **options})
+            hub.attach(asyncio.get_running_loop())
+            await test(hub)
+        asyncio.run(run())
+
+    def test_changes_in_a_window_are_sent_once_with_the_last_state_of_each_row(self):
+        async def test(hub):
+            subscriber = hub.subscribe(1, 7)
+            hub.publish(1, [task_event(10, 'First'), task_event(11, 'Other')])
+            hub.publish(1, [task_event(10, 'Second')])
+            hub.publish(2, [task_event(20, 'Nobody watches')])
+            await asyncio.sleep(0.05)
+            message = json.loads(subscriber.queue.get_nowait())
+            self.assertEqual(message, {'type': 'diff', 'project': 1, 'events': [task_event(10, 'Second'), task_event(11, 'Other')]})
+            self.assertTrue(subscriber.queue.empty())
+        self.run_on_hub(test)
+
+    def test_subscribers_of_some_tables_only_wake_for_them(self):
+        async def test(hub):
+            logs = hub.subscribe(1, 7, tables={'logs'})
+            board = hub.subscribe(1, 8)
+            hub.publish(1, [task_event(10, 'Task')])
+            await asyncio.sleep(0.05)
+            self.assertTrue(logs.queue.empty())
+            self.assertEqual(board.queue.qsize(), 1)
+        self.run_on_hub(test)
+
+    def test_slow_reader_gets_a_resync_instead_of_a_backlog(self):
+        async def test(hub):
+            subscriber = hub.subscribe(1, 7)
+            for i in range(3):
+                hub.publish(1, [task_event(10, f'Title {i}')])
+                await asyncio.sleep(0.03)
+            self.assertEqual(subscriber.queue.qsize(), 1)
+            self.assertEqual(json.loads(subscriber.queue.get_nowait()), {'type': 'resync'})
+        self.run_on_hub(test, queue_size=2)
+
+    def test_revoke_closes_only_that_members_subscriptions(self):
+        async def test(hub):
+            revoked = hub.subscribe(1, 7)
+            kept = hub.subscribe(1, 8)
+            hub.publish(1, [task_event(10, 'Task')])
+            hub.revoke(1, 7)
+            await asyncio.sleep(0)
+            self.assertIs(revoked.queue.get_nowait(), Subscriber.CLOSE)
+            await asyncio.sleep(0.05)
+            self.assertTrue(revoked.queue.empty())
+            self.assertEqual(kept.queue.qsize(), 1)
+            self.assertTrue(hub.active)
+            hub.unsubscribe(kept)
+            self.assertFalse(hub.active)
+        self.run_on_hub(test)
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class BroadcastTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 2)
+        cls.task = Task.objects.filter(milestone__project=cls.project).first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def published(self, write, active=True):
+        with mock.patch.object(ProjectEventHub, 'active', new_callable=mock.PropertyMock, return_value=active), \
+                mock.patch.object(hub, 'publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            write()
+        return [call.args for call in publish.call_args_list]
+
+    def test_saved_rows_are_pushed_after_commit(self):
+        published = self.published(lambda: self.client.put(f'/api/tasks/{self.task.pk}/', {'title': 'Pushed'}, format='json'))
+        events = [event for project_id, events in published for event in events if event['table'] == 'tasks']
+        self.assertEqual({project_id for project_id, _ in published}, {self.project.pk})
+        self.assertEqual(events[-1]['op'], 'upsert')
+        self.assertEqual(events[-1]['row']['title'], 'Pushed')
+        self.assertIn('logs', {event['table'] for _, events in published for event in events})
+
+    def test_deleted_rows_are_pushed_without_a_row(self):
+        item = ChecklistItem.objects.filter(task=self.task).first()
+        item_id = item.pk
+        published = self.published(item.delete)
+        self.assertEqual(published, [(self.project.pk, [{'table': 'checklist', 'op': 'delete', 'id': item_id}])])
+
+    def test_nothing_is_pushed_while_nobody_watches(self):
+        with self.assertNumQueries(0), self.captureOnCommitCallbacks() as callbacks:
+            broadcast(self.project.pk, [self.task])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.published(lambda: Comment.objects.create(task=self.task, author=self.owner, text='Hi'), active=False), [])
+
+    def project_lookups(self, write):
+        # the project id queries of core.signals._project_id
+        with mock.patch.object(ProjectEventHub, 'active', new_callable=mock.PropertyMock, return_value=True), \
+                mock.patch.object(hub, 'publish'), CaptureQueriesContext(connection) as queries:
+            write()
+        return [query['sql'] for query in queries if query['sql'].startswith('SELECT "core_milestone"."project_id"')]
+
+    def test_the_receivers_of_a_save_look_the_project_up_once(self):
+        lookups = self.project_lookups(lambda: Comment.objects.create(task=self.task, author=self.owner, text='Hi'))
+        self.assertEqual(len(lookups), 1, lookups)
+        task = Task.objects.get(pk=self.task.pk)
+        task.status = 'Done' if task.status != 'Done' else 'To Do'
+        lookups = self.project_lookups(task.save)
+        self.assertEqual(len(lookups), 1, lookups)
+
+    def test_a_moved_task_is_looked_up_again(self):
+        other = create_project(self.owner, 1, name='Other')
+        task = Task.objects.get(pk=self.task.pk)
+        task.save()
+        task.milestone_id = Milestone.objects.get(project=other).pk
+        task.save()
+        document = SearchDocument.objects.get(kind='task', object_id=task.pk)
+        self.assertEqual(document.project_id, other.pk)
+
+
+class BoardWebsocketTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.outsider = User.objects.create_user('outsider', 'outsider@example.com', 'secret')
+        cls.project = create_project(cls.owner, 1)
+
+    def setUp(self):
+        # the shared hub is bound to each test's event loop
+        self.addCleanup(hub.attach, None)
+
+    def connect(self, path, token, then):
+        async def run():
+            received, sent = asyncio.Queue(), asyncio.Queue()
+            await received.put({'type': 'websocket.connect'})
+            scope = {'type': 'websocket', 'path': path, 'query_string': f'token={token}'.encode()}
+            socket = asyncio.create_task(board_updates(scope, received.get, sent.put))
+            reply = await asyncio.wait_for(sent.get(), 5)
+            result = await then(reply, received, sent)
+            await asyncio.wait_for(socket, 5)
+            return result
+        # async_to_sync, so the token check's sync_to_async runs on this thread and sees the test data
+        return async_to_sync(run)()
+
+    def refused(self, path, token):
+        async def then(reply, received, sent):
+            return reply
+        return self.connect(path, token, then)
+
+    def test_handshake_is_refused_without_membership(self):
+        path = f'/ws/projects/{self.project.pk}/'
+        self.assertEqual(self.refused('/ws/boards/1/', AccessToken.for_user(self.owner)), {'type': 'websocket.close', 'code': 4404})
+        for token in ('', 'not-a-token', AccessToken.for_user(self.outsider)):
+            self.assertEqual(self.refused(path, token), {'type': 'websocket.close', 'code': 4403}, token)
+        self.assertFalse(hub.active)
+
+    def test_member_receives_diffs_until_disconnect(self):
+        async def then(reply, received, sent):
+            self.assertEqual(reply, {'type': 'websocket.accept'})
+            self.assertTrue(hub.active)
+            hub.publish(self.project.pk, [task_event(10, 'Live')])
+            message = await asyncio.wait_for(sent.get(), 5)
+            await received.put({'type': 'websocket.disconnect', 'code': 1000})
+            return message
+        message = self.connect(f'/ws/projects/{self.project.pk}/', AccessToken.for_user(self.owner), then)
+        self.assertEqual(message['type'], 'websocket.send')
+        self.assertEqual(json.loads(message['text'])['events'], [task_event(10, 'Live')])
+        self.assertFalse(hub.active)
+
+    def test_revoked_member_is_disconnected(self):
+        async def then(reply, received, sent):
+            self.assertEqual(reply, {'type': 'websocket.accept'})
+            hub.revoke(self.project.pk, self.owner.pk)
+            return await asyncio.wait_for(sent.get(), 5)
+        message = self.connect(f'/ws/projects/{self.project.pk}/', AccessToken.for_user(self.owner), then)
+        self.assertEqual(message, {'type': 'websocket.close', 'code': 4403})
+        self.assertFalse(hub.active)
+
+
+class LogDigestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 0, 'Grouped')
+        cls.outside = create_project(cls.owner, 0, 'Outside')
+        cls.group = GroupModel.objects.create(verbose='Team', groupID='chat', systemMainPrompt='Summarize')
+        cls.group.projects.add(cls.project)
+        cls.to_time = timezone.now()
+        cls.from_time = cls.to_time - timedelta(hours=1)
+
+    def log(self, message, minutes_ago, project=None):
+        log = Log.objects.create(project=project or self.project, user=self.owner, message=message)
+        Log.objects.filter(pk=log.pk).update(timestamp=self.to_time - timedelta(minutes=minutes_ago))
+        return Log.objects.get(pk=log.pk)
+
+    def digest(self, **options):
+        return build_log_digest(self.group, self.from_time, self.to_time, **options)
+
+    def test_lines_of_the_groups_projects_in_the_window_oldest_first(self):
+        newer = self.log('Task 2 moved to Done', 5)
+        older = self.log('Task 1 moved to Doing', 30)
+        self.log('Too old', 61)
+        self.log('Not in the group', 10, self.outside)
+        self.log('Exactly at the start', 60)
+        self.log('Exactly at the end', 0)
+
+        lines = self.digest().split('\n')
+        self.assertEqual(lines[0], (
+            'Activity in Grouped by owner: 0 status changes, 0 tasks completed, 0 checklist items completed, '
+            '0 comments, 5 log entries'
+        ))
+        self.assertEqual(lines[1:], [
+            f'{older.timestamp} Log entry for Grouped by owner message: Task 1 moved to Doing',
+            f'{newer.timestamp} Log entry for Grouped by owner message: Task 2 moved to Done',
+            f'{self.to_time} Log entry for Grouped by owner message: Exactly at the end',
+        ])
+
+    def test_oldest_lines_are_dropped_beyond_the_limit(self):
+        logs = [self.log(f'Entry {i:02}', 50 - i) for i in range(20)]
+        line = len(f'{logs[0].timestamp} Log entry for Grouped by owner message: Entry 00') + 1
+        digest = self.digest(max_chars=line * 5 + line // 2)
+
+        summary, note, *kept = digest.split('\n')
+        self.assertTrue(summary.startswith('Activity in Grouped'))
+        self.assertEqual(note, '[15 older log entries omitted]')
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in kept], ['15', '16', '17', '18', '19'])
+        self.assertLessEqual(sum(len(entry) + 1 for entry in kept), line * 5 + line // 2)
+
+    def test_entry_longer_than_the_limit_is_omitted(self):
+        self.log('x' * 500, 5)
+        self.assertEqual(self.digest(max_chars=100).split('\n')[1:], ['[1 older log entries omitted]'])
+
+    def test_no_logs(self):
+        self.log('Too old', 120)
+        self.assertEqual(self.digest(), 'report for not working of persons in team for Team project')
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class ActivityRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'secret')
+        cls.project = create_project(cls.owner, 2)
+        cls.milestone = Milestone.objects.get(project=cls.project)
+        Task.objects.filter(milestone=cls.milestone).update(assignee=cls.owner)
+        cls.task, cls.other_task = Task.objects.filter(milestone=cls.milestone).order_by('pk')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def totals(self):
+        counters = ('status_changes', 'tasks_completed', 'checklist_completed', 'comments_added')
+        rows = list(activity_totals([self.project.pk]))
+        return {counter: sum(row[counter] for row in rows) for counter in counters}
+
+    def assertCounted(self, write, **expected):
+        before = self.totals()
+        response = write()
+        self.assertLess(response.status_code, 300, getattr(response, 'data', None))
+        after = self.totals()
+        self.assertEqual({counter: after[counter] - before[counter] for counter in after}, {
+            'status_changes': 0, 'tasks_completed': 0, 'checklist_completed': 0, 'comments_added': 0, **expected,
+        })
+
+    def put(self, task, body):
+        return lambda: self.client.put(f'/api/tasks/{task.pk}/', body, format='json')
+
+    def test_status_changes(self):
+        self.assertCounted(self.put(self.task, {'status': 'In Progress'}), status_changes=1)
+        self.assertCounted(self.put(self.task, {'status': 'In Progress'}))
+        self.assertCounted(self.put(self.task, {'status': 'Done', 'title': 'Finished'}), status_changes=1, tasks_completed=1)
+        self.assertCounted(self.put(self.task, {'title': 'Renamed'}))
+
+    def test_checklist_changes_through_the_task(self):
+        items = [{'id': item.pk, 'text': item.text} for item in self.task.checklist.order_by('pk')]
+        completed = [{**items[0], 'is_completed': True}, items[1]]
+        self.assertCounted(self.put(self.task, {'checklist': completed}), checklist_completed=1)
+        self.assertCounted(self.put(self.task, {'checklist': completed}))
+        self.assertCounted(self.put(self.task, {'checklist': [
+            *completed, {'text': 'Done already', 'is_completed': True}, {'text': 'Still open'},
+        ]}), checklist_completed=1)
+        # reopened and completed again counts again
+        self.assertCounted(self.put(self.task, {'checklist': [{**items[0], 'is_completed': False}, items[1]]}))
+        self.assertCounted(self.put(self.task, {'checklist': completed}), checklist_completed=1)
+
+    def test_checklist_item_endpoint(self):
+        url = f'/api/tasks/{self.task.pk}/checklist/'
+        self.assertCounted(lambda: self.client.post(url, {'text': 'Open'}, format='json'))
+        self.assertCounted(lambda: self.client.post(url, {'text': 'Closed', 'is_completed': True}, format='json'), checklist_completed=1)
+
+    def test_task_created_with_completed_checklist_items(self):
+        body = {
+            'title': 'New', 'description': 'New', 'assignee': self.owner.pk,
+            'checklist': [{'text': 'Done', 'is_completed': True}, {'text': 'Done too', 'is_completed': True}, {'text': 'Open'}],
+        }
+        self.assertCounted(
+            lambda: self.client.post(f'/api/milestones/{self.milestone.pk}/tasks/', body, format='json'),
+            checklist_completed=2,
+        )
+
+    def test_comments(self):
+        url = f'/api/tasks/{self.task.pk}/comments/'
+        self.assertCounted(lambda: self.client.post(url, {'text': 'Note', 'author': self.owner.pk}, format='json'), comments_added=1)
+
+    def test_bulk_updates(self):
+        operations = [
+            {'op': 'update', 'id': self.task.pk, 'status': 'Done'},
+            {'op': 'update', 'id': self.other_task.pk, 'status': 'In Progress'},
+        ]
+
+        def bulk():
+            return self.client.post('/api/tasks/bulk/', {'operations': operations}, format='json')
+        self.assertCounted(bulk, status_changes=2, tasks_completed=1)
+        self.assertCounted(bulk)
+
+
+class FastJSONTests(TestCase):
+    """FastJSONRenderer and FastJSONParser give the bytes and values DRF's JSON classes do."""
+
+    def payload(self):
+        tehran = timezone.get_fixed_timezone(210)
+        return {
+            'utc': datetime(2026, 10, 17, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'utc_whole_second': datetime(2026, 10, 17, 8, 30, 15, tzinfo=dt_timezone.utc),
+            'local': datetime(2026, 10, 17, 12, 0, 0, 5000, tzinfo=tehran),
+            'naive': datetime(2026, 10, 17, 12, 0),
+            'date': date(2026, 10, 17),
+            'time': time(9, 15, 30, 250),
+            'decimal': Decimal('12.50'),
+            'separators': 'line paragraph end',
+            'text': 'زمان – café 🚀 "quoted" \\ back\nslash',
+            'numbers': [0, -1, 2 ** 53, 0.1, 2.5, True, False, None],
+            'nested': {1: {'ids': (1, 2)}, 'empty': {}, 'list': []},
+        }
+
+    def test_rendered_bytes_match_drf(self):
+        data = self.payload()
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render([data, data]), JSONRenderer().render([data, data]))
+        self.assertEqual(FastJSONRenderer().render(None), JSONRenderer().render(None))
+
+    def test_exponent_floats_keep_their_value(self):
+        # orjson spells them 1e-7 where json writes 1e-07, the numbers are the same
+        floats = [1e-7, 1.5e300, -2.5e-10]
+        self.assertEqual(json.loads(FastJSONRenderer().render(floats)), floats)
+
+    def test_line_and_paragraph_separators_are_escaped(self):
+        rendered = FastJSONRenderer().render({'text': '  '})
+        self.assertEqual(rendered, b'{"text":"\\u2028\\u2029"}')
+
+    def test_parsed_values_match_drf(self):
+        body = JSONRenderer().render(self.payload())
+        parsed = FastJSONParser().parse(io.BytesIO(body))
+        self.assertEqual(parsed, JSONParser().parse(io.BytesIO(body)))
+        self.assertEqual(parsed['separators'], 'line paragraph end')
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"unterminated": '))
+
+
+class BenchmarkTests(TestCase):
+
+    def test_every_route_answers_on_a_seeded_workspace(self):
+        sizes = {'projects': 2, 'milestones': 2, 'tasks': 3, 'logs': 5, 'members': 2}
+        results = run_benchmark(sizes, repeat=1)
+        self.assertEqual(list(results), [name for name, *_ in BENCHMARK_ROUTES])
+        for name, result in results.items():
+            with self.subTest(route=name):
+                self.assertLess(result['status'], 300)
+        # the streams are read to the end, their queries counted
+        for name in ('log-stream', 'milestone-log-stream'):
+            self.assertGreater(results[name]['bytes'], 5 * len('event: log'))
+            self.assertGreater(results[name]['queries'], 1)
+
+    def test_time_breaches_are_reported_apart_from_query_breaches(self):
+        budget = {'status': 200, 'queries': 5, 'ms': 10.0, 'bytes': 100}
+        budgets = {'route': budget}
+        self.assertEqual(over_budget({'route': {**budget, 'ms': 29.0}}, budgets), [])
+        self.assertEqual(over_budget({'route': {**budget, 'ms': 31.0}}, budgets), [('route', 'ms', 31.0, 10.0)])
+        self.assertEqual(over_budget({'route': {**budget, 'queries': 6}}, budgets), [('route', 'queries', 6, 5)])
+        self.assertEqual(over_budget({'other': budget}, budgets), [('other', 'budget', None, None)])
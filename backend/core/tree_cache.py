@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from .models import Project
+from .serializers import ProjectSerializer
+
+
+# everything ProjectSerializer walks, loaded in one query per level
+PROJECT_TREE_PREFETCH = (
+    'milestones',
+    'milestones__tasks',
+    'milestones__tasks__checklist',
+    'milestones__tasks__comments',
+    'milestones__tasks__dependencies_from',
+    'milestones__tasks__tags',
+    'permissions',
+)
+
+
+def build_project_trees(project_ids):
+    """{project id: serialized project tree} for the projects that exist."""
+    projects = Project.objects.filter(pk__in=project_ids).prefetch_related(*PROJECT_TREE_PREFETCH)
+    return {tree['id']: tree for tree in ProjectSerializer(projects, many=True).data}
+
+
+async def abuild_project_trees(project_ids):
+    """build_project_trees() for async views; serializing the prefetched projects runs no queries."""
+    projects = Project.objects.filter(pk__in=project_ids).prefetch_related(*PROJECT_TREE_PREFETCH)
+    projects = [project async for project in projects]
+    return {tree['id']: tree for tree in ProjectSerializer(projects, many=True).data}
+
+
+class ProjectTreeCache:
+    """
+    Serialized project trees, one fragment per project, in the Django cache
+    named by settings.PROJECT_TREE_CACHE (local memory, file, ... anything
+    Django ships). Fragments are the same for every member; a user's
+    response is just the fragments of their projects.
+
+    Fragments are keyed by the project's state, the same latest timestamps
+    and row counts its ETag is made from, so a write anywhere, by any
+    process, moves readers to a new key and nothing has to be invalidated.
+    Old fragments just expire. A miss takes a short per-project lock so
+    that concurrent requests wait for one build instead of all running it.
+    """
+
+    def __init__(self, alias=None, timeout=None, lock_timeout=10, wait_interval=0.05):
+        self.alias = alias
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_interval = wait_interval
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.lock_waits = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'PROJECT_TREE_CACHE', 'default')]
+
+    def _timeout(self):
+        return self.timeout or getattr(settings, 'PROJECT_TREE_CACHE_TIMEOUT', 300)
+
+    @staticmethod
+    def _keys(states):
+        # a fragment is stored under the state it was built at or after, so
+        # a request that read a newer state can never be given it
+        return {
+            project_id: f'project-tree:{project_id}:{hashlib.sha1(repr(state).encode()).hexdigest()}'
+            for project_id, state in states.items()
+        }
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def get_many(self, states):
+        """
+        The trees of the projects in ``states``, {project id: state from
+        conditional.project_states()}, in id order, building only the
+        missing ones.
+        """
+        project_ids = sorted(states)
+        keys = self._keys(states)
+        found = self.cache.get_many(keys.values())
+        trees = {project_id: found[key] for project_id, key in keys.items() if key in found}
+        missing = [project_id for project_id in project_ids if project_id not in trees]
+        self._count(hits=len(trees), misses=len(missing))
+        if missing:
+            trees.update(self._fill(missing, keys))
+        return [trees[project_id] for project_id in project_ids if project_id in trees]
+
+    async def aget_many(self, states):
+        """get_many() for async views."""
+        project_ids = sorted(states)
+        keys = self._keys(states)
+        found = await self.cache.aget_many(keys.values())
+        trees = {project_id: found[key] for project_id, key in keys.items() if key in found}
+        missing = [project_id for project_id in project_ids if project_id not in trees]
+        self._count(hits=len(trees), misses=len(missing))
+        if missing:
+            trees.update(await self._afill(missing, keys))
+        return [trees[project_id] for project_id in project_ids if project_id in trees]
+
+    def _fill(self, project_ids, keys):
+        locks = {project_id: f'{keys[project_id]}:lock' for project_id in project_ids}
+        mine = [project_id for project_id in project_ids if self.cache.add(locks[project_id], 1, self.lock_timeout)]
+        others = [project_id for project_id in project_ids if project_id not in mine]
+
+        trees = {}
+        if mine:
+            try:
+                trees = self._build(mine, keys)
+            finally:
+                self.cache.delete_many([locks[project_id] for project_id in mine])
+
+        if others:
+            # being built by another request; wait for it, then build whatever still isn't there
+            self._count(lock_waits=len(others))
+            deadline = time.monotonic() + self.lock_timeout
+            while others and time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                found = self.cache.get_many([keys[project_id] for project_id in others])
+                for project_id in others:
+                    if keys[project_id] in found:
+                        trees[project_id] = found[keys[project_id]]
+                others = [project_id for project_id in others if project_id not in trees]
+                if not self.cache.get_many([locks[project_id] for project_id in others]):
+                    break
+            if others:
+                trees.update(self._build(others, keys))
+        return trees
+
+    def _build(self, project_ids, keys):
+        trees = build_project_trees(project_ids)
+        self._count(builds=len(trees))
+        self.cache.set_many({keys[project_id]: tree for project_id, tree in trees.items()}, self._timeout())
+        return trees
+
+    async def _afill(self, project_ids, keys):
+        # _fill() waiting with asyncio.sleep, so a waiting request doesn't hold a thread
+        locks = {project_id: f'{keys[project_id]}:lock' for project_id in project_ids}
+        mine = [project_id for project_id in project_ids if await self.cache.aadd(locks[project_id], 1, self.lock_timeout)]
+        others = [project_id for project_id in project_ids if project_id not in mine]
+
+        trees = {}
+        if mine:
+            try:
+                trees = await self._abuild(mine, keys)
+            finally:
+                await self.cache.adelete_many([locks[project_id] for project_id in mine])
+
+        if others:
+            self._count(lock_waits=len(others))
+            deadline = time.monotonic() + self.lock_timeout
+            while others and time.monotonic() < deadline:
+                await asyncio.sleep(self.wait_interval)
+                found = await self.cache.aget_many([keys[project_id] for project_id in others])
+                for project_id in others:
+                    if keys[project_id] in found:
+                        trees[project_id] = found[keys[project_id]]
+                others = [project_id for project_id in others if project_id not in trees]
+                if not await self.cache.aget_many([locks[project_id] for project_id in others]):
+                    break
+            if others:
+                trees.update(await self._abuild(others, keys))
+        return trees
+
+    async def _abuild(self, project_ids, keys):
+        trees = await abuild_project_trees(project_ids)
+        self._count(builds=len(trees))
+        await self.cache.aset_many({keys[project_id]: tree for project_id, tree in trees.items()}, self._timeout())
+        return trees
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'builds': self.builds,
+                'lock_waits': self.lock_waits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+project_tree_cache = ProjectTreeCache()
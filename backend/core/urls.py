@@ -1,51 +1,85 @@
+from django.conf import settings
 from django.urls import path
+from . import async_views
+from .instrumentation import metrics_view
+from .streams import project_log_stream, milestone_log_stream
 from .views import (
     UserAPIView,
     UserDetailAPIView,
     ProjectAPIView,
+    ProjectSnapshotAPIView,
     ProjectDetailAPIView,
     ProjectPermissionAPIView,
+    ProjectScheduleAPIView,
+    ProjectActivityAPIView,
     MilestoneAPIView,
     TaskAPIView,
+    TaskQueryAPIView,
     TaskDetailAPIView,
+    TaskBulkAPIView,
     ChecklistItemAPIView,
     CommentAPIView,
     TagAPIView,
     LogAPIView,
     MilestoneLogAPIView,
     AllLogsAPIView,
-    ProjectUsersAPIView
+    ProjectUsersAPIView,
+    SearchAPIView,
 )
 
-urlpatterns = [
-    # User endpoints
-    # path('users/', UserAPIView.as_view(), name='user-list'),
-    # path('users/<int:pk>/', UserDetailAPIView.as_view(), name='user-detail'),
 
-    # Project endpoints
-    path('projects/', ProjectAPIView.as_view(), name='project-list'),
-    path('projects/<int:pk>/', ProjectDetailAPIView.as_view(), name='project-detail'),
-    path('projects/<int:project_pk>/permissions/', ProjectPermissionAPIView.as_view(), name='project-permissions'),
+def build_urlpatterns(async_reads):
+    """The API routes; with ``async_reads`` the hot read paths answer GETs from core.async_views."""
+
+    def read_view(view, async_view):
+        # other methods still reach ``view``
+        return async_view.as_view() if async_reads else view.as_view()
+
+    return [
+        # User endpoints
+        # path('users/', UserAPIView.as_view(), name='user-list'),
+        # path('users/<int:pk>/', UserDetailAPIView.as_view(), name='user-detail'),
+
+        # Project endpoints
+        path('projects/', read_view(ProjectAPIView, async_views.AsyncProjectView), name='project-list'),
+        path('projects/snapshot/', ProjectSnapshotAPIView.as_view(), name='project-snapshot'),
+        path('projects/<int:pk>/', read_view(ProjectDetailAPIView, async_views.AsyncProjectDetailView), name='project-detail'),
+        path('projects/<int:project_pk>/permissions/', ProjectPermissionAPIView.as_view(), name='project-permissions'),
+        path('projects/<int:project_pk>/schedule/', ProjectScheduleAPIView.as_view(), name='project-schedule'),
+        path('projects/<int:project_pk>/activity/', ProjectActivityAPIView.as_view(), name='project-activity'),
     
-    # Milestone endpoints
-    path('projects/<int:project_pk>/milestones/', MilestoneAPIView.as_view(), name='milestone-list'),
-    path('milestones/<int:milestone_pk>/logs/', MilestoneLogAPIView.as_view(), name='milestone-logs'),
+        # Milestone endpoints
+        path('projects/<int:project_pk>/milestones/', MilestoneAPIView.as_view(), name='milestone-list'),
+        path('milestones/<int:milestone_pk>/logs/', read_view(MilestoneLogAPIView, async_views.AsyncMilestoneLogView), name='milestone-logs'),
+        path('milestones/<int:milestone_pk>/logs/stream/', milestone_log_stream, name='milestone-log-stream'),
     
-    # Task endpoints
-    path('milestones/<int:milestone_pk>/tasks/', TaskAPIView.as_view(), name='task-list'),
-    path('tasks/<int:pk>/', TaskDetailAPIView.as_view(), name='task-detail'),
+        # Task endpoints
+        path('milestones/<int:milestone_pk>/tasks/', read_view(TaskAPIView, async_views.AsyncTaskView), name='task-list'),
+        path('tasks/', TaskQueryAPIView.as_view(), name='task-query'),
+        path('tasks/<int:pk>/', TaskDetailAPIView.as_view(), name='task-detail'),
+        path('tasks/bulk/', TaskBulkAPIView.as_view(), name='task-bulk'),
     
-    # Checklist endpoints
-    path('tasks/<int:task_pk>/checklist/', ChecklistItemAPIView.as_view(), name='checklist-create'),
+        # Checklist endpoints
+        path('tasks/<int:task_pk>/checklist/', ChecklistItemAPIView.as_view(), name='checklist-create'),
     
-    # Comment endpoints
-    path('tasks/<int:task_pk>/comments/', CommentAPIView.as_view(), name='comment-create'),
+        # Comment endpoints
+        path('tasks/<int:task_pk>/comments/', CommentAPIView.as_view(), name='comment-create'),
     
-    # Tag endpoints
-    path('tags/', TagAPIView.as_view(), name='tag-list'),
+        # Tag endpoints
+        path('tags/', TagAPIView.as_view(), name='tag-list'),
     
-    # Log endpoints
-    path('projects/<int:project_pk>/logs/', LogAPIView.as_view(), name='log-list'),
-    path('logs/', AllLogsAPIView.as_view(), name='all-logs'),
-    path('project-users/', ProjectUsersAPIView.as_view(), name='project-users'),
-]
\ No newline at end of file
+        # Log endpoints
+        path('projects/<int:project_pk>/logs/', read_view(LogAPIView, async_views.AsyncLogView), name='log-list'),
+        path('projects/<int:project_pk>/logs/stream/', project_log_stream, name='log-stream'),
+        path('logs/', read_view(AllLogsAPIView, async_views.AsyncAllLogsView), name='all-logs'),
+        path('project-users/', ProjectUsersAPIView.as_view(), name='project-users'),
+
+        # Full-text search over tasks, comments and logs
+        path('search/', SearchAPIView.as_view(), name='search'),
+
+        # Prometheus metrics
+        path('metrics/', metrics_view, name='metrics'),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.ASYNC_READ_VIEWS)
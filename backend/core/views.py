@@ -14,9 +14,21 @@ from .serializers import (
     CommentSerializer, 
     DependencySerializer, 
     TagSerializer, 
-    LogSerializer
+    LogSerializer,
+    SparseTaskSerializer,
 )
-from django.db.models import Q
+from .conditional import make_etag, not_modified, project_state, project_states, log_state
+from .bulk import TaskBatch, task_log_message, MAX_BULK_OPERATIONS
+from .pagination import keyset_paginate, link_header
+from .permissions import HasProjectRole, get_project_roles, EDIT_ROLES, ADMIN_ROLES
+from .rollups import activity_totals
+from .scheduling import build_project_schedule, DependencyCycleError
+from .search import SEARCH_KINDS, search, search_terms
+from .task_query import task_filter, task_ordering, task_fields, task_queryset
+from .snapshot import build_project_snapshot, build_project_delta, new_sync_cursor, tombstone_horizon
+from .tree_cache import project_tree_cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -71,17 +83,36 @@ class ProjectAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        projects = Project.objects.filter(permissions__user=request.user).prefetch_related(
-            'milestones',
-            'milestones__tasks',
-            'milestones__tasks__checklist',
-            'milestones__tasks__comments',
-            'milestones__tasks__dependencies_from',
-            'milestones__tasks__tags',
-            'permissions'
-        )
-        serializer = ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        since = request.query_params.get('since')
+        if since is not None:
+            return self.get_delta(request, since)
+
+        # checked before any of the tree is loaded
+        states = project_states(get_project_roles(request))
+        etag = make_etag(request, sorted(states.items()))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        # per-project trees shared by every member, only the missing ones are built
+        return Response(project_tree_cache.get_many(states), headers={'ETag': etag})
+
+    def get_delta(self, request, since):
+        since_time = parse_datetime(since)
+        if since_time is None:
+            return Response({'error': 'Invalid since cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since_time):
+            since_time = timezone.make_aware(since_time)
+        if since_time < tombstone_horizon():
+            # deletes before it may have been pruned, the client has to start over
+            return Response(
+                {'error': 'Cursor expired, fetch /api/projects/snapshot/ again'},
+                status=status.HTTP_410_GONE,
+            )
+
+        # taken before reading so rows written during the request show up again next time
+        cursor = new_sync_cursor()
+        return Response({'cursor': cursor, **build_project_delta(request.user, since_time)})
 
     def post(self, request):
         print(request.data)
@@ -99,43 +130,78 @@ class ProjectAPIView(APIView):
             print(e)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProjectDetailAPIView(APIView):
+class ProjectSnapshotAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        cursor = new_sync_cursor()
+        project_ids = Project.objects.filter(permissions__user=request.user).values('pk')
+        return Response({'cursor': cursor, 'tables': build_project_snapshot(project_ids)})
+
+class ProjectDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated, HasProjectRole]
+    project_roles = {'PUT': EDIT_ROLES, 'DELETE': ADMIN_ROLES}
+
     def get(self, request, pk):
-        project = get_object_or_404(Project, pk=pk, permissions__user=request.user)
-        serializer = ProjectSerializer(project)
-        return Response(serializer.data)
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=pk)
+        states = project_states([project.pk])
+        etag = make_etag(request, sorted(states.items()))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        return Response(project_tree_cache.get_many(states)[0], headers={'ETag': etag})
 
     def put(self, request, pk):
-        project = get_object_or_404(Project, pk=pk, permissions__user=request.user)
-        permission = project.permissions.get(user=request.user)
-        if permission.role not in ['admin', 'editor']:
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-        
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=pk)
+        self.check_object_permissions(request, project)
+
         serializer = ProjectSerializer(project, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            # the whole tree, as GET returns it, from the prefetching tree cache
+            return Response(project_tree_cache.get_many(project_states([project.pk]))[0])
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
-        project = get_object_or_404(Project, pk=pk, permissions__user=request.user)
-        permission = project.permissions.get(user=request.user)
-        if permission.role != 'admin':
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-        
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=pk)
+        self.check_object_permissions(request, project)
+
         project.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class ProjectPermissionAPIView(APIView):
+class ProjectScheduleAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, project_pk):
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=project_pk)
+        try:
+            schedule = build_project_schedule(project.pk)
+        except DependencyCycleError as e:
+            return Response({'error': 'Dependency cycle', 'tasks': e.task_ids}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(schedule)
+
+class ProjectActivityAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get(self, request, project_pk):
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=project_pk)
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value is not None:
+                bounds[param] = parse_datetime(value)
+                if bounds[param] is None:
+                    return Response({'error': f'Invalid {param} time'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(list(activity_totals([project.pk], bounds.get('from'), bounds.get('to'))))
+
+class ProjectPermissionAPIView(APIView):
+    permission_classes = [IsAuthenticated, HasProjectRole]
+    project_roles = {'POST': ADMIN_ROLES}
+
     def post(self, request, project_pk):
-        project = get_object_or_404(Project, pk=project_pk, permissions__user=request.user)
-        permission = project.permissions.get(user=request.user)
-        if permission.role != 'admin':
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=project_pk)
+        self.check_object_permissions(request, project)
 
         user_id = request.data.get('user_id')
         role = request.data.get('role')
@@ -161,19 +227,23 @@ class ProjectPermissionAPIView(APIView):
         return Response({'message': 'Permission updated successfully'})
 
 class MilestoneAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasProjectRole]
+    project_roles = {'POST': EDIT_ROLES}
 
     def get(self, request, project_pk):
-        project = get_object_or_404(Project, pk=project_pk, permissions__user=request.user)
-        milestones = project.milestones.all()
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=project_pk)
+        etag = make_etag(request, project_state([project.pk]))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        milestones = project.milestones.prefetch_related('tasks', *(f'tasks__{name}' for name in TASK_PREFETCH))
         serializer = MilestoneSerializer(milestones, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag})
 
     def post(self, request, project_pk):
-        project = get_object_or_404(Project, pk=project_pk, permissions__user=request.user)
-        permission = project.permissions.get(user=request.user)
-        if permission.role not in ['admin', 'editor']:
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        project = get_object_or_404(Project.objects.filter(pk__in=get_project_roles(request)), pk=project_pk)
+        self.check_object_permissions(request, project)
 
         serializer = MilestoneSerializer(data={**request.data, "project": project.pk})
         try:
@@ -184,20 +254,27 @@ class MilestoneAPIView(APIView):
             print(e)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# everything TaskSerializer walks, loaded with the tasks (the async views can't query lazily)
+TASK_PREFETCH = ('checklist', 'comments', 'dependencies_from', 'tags')
+
 class TaskAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasProjectRole]
+    project_roles = {'POST': EDIT_ROLES}
 
     def get(self, request, milestone_pk):
-        milestone = get_object_or_404(Milestone, pk=milestone_pk, project__permissions__user=request.user)
-        tasks = milestone.tasks.all()
+        milestone = get_object_or_404(Milestone, pk=milestone_pk, project_id__in=get_project_roles(request))
+        etag = make_etag(request, project_state([milestone.project_id]))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        tasks = milestone.tasks.prefetch_related(*TASK_PREFETCH)
         serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag})
 
     def post(self, request, milestone_pk):
-        milestone = get_object_or_404(Milestone, pk=milestone_pk, project__permissions__user=request.user)
-        permission = milestone.project.permissions.get(user=request.user)
-        if permission.role not in ['admin', 'editor']:
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        milestone = get_object_or_404(Milestone, pk=milestone_pk, project_id__in=get_project_roles(request))
+        self.check_object_permissions(request, milestone)
 
         serializer = TaskSerializer(data=request.data)
         try:
@@ -208,49 +285,80 @@ class TaskAPIView(APIView):
             tag_ids = request.data.get('tags', [])
             for tag_id in tag_ids:
                 tag = get_object_or_404(Tag, id=tag_id)
-                TaskTag.objects.create(task=task, tag=tag)
+                TaskTag.objects.get_or_create(task=task, tag=tag)
 
             return Response(TaskSerializer(task).data, status=status.HTTP_201_CREATED)
         except Exception as e:
             print(e)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class TaskDetailAPIView(APIView):
+class TaskQueryAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        """
+        Tasks of the user's projects, narrowed to one ?milestone= or
+        ?project= and filtered server-side (see core.task_query), in pages
+        of ?limit= ordered by ?ordering= with only the ?fields= asked for.
+        """
+        project_ids = get_project_roles(request)
+        tasks = Task.objects.filter(milestone__project_id__in=project_ids)
+        milestone_id = request.query_params.get('milestone')
+        project_id = request.query_params.get('project')
+        if milestone_id is not None:
+            if not milestone_id.isdigit():
+                return Response({'error': 'Invalid milestone'}, status=status.HTTP_400_BAD_REQUEST)
+            milestone = get_object_or_404(Milestone, pk=milestone_id, project_id__in=project_ids)
+            project_ids = [milestone.project_id]
+            tasks = Task.objects.filter(milestone=milestone)
+        elif project_id is not None:
+            if not project_id.isdigit():
+                return Response({'error': 'Invalid project'}, status=status.HTTP_400_BAD_REQUEST)
+            project = get_object_or_404(Project.objects.filter(pk__in=project_ids), pk=project_id)
+            project_ids = [project.pk]
+            tasks = Task.objects.filter(milestone__project=project)
+
+        ordering = task_ordering(request.query_params)
+        fields = task_fields(request.query_params)
+        tasks = task_queryset(tasks.filter(task_filter(request.query_params)), fields, ordering)
+
+        etag = make_etag(request, project_state(project_ids))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        tasks, next_url = keyset_paginate(request, [tasks], ordering)
+        serializer = SparseTaskSerializer(tasks, many=True, fields=fields)
+        return Response(serializer.data, headers={'ETag': etag, **link_header(next_url)})
+
+class TaskDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated, HasProjectRole]
+    project_roles = {'PUT': EDIT_ROLES, 'DELETE': EDIT_ROLES}
+
     def get(self, request, pk):
-        task = get_object_or_404(Task, pk=pk, milestone__project__permissions__user=request.user)
+        task = get_object_or_404(Task, pk=pk, milestone__project_id__in=get_project_roles(request))
         serializer = TaskSerializer(task)
         return Response(serializer.data)
 
     def put(self, request, pk):
-        task = get_object_or_404(Task, pk=pk, milestone__project__permissions__user=request.user)
-        permission = task.milestone.project.permissions.get(user=request.user)
-        if permission.role not in ['admin', 'editor']:
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        task = get_object_or_404(
+            Task.objects.select_related('milestone__project'),
+            pk=pk,
+            milestone__project_id__in=get_project_roles(request),
+        )
+        self.check_object_permissions(request, task)
 
         serializer = TaskSerializer(task, data=request.data, partial=True)
         if serializer.is_valid():
-            old_task_data = TaskSerializer(task).data
+            old_description = task.description
+            # checklist items are reconciled by id inside TaskSerializer.update
             task = serializer.save()
 
-            # Update checklist items
-            checklist_data = request.data.get('checklist', [])
-            task.checklist.all().delete()  # Delete existing checklist items
-            for item_data in checklist_data:
-                ChecklistItem.objects.create(task=task, **item_data)
-
             # Log the task update
-            log_message = f"{task} change status to {task.status}"
-            if old_task_data['description'] != task.description:
-                log_message = task.description
-                if request.user != task.assignee:
-                    log_message += f"\nUser {request.user.get_full_name()} assigned the task to user {task.assignee.get_full_name()}"
-            
             Log.objects.create(
                 project=task.milestone.project,
                 user=request.user,
-                message=log_message,
+                message=task_log_message(task, old_description, request.user),
                 task=task,
             )
 
@@ -258,22 +366,47 @@ class TaskDetailAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
-        task = get_object_or_404(Task, pk=pk, milestone__project__permissions__user=request.user)
-        permission = task.milestone.project.permissions.get(user=request.user)
-        if permission.role not in ['admin', 'editor']:
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        task = get_object_or_404(
+            Task.objects.select_related('milestone'),
+            pk=pk,
+            milestone__project_id__in=get_project_roles(request),
+        )
+        self.check_object_permissions(request, task)
 
         task.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class ChecklistItemAPIView(APIView):
+class TaskBulkAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with an operations list'}, status=status.HTTP_400_BAD_REQUEST)
+        operations = request.data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return Response({'error': 'operations must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > MAX_BULK_OPERATIONS:
+            return Response(
+                {'error': f'At most {MAX_BULK_OPERATIONS} operations per request'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        batch = TaskBatch(request, operations)
+        if not batch.validate():
+            return Response({'results': batch.results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': batch.apply()})
+
+class ChecklistItemAPIView(APIView):
+    permission_classes = [IsAuthenticated, HasProjectRole]
+    project_roles = {'POST': EDIT_ROLES}
+
     def post(self, request, task_pk):
-        task = get_object_or_404(Task, pk=task_pk, milestone__project__permissions__user=request.user)
-        permission = task.milestone.project.permissions.get(user=request.user)
-        if permission.role not in ['admin', 'editor']:
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        task = get_object_or_404(
+            Task.objects.select_related('milestone'),
+            pk=task_pk,
+            milestone__project_id__in=get_project_roles(request),
+        )
+        self.check_object_permissions(request, task)
 
         serializer = ChecklistItemSerializer(data=request.data)
         if serializer.is_valid():
@@ -285,7 +418,7 @@ class CommentAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, task_pk):
-        task = get_object_or_404(Task, pk=task_pk, milestone__project__permissions__user=request.user)
+        task = get_object_or_404(Task, pk=task_pk, milestone__project_id__in=get_project_roles(request))
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save(task=task, author=request.user)
@@ -296,9 +429,15 @@ class TagAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        # the table is small and has no timestamps, so its rows are the validator
+        etag = make_etag(request, list(Tag.objects.order_by('pk').values_list('pk', 'name', 'color')))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
         tags = Tag.objects.all()
         serializer = TagSerializer(tags, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag})
 
     def post(self, request):
         serializer = TagSerializer(data=request.data)
@@ -307,6 +446,26 @@ class TagAPIView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# newest first, id breaks ties between logs written in the same instant
+LOG_ORDERING = ('-timestamp', '-id')
+
+# beyond this many member projects the all-logs feed reads them in one branch
+MAX_FEED_BRANCHES = 50
+
+
+def all_logs_querysets(user, project_ids):
+    """
+    The branches of the user's all-logs feed: one per member project and
+    the user's own logs, each paginated from its own index.
+    """
+    if user.is_superuser:
+        return [Log.objects.all()]
+    if len(project_ids) > MAX_FEED_BRANCHES:
+        projects = [Log.objects.filter(project_id__in=project_ids)]
+    else:
+        projects = [Log.objects.filter(project_id=project_id) for project_id in sorted(project_ids)]
+    return [*projects, Log.objects.filter(user=user)]
+
 class LogAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -320,9 +479,15 @@ class LogAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request, project_pk=None):
-        logs = Log.objects.filter(project_id=project_pk)
+        querysets = [Log.objects.filter(project_id=project_pk)]
+        etag = make_etag(request, log_state(querysets))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        logs, next_url = keyset_paginate(request, querysets, LOG_ORDERING)
         serializer = LogSerializer(logs, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag, **link_header(next_url)})
 
 
 
@@ -345,24 +510,53 @@ class MilestoneLogAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, milestone_pk):
-        milestone = get_object_or_404(Milestone, pk=milestone_pk, project__permissions__user=request.user)
-        logs = Log.objects.filter(project=milestone.project).order_by('-timestamp')
+        milestone = get_object_or_404(Milestone, pk=milestone_pk, project_id__in=get_project_roles(request))
+        querysets = [Log.objects.filter(project_id=milestone.project_id)]
+        etag = make_etag(request, log_state(querysets))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        logs, next_url = keyset_paginate(request, querysets, LOG_ORDERING)
         serializer = LogSerializer(logs, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag, **link_header(next_url)})
 
 class AllLogsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        if user.is_superuser:
-            logs = Log.objects.all().order_by('-timestamp')
-        else:
-            logs = Log.objects.filter(
-                Q(project__permissions__user=user) | Q(user=user)
-            ).distinct().order_by('-timestamp')
+        roles = get_project_roles(request)
+        querysets = all_logs_querysets(request.user, roles)
+        etag = make_etag(request, log_state(querysets), sorted(roles))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        logs, next_url = keyset_paginate(request, querysets, LOG_ORDERING)
         serializer = LogSerializer(logs, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag, **link_header(next_url)})
+
+class SearchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        terms = search_terms(request.query_params.get('q', ''))
+        if not terms:
+            return Response({'error': 'Missing search query'}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = request.query_params.getlist('kind')
+        if any(kind not in SEARCH_KINDS for kind in kinds):
+            return Response({'error': f"kind must be one of {', '.join(SEARCH_KINDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # only the projects the user is a member of, optionally narrowed to one
+        project_ids = set(get_project_roles(request))
+        project = request.query_params.get('project')
+        if project is not None:
+            if not project.isdigit():
+                return Response({'error': 'Invalid project'}, status=status.HTTP_400_BAD_REQUEST)
+            project_ids &= {int(project)}
+
+        hits, next_url = search(request, terms, project_ids, kinds)
+        return Response(hits, headers=link_header(next_url))
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -0,0 +1,60 @@
+import asyncio
+import re
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from .permissions import token_member_id
+from .realtime import hub, Subscriber
+
+
+BOARD_PATH = re.compile(r'^/ws/projects/(?P<project_id>\d+)/$')
+
+
+async def board_updates(scope, receive, send):
+    """
+    ASGI websocket endpoint /ws/projects/<id>/?token=<access token>.
+
+    Members of the project receive {"type": "diff", "project", "events"}
+    messages with the rows changed since the previous one, or
+    {"type": "resync"} when they fell behind and should refetch.
+    """
+    match = BOARD_PATH.match(scope['path'])
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if match is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    project_id = int(match['project_id'])
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [''])[0]
+    user_id = await sync_to_async(token_member_id)(token, project_id)
+    if user_id is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    hub.attach(asyncio.get_running_loop())
+    subscriber = hub.subscribe(project_id, user_id)
+    await send({'type': 'websocket.accept'})
+
+    async def push():
+        while True:
+            text = await subscriber.queue.get()
+            if text is Subscriber.CLOSE:
+                await send({'type': 'websocket.close', 'code': 4403})
+                return
+            await send({'type': 'websocket.send', 'text': text})
+
+    pusher = asyncio.create_task(push())
+    try:
+        while True:
+            receiving = asyncio.ensure_future(receive())
+            done, _ = await asyncio.wait({receiving, pusher}, return_when=asyncio.FIRST_COMPLETED)
+            if pusher in done:
+                receiving.cancel()
+                break
+            # clients have nothing to say; anything but a disconnect is ignored
+            if receiving.result()['type'] == 'websocket.disconnect':
+                break
+    finally:
+        pusher.cancel()
+        hub.unsubscribe(subscriber)